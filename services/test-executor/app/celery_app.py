@@ -0,0 +1,25 @@
+from celery import Celery
+
+from app.config import settings
+
+celery_app = Celery(
+    "tsuite_test_executor",
+    broker=settings.celery_broker_url,
+    backend=settings.celery_result_backend,
+    include=["app.tasks"]
+)
+
+celery_app.conf.update(
+    task_serializer="json",
+    result_serializer="json",
+    accept_content=["json"],
+    # Report STARTED so the API can tell queued jobs from running ones
+    task_track_started=True,
+    # Long-running jobs: hand out one at a time and requeue if a worker dies mid-run
+    task_acks_late=True,
+    worker_prefetch_multiplier=1,
+    # Lower number = higher priority, matching the scheduler's priority ranks
+    broker_transport_options={"priority_steps": list(range(10)), "queue_order_strategy": "priority"},
+    task_always_eager=settings.celery_task_always_eager,
+    task_store_eager_result=True,
+)
@@ -1,5 +1,7 @@
 from pydantic_settings import BaseSettings
 from typing import Optional
+import os
+import tempfile
 
 
 class Settings(BaseSettings):
@@ -17,10 +19,94 @@ class Settings(BaseSettings):
     # Celery
     celery_broker_url: str = "redis://localhost:6379/0"
     celery_result_backend: str = "redis://localhost:6379/0"
+    celery_task_always_eager: bool = False
+    
+    # Where jobs execute: "local" (in the API process) or "celery" (worker pool)
+    execution_backend: str = "local"
     
     # Test Execution
     max_concurrent_tests: int = 5
     test_timeout: int = 300
+    max_shards: int = 8  # upper bound on parallel shards per run
+    max_batch_size: int = 500  # runs, scans or IDs per batch request
+    
+    # Result store: "memory" (per-process LRU) or "redis" (shared between replicas)
+    result_store_backend: str = "memory"
+    result_store_redis_url: Optional[str] = None  # defaults to redis_url
+    result_store_max_entries: int = 10000
+    result_store_ttl: int = 86400
+    job_claim_ttl: float = 600  # seconds an in-flight run or scan ID stays claimed after its last heartbeat
+    
+    # Memoized results of successful runs, keyed by repository, commit, framework, command and environment
+    result_cache_enabled: bool = True
+    result_cache_ttl: int = 604800
+    
+    # Seconds between keep-alive events on idle live event streams
+    stream_heartbeat_interval: float = 15.0
+    
+    # Repository cache
+    repo_cache_enabled: bool = True
+    repo_cache_dir: str = os.path.join(tempfile.gettempdir(), "tsuite_repo_cache")
+    repo_cache_fetch_interval: float = 10.0
+    
+    # Dependency install cache
+    dependency_cache_enabled: bool = True
+    dependency_cache_dir: str = os.path.join(tempfile.gettempdir(), "tsuite_dependency_cache")
+    dependency_cache_max_mb: int = 10240
+    
+    # Dependency scan results, keyed by lockfile hash and advisory database version
+    dependency_scan_cache_enabled: bool = True
+    advisory_db_version: Optional[str] = None  # unset: advisory data assumed to change every refresh interval
+    advisory_db_refresh_interval: int = 86400
+    
+    # Offline advisory database: exported OSV dumps (directory, zip or JSON file)
+    advisory_db_path: Optional[str] = None
+    # "auto" (offline database for ecosystems it covers), "offline" (never call audit services) or "online"
+    dependency_scan_backend: str = "auto"
+    
+    # Pre-warmed sandboxes handed to runs instead of being created on demand
+    workspace_root: Optional[str] = None  # parent of run workspaces (e.g. a tmpfs such as /dev/shm/tsuite); default: system temp dir
+    workspace_pool_min_idle: int = 2  # ready workspaces kept per kind; grows with the queue
+    workspace_pool_max_idle: int = 16
+    interpreter_pool_enabled: bool = True  # pytest interpreters started ahead with pytest and plugins imported
+    interpreter_pool_max_idle: int = 4  # per cached virtualenv; grows with the queue
+    interpreter_pool_idle_ttl: float = 600.0  # seconds before an unused interpreter is stopped
+    
+    # Finished workspaces are renamed aside and deleted in the background
+    workspace_quota_mb: int = 51200  # disk for live workspaces plus pending deletions; 0 disables the quota
+    workspace_usage_interval: float = 30.0  # seconds between disk usage measurements
+    workspace_quota_wait: float = 600.0  # seconds a job waits for space before failing
+    
+    # Limits per child process tree (0 disables a limit): cgroups v2 when delegated, rlimits otherwise
+    resource_cgroup_root: Optional[str] = "/sys/fs/cgroup/tsuite"  # writable cgroup v2 directory; one child cgroup per command
+    resource_memory_limit_mb: int = 4096  # per command tree; without cgroups, the data segment of each process
+    resource_cpu_limit: float = 2.0  # CPU cores per command tree (cgroups only)
+    resource_max_processes: int = 1024  # per command tree (cgroups only)
+    resource_cpu_time_limit: int = 0  # CPU seconds per process (rlimit)
+    resource_sample_interval: float = 1.0  # seconds between /proc usage samples when cgroups are unavailable
+    
+    # Scanner toolchain, provisioned once at startup instead of per scan
+    toolchain_dir: str = os.path.join(tempfile.gettempdir(), "tsuite_toolchain")
+    toolchain_auto_install: bool = True
+    safety_version: str = "2.3.5"
+    semgrep_version: str = "1.45.0"
+    semgrep_rules: Optional[str] = None  # local rules file or directory; default: <toolchain_dir>/semgrep-rules.yml
+    semgrep_rules_url: Optional[str] = "https://semgrep.dev/c/p/default"
+    
+    # SAST scans of large trees are split into size-balanced chunks scanned concurrently
+    sast_parallelism: int = 4  # concurrent semgrep processes per scan
+    sast_min_chunk_files: int = 200  # trees below twice this are scanned in one process
+    sast_chunk_timeout: int = 300
+    
+    # SAST baselines outlive run records: PR scans diff against main-branch commits that may be weeks old
+    sast_baseline_max_entries: int = 2000
+    sast_baseline_ttl: int = 7776000
+    
+    # Tracing (OpenTelemetry over OTLP/HTTP, e.g. to Jaeger)
+    tracing_enabled: bool = False
+    otlp_endpoint: str = "http://localhost:4318/v1/traces"
+    tracing_service_name: str = "test-executor"
+    tracing_sample_ratio: float = 1.0  # share of new traces kept; callers' sampling decisions are honoured
     
     # Logging
     log_level: str = "INFO"
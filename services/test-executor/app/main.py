@@ -1,9 +1,17 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import logging
 
 from app.config import settings
-from app.routers import test_execution, health, security
+from app.routers import test_execution, health, metrics, security
+from app.services.advisory_db import advisory_db
+from app.services.interpreter_pool import interpreter_pool
+from app.services.test_runner import WORKSPACE_PREFIX
+from app.services.toolchain import toolchain
+from app.services.tracing import TracingMiddleware, configure_tracing
+from app.services.workspace_pool import workspace_pool
+from app.services.workspace_reaper import workspace_reaper
 
 # Configure logging
 logging.basicConfig(
@@ -13,6 +21,8 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+configure_tracing()
+
 app = FastAPI(
     title="tSuite Test Executor",
     description="Test execution service for tSuite platform",
@@ -28,8 +38,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Tracing (outermost, so the server span covers the whole request)
+app.add_middleware(TracingMiddleware)
+
 # Include routers
 app.include_router(health.router, tags=["health"])
+app.include_router(metrics.router, tags=["metrics"])
 app.include_router(
     test_execution.router,
     prefix=f"/api/{settings.api_version}/tests",
@@ -41,11 +55,23 @@ app.include_router(
     tags=["security"]
 )
 
+async def prepare_workspaces():
+    """Remove workspaces orphaned by crashed processes, then pre-create fresh ones"""
+    await asyncio.to_thread(workspace_reaper.sweep)
+    await asyncio.to_thread(workspace_pool.warm, [WORKSPACE_PREFIX])
+
 @app.on_event("startup")
 async def startup_event():
     logger.info(f"Test Executor starting on port {settings.port}")
     logger.info(f"Environment: {settings.environment}")
+    # Provision scanner tools in the background; /health reports readiness
+    app.state.toolchain_warmup = asyncio.create_task(toolchain.warm(install=settings.toolchain_auto_install))
+    app.state.advisory_db_load = asyncio.create_task(asyncio.to_thread(advisory_db.refresh))
+    app.state.workspace_warmup = asyncio.create_task(prepare_workspaces())
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Test Executor shutting down")
+    await interpreter_pool.close()
+    workspace_pool.close()
+    await workspace_reaper.close()
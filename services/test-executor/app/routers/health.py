@@ -2,6 +2,14 @@ from fastapi import APIRouter
 from datetime import datetime
 import sys
 
+from app.services.advisory_db import advisory_db
+from app.services.interpreter_pool import interpreter_pool
+from app.services.resources import resource_accounting
+from app.services.scheduler import execution_scheduler
+from app.services.toolchain import toolchain
+from app.services.workspace_pool import workspace_pool
+from app.services.workspace_reaper import workspace_reaper
+
 router = APIRouter()
 
 @router.get("/health")
@@ -11,5 +19,11 @@ async def health_check():
         "status": "ok",
         "timestamp": datetime.utcnow().isoformat(),
         "service": "test-executor",
-        "python_version": sys.version
+        "python_version": sys.version,
+        "scheduler": execution_scheduler.stats(),
+        "toolchain": toolchain.readiness(),
+        "advisory_db": advisory_db.status(),
+        "pools": {"workspaces": workspace_pool.stats(), "interpreters": interpreter_pool.stats()},
+        "workspace_disk": workspace_reaper.status(),
+        "resource_limits": resource_accounting.status()
     }
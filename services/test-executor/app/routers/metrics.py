@@ -0,0 +1,15 @@
+import asyncio
+
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+
+# Registers the executor's metrics and scrape-time collector
+import app.services.metrics  # noqa: F401
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+async def metrics():
+    """Prometheus metrics; collected off the event loop since store sizes may query Redis"""
+    return Response(await asyncio.to_thread(generate_latest, REGISTRY), media_type=CONTENT_TYPE_LATEST)
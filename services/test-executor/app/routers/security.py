@@ -1,16 +1,23 @@
 from fastapi import APIRouter, HTTPException, BackgroundTasks
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Union
 from datetime import datetime
+import asyncio
 import logging
 
+from app.config import settings
+from app.services.resources import accounted_run, usage_report
+from app.services.result_store import get_result_store
+from app.services.scheduler import execution_scheduler, PRIORITY_CLASSES
+from app.services.security_pipeline import run_security_pipeline
 from app.services.security_scanner import get_security_scanner
+from app.services.tracing import inject_context, job_span
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-# In-memory storage for scan results
-scan_results_store: Dict[str, Dict[str, Any]] = {}
+# Scan records (in-memory LRU or Redis, see RESULT_STORE_BACKEND)
+scan_results_store = get_result_store("security_scans")
 
 
 class SecurityScanRequest(BaseModel):
@@ -19,6 +26,24 @@ class SecurityScanRequest(BaseModel):
     scanner_type: str  # dependency, sast, secrets
     repository_url: str
     branch: Optional[str] = "main"
+    commit: Optional[str] = None
+    baseline_commit: Optional[str] = None  # SAST: only re-scan files changed since this commit
+    priority: Optional[str] = "normal"  # urgent, pr, normal, nightly
+
+
+class SecurityPipelineRequest(BaseModel):
+    project_id: str
+    scan_id: str
+    scanners: List[str]  # run together against one checkout
+    repository_url: str
+    branch: Optional[str] = "main"
+    commit: Optional[str] = None
+    baseline_commit: Optional[str] = None  # SAST: only re-scan files changed since this commit
+    priority: Optional[str] = "normal"  # urgent, pr, normal, nightly
+
+
+# Scanners accepted by /scan and /pipeline
+SUPPORTED_SCANNERS = ["dependency", "sast"]
 
 
 class SecurityScanResponse(BaseModel):
@@ -27,43 +52,235 @@ class SecurityScanResponse(BaseModel):
     message: str
 
 
-async def run_security_scan_background(request: SecurityScanRequest):
-    """Background task to run security scan"""
+class SecurityBatchRequest(BaseModel):
+    scans: List[SecurityScanRequest] = []
+    pipelines: List[SecurityPipelineRequest] = []
+
+
+class SecurityBatchResponse(BaseModel):
+    queued: List[str]
+    rejected: List[Dict[str, str]]  # scan_id and error of each scan not queued
+
+
+class ScanStatusBatchRequest(BaseModel):
+    scan_ids: List[str]
+
+
+# Summary counts kept in compact batch status entries
+SUMMARY_KEYS = [
+    "success", "total_findings", "total_vulnerabilities", "critical", "high", "medium", "low", "duration"
+]
+
+
+async def run_security_scan_background(request: Union[SecurityScanRequest, SecurityPipelineRequest]):
+    """Background task to run a security scan locally or hand it to the Celery worker pool"""
+    is_pipeline = isinstance(request, SecurityPipelineRequest)
+    if settings.execution_backend == "celery":
+        # Imported lazily: app.tasks imports this module
+        from app.tasks import dispatch, security_pipeline_task, security_scan_task
+        
+        record = await scan_results_store.aget(request.scan_id, {})
+        await scan_results_store.aset(request.scan_id, {**record, "backend": "celery"})
+        task = security_pipeline_task if is_pipeline else security_scan_task
+        try:
+            await dispatch(task, request.scan_id, request.model_dump(), request.priority, inject_context())
+        except BaseException:
+            await scan_results_store.arelease_claim(request.scan_id)
+            raise
+        # The worker renews the ID's claim while it runs the job
+        return
+    
+    async with scan_results_store.held_claim(request.scan_id, settings.job_claim_ttl):
+        with job_span("security pipeline" if is_pipeline else "security scan", scan_span_attributes(request)):
+            async with execution_scheduler.slot(request.scan_id, request.project_id, request.priority):
+                if is_pipeline:
+                    await perform_security_pipeline(request)
+                else:
+                    await perform_security_scan(request)
+
+
+def scan_span_attributes(request: Union[SecurityScanRequest, SecurityPipelineRequest]) -> Dict[str, Any]:
+    """Trace attributes identifying a scan or pipeline"""
+    scanners = request.scanners if isinstance(request, SecurityPipelineRequest) else [request.scanner_type.lower()]
+    return {
+        "scan.id": request.scan_id,
+        "project.id": request.project_id,
+        "scanners": scanners,
+        "repository.url": request.repository_url,
+        "repository.ref": request.commit or request.branch or "",
+        "priority": request.priority or "normal"
+    }
+
+
+async def run_security_batch_background(requests: List[Union[SecurityScanRequest, SecurityPipelineRequest]]):
+    """Start every scan of a batch at once; the scheduler bounds how many execute"""
+    await asyncio.gather(*(run_security_scan_background(request) for request in requests))
+
+
+async def perform_security_scan(request: SecurityScanRequest):
+    """Run a security scan and record the outcome"""
     try:
         # Update status to running
-        scan_results_store[request.scan_id] = {
+        started_at = datetime.utcnow().isoformat()
+        await scan_results_store.aset(request.scan_id, {
             "status": "running",
             "scanner_type": request.scanner_type,
-            "started_at": datetime.utcnow().isoformat()
-        }
+            "started_at": started_at
+        })
         
         # Get appropriate scanner
         scanner = get_security_scanner(request.scanner_type)
         
-        # Run scan
-        results = await scanner.scan(
-            repository_url=request.repository_url,
-            branch=request.branch
-        )
+        # Run scan, accounting the CPU, memory and I/O of each phase
+        with accounted_run() as resources:
+            results = await scanner.scan(
+                repository_url=request.repository_url,
+                branch=request.branch,
+                commit=request.commit,
+                baseline_commit=request.baseline_commit
+            )
+        results["resources"] = usage_report(resources)
         
         # Store results
-        scan_results_store[request.scan_id] = {
+        await scan_results_store.aset(request.scan_id, {
             "status": "completed" if results.get("success") else "failed",
             "scanner_type": request.scanner_type,
-            "started_at": scan_results_store[request.scan_id]["started_at"],
+            "started_at": started_at,
             "completed_at": datetime.utcnow().isoformat(),
             "results": results
-        }
+        })
         
         logger.info(f"Security scan completed for {request.scan_id}")
         
     except Exception as e:
         logger.error(f"Security scan failed: {str(e)}")
-        scan_results_store[request.scan_id] = {
+        await scan_results_store.aset(request.scan_id, {
             "status": "failed",
             "error": str(e),
             "completed_at": datetime.utcnow().isoformat()
+        })
+
+
+async def perform_security_pipeline(request: SecurityPipelineRequest):
+    """Run several scanners over one checkout and record the combined report"""
+    try:
+        started_at = datetime.utcnow().isoformat()
+        await scan_results_store.aset(request.scan_id, {
+            "status": "running",
+            "scanner_type": "pipeline",
+            "scanners": request.scanners,
+            "started_at": started_at
+        })
+        
+        with accounted_run() as resources:
+            results = await run_security_pipeline(
+                repository_url=request.repository_url,
+                scanner_types=request.scanners,
+                branch=request.branch,
+                commit=request.commit,
+                baseline_commit=request.baseline_commit
+            )
+        results["resources"] = usage_report(resources)
+        
+        await scan_results_store.aset(request.scan_id, {
+            "status": "completed" if results.get("success") else "failed",
+            "scanner_type": "pipeline",
+            "scanners": request.scanners,
+            "started_at": started_at,
+            "completed_at": datetime.utcnow().isoformat(),
+            "results": results
+        })
+        
+        logger.info(f"Security pipeline completed for {request.scan_id}")
+        
+    except Exception as e:
+        logger.error(f"Security pipeline failed: {str(e)}")
+        await scan_results_store.aset(request.scan_id, {
+            "status": "failed",
+            "error": str(e),
+            "completed_at": datetime.utcnow().isoformat()
+        })
+
+
+def _priority_error(priority: Optional[str]) -> Optional[str]:
+    if priority not in PRIORITY_CLASSES:
+        return f"Unsupported priority: {priority}. Supported: {', '.join(PRIORITY_CLASSES)}"
+    return None
+
+
+def _scan_validation_error(request: SecurityScanRequest) -> Optional[str]:
+    """Why a scan cannot be queued, or None"""
+    # Validate scanner type
+    if request.scanner_type.lower() not in SUPPORTED_SCANNERS:
+        return f"Unsupported scanner: {request.scanner_type}. Supported: {', '.join(SUPPORTED_SCANNERS)}"
+    
+    # Validate priority class
+    return _priority_error(request.priority)
+
+
+def _pipeline_validation_error(request: SecurityPipelineRequest) -> Optional[str]:
+    """Why a pipeline cannot be queued, or None; normalizes the scanner list"""
+    # Validate scanner list
+    request.scanners = list(dict.fromkeys(scanner.lower() for scanner in request.scanners))
+    unsupported = [scanner for scanner in request.scanners if scanner not in SUPPORTED_SCANNERS]
+    if not request.scanners or unsupported:
+        return f"Unsupported scanners: {', '.join(unsupported) or 'none given'}. Supported: {', '.join(SUPPORTED_SCANNERS)}"
+    
+    # Validate priority class
+    return _priority_error(request.priority)
+
+
+def _queue_record(request: Union[SecurityScanRequest, SecurityPipelineRequest]) -> Dict[str, Any]:
+    if isinstance(request, SecurityPipelineRequest):
+        return {
+            "status": "queued",
+            "scanner_type": "pipeline",
+            "scanners": request.scanners,
+            "queued_at": datetime.utcnow().isoformat()
         }
+    return {
+        "status": "queued",
+        "scanner_type": request.scanner_type,
+        "queued_at": datetime.utcnow().isoformat()
+    }
+
+
+def _check_batch_size(size: int) -> None:
+    if size > settings.max_batch_size:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch too large: {size}. Maximum: {settings.max_batch_size}"
+        )
+
+
+async def _in_flight_error(scan_id: str) -> Optional[str]:
+    """
+    Claim an ID for a new scan; why it cannot be resubmitted while a live
+    scan holds it, or None. A scan lost with a crashed replica stops
+    renewing its claim, so its ID frees up once the claim expires.
+    """
+    if await scan_results_store.aclaim(scan_id, settings.job_claim_ttl):
+        return None
+    record = await scan_results_store.aget(scan_id) or {}
+    return f"Scan {scan_id} is already {record.get('status', 'in progress')}"
+
+
+async def _current_record(scan_id: str) -> Optional[Dict[str, Any]]:
+    """Stored record for a scan, refreshed from the worker pool if dispatched; None if unknown"""
+    record = await scan_results_store.aget(scan_id)
+    if record is not None and settings.execution_backend == "celery":
+        from app.tasks import refresh_job_record
+        return await asyncio.to_thread(refresh_job_record, scan_results_store, scan_id, record)
+    return record
+
+
+async def _current_records(scan_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Stored records of many scans, loaded in one store round-trip"""
+    records = await scan_results_store.aget_many(scan_ids)
+    if settings.execution_backend == "celery":
+        from app.tasks import refresh_job_records
+        records = await asyncio.to_thread(refresh_job_records, scan_results_store, records)
+    return records
 
 
 @router.post("/scan", response_model=SecurityScanResponse)
@@ -76,20 +293,15 @@ async def run_security_scan(
     """
     logger.info(f"Received security scan request for project {request.project_id}")
     
-    # Validate scanner type
-    supported_scanners = ["dependency", "sast"]
-    if request.scanner_type.lower() not in supported_scanners:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Unsupported scanner: {request.scanner_type}. Supported: {', '.join(supported_scanners)}"
-        )
+    error = _scan_validation_error(request)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    error = await _in_flight_error(request.scan_id)
+    if error:
+        raise HTTPException(status_code=409, detail=error)
     
     # Initialize scan status
-    scan_results_store[request.scan_id] = {
-        "status": "queued",
-        "scanner_type": request.scanner_type,
-        "queued_at": datetime.utcnow().isoformat()
-    }
+    await scan_results_store.aset(request.scan_id, _queue_record(request))
     
     # Queue scan in background
     background_tasks.add_task(run_security_scan_background, request)
@@ -101,27 +313,124 @@ async def run_security_scan(
     )
 
 
+@router.post("/pipeline", response_model=SecurityScanResponse)
+async def run_security_pipeline_scan(
+    request: SecurityPipelineRequest,
+    background_tasks: BackgroundTasks
+):
+    """
+    Run several scanners against a single checkout and return one combined report
+    """
+    logger.info(f"Received security pipeline request for project {request.project_id}")
+    
+    error = _pipeline_validation_error(request)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    error = await _in_flight_error(request.scan_id)
+    if error:
+        raise HTTPException(status_code=409, detail=error)
+    
+    # Initialize scan status
+    await scan_results_store.aset(request.scan_id, _queue_record(request))
+    
+    # Queue pipeline in background
+    background_tasks.add_task(run_security_scan_background, request)
+    
+    return SecurityScanResponse(
+        scan_id=request.scan_id,
+        status="queued",
+        message=f"{', '.join(request.scanners)} pipeline queued successfully"
+    )
+
+
+@router.post("/batch", response_model=SecurityBatchResponse)
+async def run_security_batch(
+    batch: SecurityBatchRequest,
+    background_tasks: BackgroundTasks
+):
+    """
+    Queue many scans and pipelines in one request; invalid ones are rejected individually
+    """
+    requests: List[Union[SecurityScanRequest, SecurityPipelineRequest]] = [*batch.scans, *batch.pipelines]
+    _check_batch_size(len(requests))
+    
+    queued: List[Union[SecurityScanRequest, SecurityPipelineRequest]] = []
+    rejected: List[Dict[str, str]] = []
+    seen = set()
+    for request in requests:
+        if isinstance(request, SecurityPipelineRequest):
+            error = _pipeline_validation_error(request)
+        else:
+            error = _scan_validation_error(request)
+        if not error and request.scan_id in seen:
+            error = "Duplicate scan_id in batch"
+        if not error:
+            error = await _in_flight_error(request.scan_id)
+        if error:
+            rejected.append({"scan_id": request.scan_id, "error": error})
+            continue
+        seen.add(request.scan_id)
+        await scan_results_store.aset(request.scan_id, _queue_record(request))
+        queued.append(request)
+    
+    logger.info(f"Received batch of {len(requests)} scans: {len(queued)} queued, {len(rejected)} rejected")
+    if queued:
+        background_tasks.add_task(run_security_batch_background, queued)
+    
+    return SecurityBatchResponse(
+        queued=[request.scan_id for request in queued],
+        rejected=rejected
+    )
+
+
+@router.post("/status/batch")
+async def get_scan_status_batch(request: ScanStatusBatchRequest):
+    """Compact status of many scans: state and severity counts"""
+    scan_ids = list(dict.fromkeys(request.scan_ids))
+    _check_batch_size(len(scan_ids))
+    
+    records = await _current_records(scan_ids)
+    positions = execution_scheduler.queue_positions()
+    scans = {}
+    for scan_id, record in records.items():
+        entry = {"status": record.get("status"), "scanner_type": record.get("scanner_type")}
+        if record.get("status") == "queued":
+            entry["queue_position"] = positions.get(scan_id)
+        if "error" in record:
+            entry["error"] = record["error"]
+        results = record.get("results")
+        if results:
+            entry["summary"] = {key: results[key] for key in SUMMARY_KEYS if key in results}
+        scans[scan_id] = entry
+    
+    return {
+        "scans": scans,
+        "missing": [scan_id for scan_id in scan_ids if scan_id not in records]
+    }
+
+
 @router.get("/{scan_id}/status")
 async def get_scan_status(scan_id: str):
     """Get the status of a security scan"""
-    if scan_id not in scan_results_store:
+    scan_data = await _current_record(scan_id)
+    if scan_data is None:
         raise HTTPException(status_code=404, detail="Scan not found")
-    
-    scan_data = scan_results_store[scan_id]
-    return {
+    response = {
         "scan_id": scan_id,
         **scan_data
     }
+    if scan_data.get("status") == "queued":
+        response["queue_position"] = execution_scheduler.queue_position(scan_id)
+    return response
 
 
 @router.get("/{scan_id}/results")
 async def get_scan_results(scan_id: str):
     """Get the results of a completed security scan"""
-    if scan_id not in scan_results_store:
+    scan_data = await _current_record(scan_id)
+    if scan_data is None:
         raise HTTPException(status_code=404, detail="Scan not found")
     
-    scan_data = scan_results_store[scan_id]
-    
     if scan_data.get("status") not in ["completed", "failed"]:
         raise HTTPException(
             status_code=400,
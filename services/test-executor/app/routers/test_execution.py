@@ -1,17 +1,28 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, BackgroundTasks, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 import logging
 import asyncio
+import json
 
+from app.config import settings
+from app.services.events import run_events, END_EVENT
+from app.services.metrics import ACTIVE_TEST_RUNS, record_test_run
+from app.services.repo_cache import FULL_SHA, repository_cache
+from app.services.resources import accounted_run, usage_report
+from app.services.result_cache import run_key, run_result_cache
+from app.services.result_store import get_result_store
+from app.services.scheduler import execution_scheduler, PRIORITY_CLASSES
 from app.services.test_runner import get_test_runner
+from app.services.tracing import inject_context, job_span
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-# In-memory storage for test results (replace with Redis/database in production)
-test_results_store: Dict[str, Dict[str, Any]] = {}
+# Test run records (in-memory LRU or Redis, see RESULT_STORE_BACKEND)
+test_results_store = get_result_store("test_runs")
 
 
 class TestExecutionRequest(BaseModel):
@@ -21,8 +32,13 @@ class TestExecutionRequest(BaseModel):
     repository_url: str
     branch: Optional[str] = "main"
     commit: Optional[str] = None
+    base_commit: Optional[str] = None  # impact analysis diff base; defaults to the commit's parent
+    impact_analysis: Optional[bool] = False  # run only the tests affected by the change
     test_command: Optional[str] = None
     environment_vars: Optional[Dict[str, str]] = {}
+    priority: Optional[str] = "normal"  # urgent, pr, normal, nightly
+    shards: Optional[int] = None  # split the suite into parallel shards
+    bypass_cache: Optional[bool] = False  # always run, even if this commit already passed
 
 
 class TestExecutionResponse(BaseModel):
@@ -31,71 +47,304 @@ class TestExecutionResponse(BaseModel):
     message: str
 
 
+class TestExecutionBatchRequest(BaseModel):
+    runs: List[TestExecutionRequest]
+
+
+class TestExecutionBatchResponse(BaseModel):
+    queued: List[str]
+    rejected: List[Dict[str, str]]  # test_run_id and error of each run not queued
+
+
+class TestStatusBatchRequest(BaseModel):
+    test_run_ids: List[str]
+
+
+# Summary counts kept in compact batch status entries
+SUMMARY_KEYS = ["success", "total_tests", "passed", "failed", "skipped", "duration"]
+
+
 async def run_tests_background(request: TestExecutionRequest):
-    """Background task to run tests"""
+    """Background task to run tests locally or hand them to the Celery worker pool"""
+    if settings.execution_backend == "celery":
+        # Imported lazily: app.tasks imports this module
+        from app.tasks import dispatch, execute_tests_task
+        
+        record = await test_results_store.aget(request.test_run_id, {})
+        await test_results_store.aset(request.test_run_id, {**record, "backend": "celery"})
+        try:
+            await dispatch(execute_tests_task, request.test_run_id, request.model_dump(), request.priority, inject_context())
+        except BaseException:
+            await test_results_store.arelease_claim(request.test_run_id)
+            raise
+        # The worker renews the ID's claim while it runs the job
+        return
+    
+    async with test_results_store.held_claim(request.test_run_id, settings.job_claim_ttl):
+        with job_span("test run", run_span_attributes(request)):
+            if await serve_cached_result(request):
+                return
+            
+            async with execution_scheduler.slot(request.test_run_id, request.project_id, request.priority):
+                await perform_test_run(request)
+
+
+def run_span_attributes(request: TestExecutionRequest) -> Dict[str, Any]:
+    """Trace attributes identifying a test run"""
+    return {
+        "test_run.id": request.test_run_id,
+        "project.id": request.project_id,
+        "framework": request.framework.lower(),
+        "repository.url": request.repository_url,
+        "repository.ref": request.commit or request.branch or "",
+        "priority": request.priority or "normal"
+    }
+
+
+async def run_test_batch_background(requests: List[TestExecutionRequest]):
+    """Start every run of a batch at once; the scheduler bounds how many execute"""
+    await asyncio.gather(*(run_tests_background(request) for request in requests))
+
+
+def _result_key(request: TestExecutionRequest) -> Optional[str]:
+    """Memoization key of a request pinned to a full commit SHA"""
+    if not settings.result_cache_enabled or not request.commit or not FULL_SHA.match(request.commit):
+        return None
+    return run_key(
+        request.repository_url,
+        request.commit,
+        request.framework,
+        request.test_command,
+        request.environment_vars,
+        impact_analysis=bool(request.impact_analysis),
+        base_commit=request.base_commit
+    )
+
+
+async def serve_cached_result(request: TestExecutionRequest) -> bool:
+    """
+    Pin the request to the commit its branch (or short SHA) resolves to and
+    answer it from the result cache when that commit already passed.
+    """
+    if not settings.result_cache_enabled:
+        return False
+    try:
+        commit = await repository_cache.resolve(request.repository_url, request.commit or request.branch)
+    except Exception as e:
+        logger.warning(f"Could not resolve {request.commit or request.branch} for {request.repository_url}: {e}")
+        return False
+    if not commit:
+        return False
+    request.commit = commit
+    if request.bypass_cache:
+        return False
+    
+    cached = await run_result_cache.store.call(run_result_cache.get, _result_key(request))
+    if not cached:
+        return False
+    
+    logger.info(f"Serving test run {request.test_run_id} from cached run {cached['test_run_id']} ({commit})")
+    now = datetime.utcnow().isoformat()
+    record = {
+        "status": "completed",
+        "progress": 100,
+        "started_at": now,
+        "completed_at": now,
+        "cached": True,
+        "cached_from": cached["test_run_id"],
+        "results": cached["results"]
+    }
+    await test_results_store.aset(request.test_run_id, record)
+    run_events.close(request.test_run_id, status="completed")
+    record_test_run(request.framework.lower(), record)
+    return True
+
+
+async def perform_test_run(request: TestExecutionRequest):
+    """Run tests and record the outcome"""
+    framework = request.framework.lower()
+    ACTIVE_TEST_RUNS.labels(framework=framework).inc()
+    progress = _ProgressWriter(request.test_run_id)
+    record: Dict[str, Any] = {}
     try:
         # Update status to running
-        test_results_store[request.test_run_id] = {
+        started_at = datetime.utcnow().isoformat()
+        await test_results_store.aset(request.test_run_id, {
             "status": "running",
             "progress": 0,
-            "started_at": datetime.utcnow().isoformat()
-        }
+            "started_at": started_at
+        })
         
         # Get appropriate test runner
         runner = get_test_runner(request.framework)
         
-        # Run tests
-        results = await runner.run_tests(
-            repository_url=request.repository_url,
-            branch=request.branch,
-            test_command=request.test_command,
-            environment_vars=request.environment_vars
-        )
+        # Run tests, accounting the CPU, memory and I/O of each phase
+        with accounted_run() as resources:
+            results = await runner.run_tests(
+                repository_url=request.repository_url,
+                branch=request.branch,
+                test_command=request.test_command,
+                environment_vars=request.environment_vars,
+                on_event=progress.publish,
+                shards=request.shards,
+                commit=request.commit,
+                base_commit=request.base_commit,
+                impact_analysis=bool(request.impact_analysis)
+            )
+        results["resources"] = usage_report(resources)
         
         # Store results
-        test_results_store[request.test_run_id] = {
+        await progress.drain()
+        record = {
             "status": "completed" if results.get("success") else "failed",
             "progress": 100,
-            "started_at": test_results_store[request.test_run_id]["started_at"],
+            "started_at": started_at,
             "completed_at": datetime.utcnow().isoformat(),
             "results": results
         }
+        await test_results_store.aset(request.test_run_id, record)
+        
+        key = _result_key(request)
+        if key and await run_result_cache.store.call(run_result_cache.put, key, request.test_run_id, results):
+            logger.info(f"Memoized results of {request.test_run_id} for {request.commit}")
         
         logger.info(f"Test execution completed for {request.test_run_id}")
         
     except Exception as e:
         logger.error(f"Test execution failed: {str(e)}")
-        test_results_store[request.test_run_id] = {
+        await progress.drain()
+        record = {
             "status": "failed",
             "error": str(e),
             "completed_at": datetime.utcnow().isoformat()
         }
+        await test_results_store.aset(request.test_run_id, record)
+    finally:
+        ACTIVE_TEST_RUNS.labels(framework=framework).dec()
+        record_test_run(framework, record)
+        run_events.close(request.test_run_id, status=record.get("status"))
 
 
-@router.post("/execute", response_model=TestExecutionResponse)
-async def execute_tests(
-    request: TestExecutionRequest,
-    background_tasks: BackgroundTasks
-):
+class _ProgressWriter:
     """
-    Execute tests for a project
+    Publishes runner events to live subscribers and keeps the record's
+    progress current. Store writes run in one background task that always
+    writes the latest value, so events never wait on the store.
     """
-    logger.info(f"Received test execution request for project {request.project_id}")
-    
+
+    def __init__(self, test_run_id: str):
+        self.test_run_id = test_run_id
+        self.progress = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        run_events.publish(self.test_run_id, event)
+        progress = event.get("progress")
+        if progress is None or progress <= self.progress:
+            return
+        self.progress = progress
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._flush())
+
+    async def _flush(self) -> None:
+        written = None
+        while written != self.progress:
+            written = self.progress
+            record = await test_results_store.aget(self.test_run_id)
+            if record and record.get("status") == "running" and written > record.get("progress", 0):
+                await test_results_store.aset(self.test_run_id, {**record, "progress": written})
+
+    async def drain(self) -> None:
+        """Wait for pending progress writes so they cannot overwrite the final record"""
+        if self._task is not None:
+            try:
+                await self._task
+            except Exception as e:
+                logger.warning(f"Could not record progress of {self.test_run_id}: {e}")
+
+
+async def _current_record(test_run_id: str) -> Optional[Dict[str, Any]]:
+    """Stored record for a test run, refreshed from the worker pool if dispatched; None if unknown"""
+    record = await test_results_store.aget(test_run_id)
+    if record is not None and settings.execution_backend == "celery":
+        from app.tasks import refresh_job_record
+        return await asyncio.to_thread(refresh_job_record, test_results_store, test_run_id, record)
+    return record
+
+
+async def _current_records(test_run_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Stored records of many test runs, loaded in one store round-trip"""
+    records = await test_results_store.aget_many(test_run_ids)
+    if settings.execution_backend == "celery":
+        from app.tasks import refresh_job_records
+        records = await asyncio.to_thread(refresh_job_records, test_results_store, records)
+    return records
+
+
+def _validation_error(request: TestExecutionRequest) -> Optional[str]:
+    """Why a request cannot be queued, or None"""
     # Validate framework
     supported_frameworks = ["jest", "pytest"]
     if request.framework.lower() not in supported_frameworks:
+        return f"Unsupported framework: {request.framework}. Supported: {', '.join(supported_frameworks)}"
+    
+    # Validate priority class
+    if request.priority not in PRIORITY_CLASSES:
+        return f"Unsupported priority: {request.priority}. Supported: {', '.join(PRIORITY_CLASSES)}"
+    
+    # Validate shard count
+    if request.shards is not None and not 1 <= request.shards <= settings.max_shards:
+        return f"Unsupported shard count: {request.shards}. Supported: 1-{settings.max_shards}"
+    return None
+
+
+def _check_batch_size(size: int) -> None:
+    if size > settings.max_batch_size:
         raise HTTPException(
             status_code=400,
-            detail=f"Unsupported framework: {request.framework}. Supported: {', '.join(supported_frameworks)}"
+            detail=f"Batch too large: {size}. Maximum: {settings.max_batch_size}"
         )
-    
-    # Initialize test run status
-    test_results_store[request.test_run_id] = {
+
+
+async def _in_flight_error(test_run_id: str) -> Optional[str]:
+    """
+    Claim an ID for a new run; why it cannot be resubmitted while a live run
+    holds it, or None. A run lost with a crashed replica stops renewing its
+    claim, so its ID frees up once the claim expires.
+    """
+    if await test_results_store.aclaim(test_run_id, settings.job_claim_ttl):
+        return None
+    record = await test_results_store.aget(test_run_id) or {}
+    return f"Test run {test_run_id} is already {record.get('status', 'in progress')}"
+
+
+def _queue_record() -> Dict[str, Any]:
+    return {
         "status": "queued",
         "progress": 0,
         "queued_at": datetime.utcnow().isoformat()
     }
+
+
+@router.post("/execute", response_model=TestExecutionResponse)
+async def execute_tests(
+    request: TestExecutionRequest,
+    background_tasks: BackgroundTasks
+):
+    """
+    Execute tests for a project
+    """
+    logger.info(f"Received test execution request for project {request.project_id}")
+    
+    error = _validation_error(request)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    error = await _in_flight_error(request.test_run_id)
+    if error:
+        raise HTTPException(status_code=409, detail=error)
+    
+    # Initialize test run status
+    await test_results_store.aset(request.test_run_id, _queue_record())
     
     # Queue test execution in background
     background_tasks.add_task(run_tests_background, request)
@@ -107,19 +356,87 @@ async def execute_tests(
     )
 
 
+@router.post("/execute/batch", response_model=TestExecutionBatchResponse)
+async def execute_tests_batch(
+    batch: TestExecutionBatchRequest,
+    background_tasks: BackgroundTasks
+):
+    """
+    Queue many test runs in one request; invalid runs are rejected individually
+    """
+    _check_batch_size(len(batch.runs))
+    
+    queued: List[TestExecutionRequest] = []
+    rejected: List[Dict[str, str]] = []
+    seen = set()
+    for request in batch.runs:
+        error = _validation_error(request)
+        if not error and request.test_run_id in seen:
+            error = "Duplicate test_run_id in batch"
+        if not error:
+            error = await _in_flight_error(request.test_run_id)
+        if error:
+            rejected.append({"test_run_id": request.test_run_id, "error": error})
+            continue
+        seen.add(request.test_run_id)
+        await test_results_store.aset(request.test_run_id, _queue_record())
+        queued.append(request)
+    
+    logger.info(f"Received batch of {len(batch.runs)} test runs: {len(queued)} queued, {len(rejected)} rejected")
+    if queued:
+        background_tasks.add_task(run_test_batch_background, queued)
+    
+    return TestExecutionBatchResponse(
+        queued=[request.test_run_id for request in queued],
+        rejected=rejected
+    )
+
+
+@router.post("/status/batch")
+async def get_test_status_batch(request: TestStatusBatchRequest):
+    """
+    Compact status of many test runs: state, progress and summary counts
+    """
+    test_run_ids = list(dict.fromkeys(request.test_run_ids))
+    _check_batch_size(len(test_run_ids))
+    
+    records = await _current_records(test_run_ids)
+    positions = execution_scheduler.queue_positions()
+    runs = {}
+    for test_run_id, record in records.items():
+        entry = {"status": record.get("status"), "progress": record.get("progress", 0)}
+        if record.get("status") == "queued":
+            entry["queue_position"] = positions.get(test_run_id)
+        for key in ["error", "cached"]:
+            if key in record:
+                entry[key] = record[key]
+        results = record.get("results")
+        if results:
+            entry["summary"] = {key: results[key] for key in SUMMARY_KEYS if key in results}
+        runs[test_run_id] = entry
+    
+    return {
+        "runs": runs,
+        "missing": [test_run_id for test_run_id in test_run_ids if test_run_id not in records]
+    }
+
+
 @router.get("/{test_run_id}/status")
 async def get_test_status(test_run_id: str):
     """
     Get the status of a test execution
     """
-    if test_run_id not in test_results_store:
+    status_data = await _current_record(test_run_id)
+    if status_data is None:
         raise HTTPException(status_code=404, detail="Test run not found")
     
-    status_data = test_results_store[test_run_id]
-    return {
+    response = {
         "test_run_id": test_run_id,
         **status_data
     }
+    if status_data.get("status") == "queued":
+        response["queue_position"] = execution_scheduler.queue_position(test_run_id)
+    return response
 
 
 @router.get("/{test_run_id}/results")
@@ -127,11 +444,10 @@ async def get_test_results(test_run_id: str):
     """
     Get the results of a completed test execution
     """
-    if test_run_id not in test_results_store:
+    test_data = await _current_record(test_run_id)
+    if test_data is None:
         raise HTTPException(status_code=404, detail="Test run not found")
     
-    test_data = test_results_store[test_run_id]
-    
     if test_data.get("status") not in ["completed", "failed"]:
         raise HTTPException(
             status_code=400,
@@ -142,3 +458,67 @@ async def get_test_results(test_run_id: str):
         "test_run_id": test_run_id,
         **test_data
     }
+
+
+async def _live_events(test_run_id: str):
+    """
+    Events for a run: its live stream when it executes in this process,
+    otherwise heartbeats carrying the stored status until it finishes.
+    """
+    record = await _current_record(test_run_id) or {}
+    if record.get("status") in ["completed", "failed"] and not run_events.has_run(test_run_id):
+        yield {"type": END_EVENT, "status": record.get("status")}
+        return
+    
+    async for event in run_events.subscribe(test_run_id, heartbeat=settings.stream_heartbeat_interval):
+        if event is not None:
+            yield event
+            continue
+        
+        # Runs executing elsewhere (e.g. on Celery workers) publish no local events
+        record = await _current_record(test_run_id) or {}
+        if record.get("status") in ["completed", "failed"]:
+            yield {"type": END_EVENT, "status": record.get("status")}
+            return
+        yield {"type": "heartbeat", "status": record.get("status"), "progress": record.get("progress", 0)}
+
+
+@router.get("/{test_run_id}/events")
+async def stream_test_events(test_run_id: str):
+    """
+    Stream live output, progress and per-test results as Server-Sent Events
+    """
+    if await test_results_store.aget(test_run_id) is None:
+        raise HTTPException(status_code=404, detail="Test run not found")
+    
+    async def event_stream():
+        async for event in _live_events(test_run_id):
+            data = json.dumps(event)
+            if "seq" in event:
+                yield f"id: {event['seq']}\nevent: {event['type']}\ndata: {data}\n\n"
+            else:
+                yield f"event: {event['type']}\ndata: {data}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/{test_run_id}/ws")
+async def test_events_websocket(websocket: WebSocket, test_run_id: str):
+    """
+    Stream live output, progress and per-test results over a WebSocket
+    """
+    await websocket.accept()
+    if await test_results_store.aget(test_run_id) is None:
+        await websocket.close(code=4404, reason="Test run not found")
+        return
+    
+    try:
+        async for event in _live_events(test_run_id):
+            await websocket.send_json(event)
+        await websocket.close()
+    except WebSocketDisconnect:
+        logger.info(f"Event stream client disconnected from {test_run_id}")
@@ -0,0 +1,325 @@
+"""
+Offline vulnerability advisory database.
+
+Advisories are loaded from exported OSV dumps (a directory of JSON records,
+zip archives such as the per-ecosystem ``all.zip`` exports, or a JSON list)
+and indexed by ecosystem and package name. A whole lockfile is matched in
+one pass: each package's installed versions are sorted once and every
+affected range of its advisories is located by bisection. Dependency scans
+use this instead of ``npm audit`` and ``safety`` when it covers an
+ecosystem, so they need no network access.
+"""
+import hashlib
+import json
+import logging
+import re
+import threading
+import zipfile
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# OSV ecosystem names onto the scanner's ecosystems
+OSV_ECOSYSTEMS = {"npm": "npm", "PyPI": "python"}
+
+# Lockfiles that pin every installed npm package (npm audit also reads them directly)
+NPM_LOCKFILES = ["package-lock.json", "npm-shrinkwrap.json"]
+
+RELEASE_WIDTH = 6
+VERSION_PATTERN = re.compile(r"^[vV=]?(\d+(?:\.\d+)*)(.*)$")
+SUFFIX_TOKEN = re.compile(r"\d+|[a-z]+")
+PINNED_REQUIREMENT = re.compile(r"^([A-Za-z0-9][A-Za-z0-9._-]*)(?:\[[^\]]*\])?\s*===?\s*([^\s;,#]+)")
+
+# Advisory severities onto critical/high/medium/low
+SEVERITIES = {"critical": "critical", "high": "high", "moderate": "medium", "medium": "medium", "low": "low"}
+
+VersionKey = Tuple[Any, ...]
+
+
+def version_key(version: str) -> Optional[VersionKey]:
+    """
+    Sortable key for semver and PEP 440 versions: release numbers, then
+    dev < pre-release < final < post-release. None if unparseable.
+    """
+    match = VERSION_PATTERN.match(version.strip())
+    if not match:
+        return None
+    release = [int(part) for part in match.group(1).split(".")][:RELEASE_WIDTH]
+    release += [0] * (RELEASE_WIDTH - len(release))
+    suffix = match.group(2).split("+", 1)[0].lower()
+    tokens = tuple((0, int(t), "") if t.isdigit() else (1, 0, t) for t in SUFFIX_TOKEN.findall(suffix))
+    if not tokens:
+        phase = 2
+    elif tokens[0][2] in ("post", "rev", "r"):
+        phase = 3
+    elif tokens[0][2] == "dev":
+        phase = 0
+    else:
+        phase = 1
+    return (*release, phase, tokens)
+
+
+def package_name(ecosystem: str, name: str) -> str:
+    """Index name of a package (PEP 503 normalization for Python)"""
+    if ecosystem == "python":
+        return re.sub(r"[-_.]+", "-", name).lower()
+    return name.lower()
+
+
+def _intervals(events: List[Dict[str, str]]) -> List[Tuple[Optional[VersionKey], Optional[VersionKey], bool]]:
+    """OSV range events as (start, end, end inclusive) intervals; None bounds are open"""
+    points = []
+    for event in events:
+        for kind in ("introduced", "fixed", "last_affected"):
+            if kind in event:
+                key = None if kind == "introduced" and event[kind] == "0" else version_key(event[kind])
+                if key is not None or kind == "introduced":
+                    points.append((key, kind))
+    # Introductions sort before a fix at the same version
+    points.sort(key=lambda p: (p[0] is not None, p[0] or (), p[1] != "introduced"))
+
+    intervals = []
+    start, open_range = None, False
+    for key, kind in points:
+        if kind == "introduced":
+            if not open_range:
+                start, open_range = key, True
+        elif open_range:
+            intervals.append((start, key, kind == "last_affected"))
+            open_range = False
+    if open_range:
+        intervals.append((start, None, False))
+    return intervals
+
+
+def _describe(events: List[Dict[str, str]]) -> str:
+    """Affected ranges in npm-style notation, e.g. >=1.0.0 <1.2.3 || >=2.0.0"""
+    parts = []
+    start = None
+    for event in events:
+        if "introduced" in event:
+            start = event["introduced"]
+        for kind, op in (("fixed", "<"), ("last_affected", "<=")):
+            if kind in event:
+                parts.append(" ".join(p for p in [f">={start}" if start not in (None, "0") else "", f"{op}{event[kind]}"] if p))
+                start = None
+    if start is not None:
+        parts.append(f">={start}" if start != "0" else "*")
+    return " || ".join(parts)
+
+
+class AdvisoryDatabase:
+    """OSV advisories indexed by ecosystem and package name"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path) if path else None
+        self.index: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+        self.version = "none"
+        self.advisories = 0
+        self._signature: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._signature is not None
+
+    def _sources(self) -> List[Path]:
+        if self.path is None or not self.path.exists():
+            return []
+        if self.path.is_dir():
+            return sorted(p for p in self.path.rglob("*") if p.suffix in (".json", ".zip") and p.is_file())
+        return [self.path]
+
+    def signature(self) -> Optional[str]:
+        """Digest of the dump files' names, sizes and mtimes; None without dumps"""
+        sources = self._sources()
+        if not sources:
+            return None
+        entries = "\n".join(f"{p}:{p.stat().st_size}:{p.stat().st_mtime_ns}" for p in sources)
+        return hashlib.sha256(entries.encode()).hexdigest()[:16]
+
+    def refresh(self) -> bool:
+        """(Re)load the dumps if they changed since the last load; True when loaded"""
+        with self._lock:
+            signature = self.signature()
+            if signature != self._signature:
+                if signature is None:
+                    self.clear()
+                else:
+                    self._load(self._sources(), signature)
+            return self.loaded
+
+    def clear(self) -> None:
+        self.index = {}
+        self.advisories = 0
+        self.version = "none"
+        self._signature = None
+
+    def _load(self, sources: List[Path], signature: str) -> None:
+        self.clear()
+        for source in sources:
+            try:
+                for record in self._records(source):
+                    self.add(record)
+            except (OSError, ValueError, zipfile.BadZipFile) as e:
+                logger.error(f"Could not load advisories from {source}: {e}")
+        self._signature = signature
+        self.version = f"osv-{signature}"
+        logger.info(f"Loaded {self.advisories} advisories ({self.version}) for {', '.join(sorted(self.index)) or 'no ecosystems'}")
+
+    def _records(self, source: Path) -> Iterable[Dict[str, Any]]:
+        if source.suffix == ".zip":
+            with zipfile.ZipFile(source) as archive:
+                for name in archive.namelist():
+                    if name.endswith(".json"):
+                        yield from self._parse(archive.read(name))
+        else:
+            yield from self._parse(source.read_bytes())
+
+    def _parse(self, data: bytes) -> Iterable[Dict[str, Any]]:
+        parsed = json.loads(data)
+        yield from (parsed if isinstance(parsed, list) else [parsed])
+
+    def add(self, record: Dict[str, Any]) -> None:
+        """Index one OSV record under every package it affects"""
+        if record.get("withdrawn"):
+            return
+        aliases = record.get("aliases") or []
+        cve = next((a for a in [record.get("id", ""), *aliases] if a.startswith("CVE-")), "")
+        severity = SEVERITIES.get(str((record.get("database_specific") or {}).get("severity", "")).lower(), "medium")
+
+        indexed = False
+        for affected in record.get("affected") or []:
+            package = affected.get("package") or {}
+            ecosystem = OSV_ECOSYSTEMS.get(package.get("ecosystem", "").split(":", 1)[0])
+            if not ecosystem or not package.get("name"):
+                continue
+            intervals, described, fixed = [], [], []
+            for version_range in affected.get("ranges") or []:
+                if version_range.get("type") not in ("SEMVER", "ECOSYSTEM"):
+                    continue
+                events = version_range.get("events") or []
+                intervals.extend(_intervals(events))
+                described.append(_describe(events))
+                fixed.extend(e["fixed"] for e in events if "fixed" in e)
+            self.index.setdefault(ecosystem, {}).setdefault(package_name(ecosystem, package["name"]), []).append({
+                "id": record.get("id", ""),
+                "title": record.get("summary") or record.get("details", "")[:200],
+                "severity": severity,
+                "cve": cve,
+                "intervals": intervals,
+                "versions": set(affected.get("versions") or []),
+                "vulnerable_versions": " || ".join(d for d in described if d),
+                "patched_versions": ", ".join(fixed),
+            })
+            indexed = True
+        self.advisories += indexed
+
+    def covers(self, ecosystem: str) -> bool:
+        return ecosystem in self.index
+
+    def match(self, ecosystem: str, packages: Iterable[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """Vulnerabilities affecting any of the (name, version) pairs, matched in one pass"""
+        by_package: Dict[str, Dict[str, Tuple[str, Optional[VersionKey]]]] = {}
+        for name, version in packages:
+            by_package.setdefault(package_name(ecosystem, name), {})[version] = (name, version_key(version))
+
+        index = self.index.get(ecosystem, {})
+        vulnerabilities = []
+        for package, installed in by_package.items():
+            advisories = index.get(package)
+            if not advisories:
+                continue
+            ordered = sorted((key, version) for version, (_, key) in installed.items() if key is not None)
+            keys = [key for key, _ in ordered]
+            for advisory in advisories:
+                affected = {v for v in installed if v in advisory["versions"]}
+                for start, end, inclusive in advisory["intervals"]:
+                    low = bisect_left(keys, start) if start is not None else 0
+                    high = len(keys) if end is None else (bisect_right if inclusive else bisect_left)(keys, end)
+                    affected.update(version for _, version in ordered[low:high])
+                for version in sorted(affected):
+                    vulnerabilities.append({
+                        "package": installed[version][0],
+                        "installed_version": version,
+                        "severity": advisory["severity"],
+                        "title": advisory["title"],
+                        "vulnerable_versions": advisory["vulnerable_versions"],
+                        "patched_versions": advisory["patched_versions"],
+                        "cve": advisory["cve"],
+                        "advisory_id": advisory["id"],
+                        "source": "osv"
+                    })
+        return vulnerabilities
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "loaded": self.loaded,
+            "version": self.version,
+            "advisories": self.advisories,
+            "ecosystems": {ecosystem: len(packages) for ecosystem, packages in self.index.items()}
+        }
+
+
+def _npm_lock_packages(lock: Dict[str, Any]) -> List[Tuple[str, str]]:
+    packages = []
+    if "packages" in lock:
+        # lockfileVersion 2 and 3
+        for path, entry in lock["packages"].items():
+            if not path or entry.get("link") or "version" not in entry:
+                continue
+            packages.append((entry.get("name") or path.rsplit("node_modules/", 1)[-1], entry["version"]))
+        return packages
+
+    # lockfileVersion 1 nests dependencies
+    pending = [lock.get("dependencies") or {}]
+    while pending:
+        for name, entry in pending.pop().items():
+            if "version" in entry:
+                packages.append((name, entry["version"]))
+            pending.append(entry.get("dependencies") or {})
+    return packages
+
+
+def installed_packages(project_dir: str, ecosystem: str) -> Optional[List[Tuple[str, str]]]:
+    """Pinned (name, version) pairs of a checkout; None without a pinning manifest"""
+    if ecosystem == "npm":
+        for name in NPM_LOCKFILES:
+            path = Path(project_dir, name)
+            if path.is_file():
+                return sorted(set(_npm_lock_packages(json.loads(path.read_text()))))
+        return None
+
+    path = Path(project_dir, "requirements.txt")
+    if not path.is_file():
+        return None
+    return _read_requirements(path)[0]
+
+
+def unpinned_requirements(project_dir: str, ecosystem: str) -> List[str]:
+    """Requirements an offline match cannot check because they pin no exact version"""
+    path = Path(project_dir, "requirements.txt")
+    if ecosystem != "python" or not path.is_file():
+        return []
+    return _read_requirements(path)[1]
+
+
+def _read_requirements(path: Path) -> Tuple[List[Tuple[str, str]], List[str]]:
+    """Pinned (name, version) pairs and the remaining requirement lines of a requirements file"""
+    packages = set()
+    unpinned = []
+    for line in path.read_text().splitlines():
+        line = line.strip()
+        match = PINNED_REQUIREMENT.match(line)
+        if match:
+            packages.add((match.group(1), match.group(2)))
+        elif line and not line.startswith(("#", "-")):
+            unpinned.append(line)
+    return sorted(packages), unpinned
+
+
+advisory_db = AdvisoryDatabase(settings.advisory_db_path)
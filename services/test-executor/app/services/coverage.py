@@ -0,0 +1,239 @@
+"""
+Compact coverage model.
+
+Each file keeps two line bitmaps (executable lines and covered lines) and a
+branch-hit bitmap, stored as Python ints so merges and diffs between runs
+are single bitwise operations. Line and branch percentages are precomputed
+per file and rolled up per directory. Serialised bitmaps are base64, which
+is an order of magnitude smaller than raw Istanbul or coverage.py JSON.
+"""
+import base64
+import posixpath
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+COVERAGE_FORMAT = "tsuite-coverage-v1"
+
+
+def _encode_bits(bits: int) -> str:
+    if not bits:
+        return ""
+    return base64.b64encode(bits.to_bytes((bits.bit_length() + 7) // 8, "little")).decode()
+
+
+def _decode_bits(data: str) -> int:
+    return int.from_bytes(base64.b64decode(data), "little") if data else 0
+
+
+def _bits_for(positions: Iterable[int]) -> int:
+    bits = 0
+    for position in positions:
+        bits |= 1 << position
+    return bits
+
+
+def _percent(covered: int, total: int) -> float:
+    return round(100.0 * covered / total, 2) if total else 100.0
+
+
+def _branch_percent(covered: int, total: int) -> Optional[float]:
+    """None without branch data: a run without branch measurement is not 100% covered"""
+    return _percent(covered, total) if total else None
+
+
+def _summary(line_total: int, line_covered: int, branch_total: int, branch_covered: int) -> Dict[str, Any]:
+    return {
+        "lines": {"total": line_total, "covered": line_covered, "pct": _percent(line_covered, line_total)},
+        "branches": {"total": branch_total, "covered": branch_covered, "pct": _branch_percent(branch_covered, branch_total)},
+    }
+
+
+class FileCoverage:
+    """Line and branch coverage of one source file"""
+
+    __slots__ = ("lines", "covered", "branch_total", "branches")
+
+    def __init__(self, lines: int = 0, covered: int = 0, branch_total: int = 0, branches: int = 0):
+        self.lines = lines            # bit n set: line n is executable
+        self.covered = covered        # bit n set: line n was executed
+        self.branch_total = branch_total
+        self.branches = branches      # bit n set: branch n was taken
+
+    @property
+    def line_total(self) -> int:
+        return self.lines.bit_count()
+
+    @property
+    def line_covered(self) -> int:
+        return self.covered.bit_count()
+
+    @property
+    def branch_covered(self) -> int:
+        return self.branches.bit_count()
+
+    def merge(self, other: "FileCoverage") -> None:
+        """Union with coverage of the same file from another process or shard"""
+        self.lines |= other.lines
+        self.covered |= other.covered
+        self.branch_total = max(self.branch_total, other.branch_total)
+        self.branches |= other.branches
+
+    def summary(self) -> Dict[str, Any]:
+        return _summary(self.line_total, self.line_covered, self.branch_total, self.branch_covered)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "lines": _encode_bits(self.lines),
+            "covered": _encode_bits(self.covered),
+            "branch_total": self.branch_total,
+            "branches": _encode_bits(self.branches),
+            "line_pct": _percent(self.line_covered, self.line_total),
+            "branch_pct": _branch_percent(self.branch_covered, self.branch_total),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FileCoverage":
+        return cls(
+            lines=_decode_bits(data.get("lines", "")),
+            covered=_decode_bits(data.get("covered", "")),
+            branch_total=data.get("branch_total", 0),
+            branches=_decode_bits(data.get("branches", "")),
+        )
+
+    @classmethod
+    def from_istanbul(cls, data: Dict[str, Any]) -> "FileCoverage":
+        """Build from one Istanbul file entry (statementMap/s, branchMap/b)"""
+        if "statementMap" not in data and isinstance(data.get("data"), dict):
+            data = data["data"]
+        coverage = cls()
+        statement_map = data.get("statementMap") or {}
+        counts = data.get("s") or {}
+        for statement_id, location in statement_map.items():
+            line = (location.get("start") or {}).get("line")
+            if not line:
+                continue
+            coverage.lines |= 1 << line
+            if counts.get(statement_id, 0) > 0:
+                coverage.covered |= 1 << line
+
+        position = 0
+        branch_counts = data.get("b") or {}
+        # Istanbul ids are decimal strings; order them numerically
+        for branch_id in sorted(branch_counts, key=lambda k: (len(k), k)):
+            for count in branch_counts[branch_id]:
+                if count > 0:
+                    coverage.branches |= 1 << position
+                position += 1
+        coverage.branch_total = position
+        return coverage
+
+    @classmethod
+    def from_coverage_py(cls, data: Dict[str, Any]) -> "FileCoverage":
+        """
+        Build from one coverage.py JSON file entry.
+
+        Branch identity comes from executed/missing arcs; without them only
+        the summary counts are known and branch bitmaps merge approximately.
+        """
+        executed = data.get("executed_lines") or []
+        missing = data.get("missing_lines") or []
+        coverage = cls(lines=_bits_for(executed) | _bits_for(missing), covered=_bits_for(executed))
+
+        executed_arcs = [tuple(a) for a in data.get("executed_branches") or []]
+        missing_arcs = [tuple(a) for a in data.get("missing_branches") or []]
+        if executed_arcs or missing_arcs:
+            all_arcs: List[Tuple[int, int]] = sorted(set(executed_arcs) | set(missing_arcs))
+            taken = set(executed_arcs)
+            coverage.branch_total = len(all_arcs)
+            coverage.branches = _bits_for(i for i, arc in enumerate(all_arcs) if arc in taken)
+        else:
+            summary = data.get("summary") or {}
+            coverage.branch_total = summary.get("num_branches", 0)
+            coverage.branches = (1 << summary.get("covered_branches", 0)) - 1
+        return coverage
+
+
+class CoverageReport:
+    """Coverage of a whole run, keyed by repository-relative path"""
+
+    def __init__(self, files: Optional[Dict[str, FileCoverage]] = None):
+        self.files: Dict[str, FileCoverage] = files or {}
+
+    def add(self, path: str, coverage: FileCoverage) -> None:
+        if path in self.files:
+            self.files[path].merge(coverage)
+        else:
+            self.files[path] = coverage
+
+    def merge(self, other: "CoverageReport") -> None:
+        for path, coverage in other.files.items():
+            self.add(path, FileCoverage(coverage.lines, coverage.covered, coverage.branch_total, coverage.branches))
+
+    def summary(self) -> Dict[str, Any]:
+        return _summary(
+            sum(f.line_total for f in self.files.values()),
+            sum(f.line_covered for f in self.files.values()),
+            sum(f.branch_total for f in self.files.values()),
+            sum(f.branch_covered for f in self.files.values()),
+        )
+
+    def directories(self) -> Dict[str, Dict[str, Any]]:
+        """Per-directory rollups, including every ancestor directory"""
+        totals: Dict[str, List[int]] = {}
+        for path, coverage in self.files.items():
+            directory = posixpath.dirname(path)
+            while True:
+                entry = totals.setdefault(directory or ".", [0, 0, 0, 0])
+                entry[0] += coverage.line_total
+                entry[1] += coverage.line_covered
+                entry[2] += coverage.branch_total
+                entry[3] += coverage.branch_covered
+                parent = posixpath.dirname(directory)
+                if not directory or parent == directory:
+                    break
+                directory = parent
+        return {directory: _summary(*counts) for directory, counts in sorted(totals.items())}
+
+    def diff(self, previous: "CoverageReport") -> Dict[str, Dict[str, int]]:
+        """Lines newly covered and newly uncovered per file compared to ``previous``"""
+        changes = {}
+        for path in set(self.files) | set(previous.files):
+            now = self.files.get(path, FileCoverage()).covered
+            before = previous.files.get(path, FileCoverage()).covered
+            gained = (now & ~before).bit_count()
+            lost = (before & ~now).bit_count()
+            if gained or lost:
+                changes[path] = {"newly_covered": gained, "newly_uncovered": lost}
+        return changes
+
+    def to_dict(self) -> Dict[str, Any]:
+        if not self.files:
+            return {}
+        return {
+            "format": COVERAGE_FORMAT,
+            "summary": self.summary(),
+            "directories": self.directories(),
+            "files": {path: coverage.to_dict() for path, coverage in sorted(self.files.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CoverageReport":
+        if data.get("format") != COVERAGE_FORMAT:
+            return cls()
+        return cls({path: FileCoverage.from_dict(entry) for path, entry in data.get("files", {}).items()})
+
+    @classmethod
+    def from_coverage_py(cls, data: Dict[str, Any], root: Optional[str] = None) -> "CoverageReport":
+        report = cls()
+        for path, entry in (data.get("files") or {}).items():
+            report.add(relative_path(path, root), FileCoverage.from_coverage_py(entry))
+        return report
+
+
+def relative_path(path: str, root: Optional[str]) -> str:
+    """Repository-relative POSIX path, so runs in different workspaces compare"""
+    path = path.replace("\\", "/")
+    if root:
+        prefix = root.replace("\\", "/").rstrip("/") + "/"
+        if path.startswith(prefix):
+            path = path[len(prefix):]
+    return path[2:] if path.startswith("./") else path
@@ -0,0 +1,360 @@
+"""
+Content-addressed dependency install cache.
+
+Entries are keyed by the hash of a project's lockfile. ``node_modules``
+trees are restored into each workspace with hardlinks, and virtualenvs are
+built once per key and used in place. Entries are evicted least recently
+used first once the cache grows past its disk budget.
+
+Restored files share inodes with the cache, so cached node_modules files
+are made read-only and fingerprinted when stored. A restore whose entry no
+longer matches its fingerprint (something wrote through a shared inode)
+discards the entry instead of handing the modified tree to another run.
+
+Several worker processes share the cache directory. A virtualenv is built
+under an exclusive file lock and pinned with a shared one while tests run
+in it; eviction skips any entry another process has pinned. Entry metadata
+is replaced atomically, so readers never see a half-written file.
+"""
+import asyncio
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager, suppress
+from pathlib import Path
+from typing import AsyncIterator, Dict, Optional
+
+from app.config import settings
+from app.services.process import run_process
+
+logger = logging.getLogger(__name__)
+
+# Lockfiles that pin a project's dependencies, in order of preference
+LOCKFILES = {
+    "npm": ["package-lock.json", "yarn.lock"],
+    "python": ["requirements.txt"],
+}
+
+# Tooling the default pytest command needs inside each cached virtualenv
+PYTEST_TOOLING = ["pytest", "pytest-json-report", "pytest-cov"]
+
+META_FILE = "meta.json"
+
+# Lock files live apart from the entries; they are never removed, since
+# unlinking a lock file would let two holders lock different inodes
+LOCK_DIR = ".locks"
+
+# Seconds between attempts to take a file lock another process holds
+LOCK_POLL_INTERVAL = 0.2
+
+
+def _link_or_copy(src: str, dst: str) -> None:
+    """Hardlink a file, falling back to a copy across filesystems"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _link_tree(src: Path, dst: Path) -> None:
+    shutil.copytree(src, dst, symlinks=True, copy_function=_link_or_copy)
+
+
+def _seal_tree(root: Path) -> None:
+    """Clear the write bits of every regular file in a tree"""
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            st = os.lstat(path)
+            if stat.S_ISREG(st.st_mode) and st.st_mode & 0o222:
+                os.chmod(path, stat.S_IMODE(st.st_mode) & ~0o222)
+
+
+def _tree_fingerprint(root: Path) -> str:
+    """Hash of every regular file's path, size, mtime and mode"""
+    digest = hashlib.sha256()
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            path = os.path.join(dirpath, name)
+            st = os.lstat(path)
+            if stat.S_ISREG(st.st_mode):
+                rel = os.path.relpath(path, root)
+                digest.update(f"{rel}\0{st.st_size}\0{st.st_mtime_ns}\0{st.st_mode}\n".encode())
+    return digest.hexdigest()
+
+
+def _try_flock(path: Path, operation: int) -> Optional[int]:
+    """Open ``path`` and take a non-blocking flock on it; the descriptor, or None if another holder conflicts"""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, operation | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    except BaseException:
+        os.close(fd)
+        raise
+    return fd
+
+
+async def _flock(path: Path, operation: int) -> int:
+    """Wait for a flock without blocking the event loop; closing the descriptor releases it"""
+    while True:
+        fd = _try_flock(path, operation)
+        if fd is not None:
+            return fd
+        await asyncio.sleep(LOCK_POLL_INTERVAL)
+
+
+def _tree_size(root: Path) -> int:
+    """Disk usage of a tree, counting hardlinked inodes once"""
+    seen = set()
+    total = 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            try:
+                st = os.lstat(os.path.join(dirpath, name))
+            except OSError:
+                continue
+            if (st.st_dev, st.st_ino) in seen:
+                continue
+            seen.add((st.st_dev, st.st_ino))
+            total += st.st_size
+    return total
+
+
+class DependencyCache:
+    """Lockfile-keyed cache of installed dependency trees"""
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._in_use: Dict[str, int] = {}
+
+    def lockfile_key(self, project_dir: str, ecosystem: str) -> Optional[str]:
+        """Hash the project's lockfile; None when it has no lockfile"""
+        for name in LOCKFILES[ecosystem]:
+            path = Path(project_dir, name)
+            if path.is_file():
+                digest = hashlib.sha256()
+                digest.update(f"{ecosystem}:{name}\0".encode())
+                if ecosystem == "python":
+                    digest.update(f"{sys.version}\0{','.join(PYTEST_TOOLING)}\0".encode())
+                digest.update(path.read_bytes())
+                return f"{ecosystem}-{digest.hexdigest()[:32]}"
+        return None
+
+    def _entry(self, key: str) -> Path:
+        return self.cache_dir / key
+
+    def _lock(self, key: str) -> asyncio.Lock:
+        if key not in self._locks:
+            self._locks[key] = asyncio.Lock()
+        return self._locks[key]
+
+    def _lock_file(self, key: str, kind: str) -> Path:
+        """Cross-process lock file of an entry: ``build`` (exclusive) or ``pin`` (shared while in use)"""
+        locks = self.cache_dir / LOCK_DIR
+        locks.mkdir(parents=True, exist_ok=True)
+        return locks / f"{key}.{kind}"
+
+    def _read_meta(self, entry: Path) -> Optional[Dict]:
+        try:
+            return json.loads((entry / META_FILE).read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, entry: Path, meta: Dict) -> None:
+        fd, staging = tempfile.mkstemp(dir=entry, prefix=f".{META_FILE}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(meta, f)
+            os.replace(staging, entry / META_FILE)
+        except BaseException:
+            with suppress(OSError):
+                os.unlink(staging)
+            raise
+
+    def _touch(self, entry: Path) -> Optional[Dict]:
+        """Mark a complete entry as used now; None if the entry is missing or partial"""
+        meta = self._read_meta(entry)
+        if meta is None:
+            return None
+        meta["last_used"] = time.time()
+        try:
+            self._write_meta(entry, meta)
+        except OSError:
+            # Evicted by another process since it was read
+            return None
+        return meta
+
+    async def _discard(self, entry: Path) -> None:
+        trash = entry.with_name(f".{entry.name}.{time.monotonic_ns()}.evicted")
+        try:
+            entry.rename(trash)
+        except OSError:
+            return
+        await asyncio.to_thread(shutil.rmtree, trash, True)
+
+    async def restore_node_modules(self, key: str, project_dir: str) -> bool:
+        """Hardlink a cached node_modules tree into ``project_dir``"""
+        entry = self._entry(key)
+        meta = self._touch(entry)
+        if meta is None:
+            return False
+        try:
+            fingerprint = await asyncio.to_thread(_tree_fingerprint, entry / "node_modules")
+        except OSError:
+            fingerprint = None
+        if fingerprint is None or fingerprint != meta.get("fingerprint"):
+            logger.warning(f"Discarding modified dependency cache entry {key}")
+            await self._discard(entry)
+            return False
+        try:
+            await asyncio.to_thread(_link_tree, entry / "node_modules", Path(project_dir, "node_modules"))
+        except OSError as e:
+            logger.warning(f"Could not restore node_modules for {key}: {e}")
+            shutil.rmtree(Path(project_dir, "node_modules"), ignore_errors=True)
+            return False
+        return True
+
+    async def store_node_modules(self, key: str, project_dir: str) -> None:
+        """Add a freshly installed node_modules tree to the cache"""
+        source = Path(project_dir, "node_modules")
+        if not source.is_dir():
+            return
+
+        async with self._lock(key):
+            entry = self._entry(key)
+            if self._read_meta(entry) is not None:
+                return
+
+            staging = self.cache_dir / f".{key}.{os.getpid()}.tmp"
+            try:
+                staging.mkdir(parents=True)
+                await asyncio.to_thread(_link_tree, source, staging / "node_modules")
+                await asyncio.to_thread(_seal_tree, staging / "node_modules")
+                fingerprint = await asyncio.to_thread(_tree_fingerprint, staging / "node_modules")
+                size = await asyncio.to_thread(_tree_size, staging)
+                self._write_meta(staging, {
+                    "size": size,
+                    "fingerprint": fingerprint,
+                    "created": time.time(),
+                    "last_used": time.time(),
+                })
+                shutil.rmtree(entry, ignore_errors=True)
+                staging.rename(entry)
+            except OSError as e:
+                logger.warning(f"Could not cache node_modules for {key}: {e}")
+                shutil.rmtree(staging, ignore_errors=True)
+                return
+
+        await self.evict()
+
+    async def _build_virtualenv(self, key: str, project_dir: str, timeout: float) -> None:
+        """Create the venv at its final path; virtualenvs are not relocatable"""
+        entry = self._entry(key)
+        shutil.rmtree(entry, ignore_errors=True)
+        entry.mkdir(parents=True)
+        venv = entry / "venv"
+
+        logger.info(f"Building cached virtualenv {key}")
+        result = await run_process([sys.executable, "-m", "venv", str(venv)], timeout=timeout)
+        if result.returncode != 0:
+            raise Exception(f"virtualenv creation failed: {result.stderr}")
+
+        result = await run_process(
+            [str(venv / "bin" / "pip"), "install", "-r", "requirements.txt", *PYTEST_TOOLING],
+            cwd=project_dir,
+            timeout=timeout
+        )
+        if result.returncode != 0:
+            raise Exception(f"pip install failed: {result.stderr}")
+
+        size = await asyncio.to_thread(_tree_size, entry)
+        self._write_meta(entry, {"size": size, "created": time.time(), "last_used": time.time()})
+
+    @asynccontextmanager
+    async def virtualenv(self, key: str, project_dir: str, timeout: float = 600) -> AsyncIterator[Path]:
+        """
+        Yield a cached virtualenv for ``key``, building it on a miss.
+
+        The entry is pinned while the context is open so eviction never
+        removes a virtualenv that a running test process is using, in this
+        or any other process sharing the cache directory.
+        """
+        async with self._lock(key):
+            build = await _flock(self._lock_file(key, "build"), fcntl.LOCK_EX)
+            try:
+                pin = await _flock(self._lock_file(key, "pin"), fcntl.LOCK_SH)
+                entry = self._entry(key)
+                if self._touch(entry) is None:
+                    try:
+                        await self._build_virtualenv(key, project_dir, timeout)
+                    except BaseException:
+                        shutil.rmtree(entry, ignore_errors=True)
+                        os.close(pin)
+                        raise
+            finally:
+                os.close(build)
+            self._in_use[key] = self._in_use.get(key, 0) + 1
+
+        try:
+            await self.evict()
+            yield entry / "venv"
+        finally:
+            self._in_use[key] -= 1
+            if not self._in_use[key]:
+                del self._in_use[key]
+            os.close(pin)
+
+    async def evict(self) -> None:
+        """Remove least recently used entries until the cache fits its budget"""
+        if not self.cache_dir.exists():
+            return
+
+        entries = []
+        for entry in self.cache_dir.iterdir():
+            meta = self._read_meta(entry) if entry.is_dir() else None
+            if meta is not None:
+                entries.append((meta.get("last_used", 0), meta.get("size", 0), entry))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            if entry.name in self._in_use or self._lock(entry.name).locked():
+                continue
+            # Another process may be running tests in this entry
+            pin = _try_flock(self._lock_file(entry.name, "pin"), fcntl.LOCK_EX)
+            if pin is None:
+                continue
+            try:
+                logger.info(f"Evicting dependency cache entry {entry.name}")
+                await self._discard(entry)
+            finally:
+                os.close(pin)
+            total -= size
+
+
+def virtualenv_environment(venv: Path) -> Dict[str, str]:
+    """Environment variables that activate ``venv`` for a child process"""
+    return {
+        "VIRTUAL_ENV": str(venv),
+        "PATH": f"{venv / 'bin'}{os.pathsep}{os.environ.get('PATH', '')}",
+    }
+
+
+dependency_cache = DependencyCache(
+    settings.dependency_cache_dir,
+    max_bytes=settings.dependency_cache_max_mb * 1024 * 1024
+)
@@ -0,0 +1,146 @@
+"""
+Live event streams for test runs.
+
+Runners publish output lines, phase changes, progress and per-test results
+while a run executes; the streaming endpoints subscribe per run id. Each run
+keeps a bounded backlog so late subscribers see what they missed. A channel
+that only ever had subscribers (the run executes in another process) is
+dropped when its last subscriber leaves.
+"""
+import asyncio
+import logging
+import threading
+from collections import OrderedDict, deque
+from itertools import islice
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Event type that terminates a stream
+END_EVENT = "end"
+
+
+class _RunChannel:
+    def __init__(self, history: int):
+        self.history: Deque[Dict[str, Any]] = deque(maxlen=history)
+        self.subscribers: List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = []
+        self.seq = 0
+        self.closed = False
+
+
+class RunEventBus:
+    """
+    In-process publish/subscribe hub keyed by run id.
+
+    Publishing is thread-safe (Celery eager tasks publish from worker
+    threads); subscribers are woken on their own event loop.
+    """
+
+    def __init__(self, history: int = 500, max_runs: int = 1000, queue_size: int = 1000):
+        self.history = history
+        self.max_runs = max_runs
+        self.queue_size = queue_size
+        self._channels: "OrderedDict[str, _RunChannel]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _channel(self, run_id: str) -> _RunChannel:
+        channel = self._channels.get(run_id)
+        if channel is None:
+            channel = self._channels[run_id] = _RunChannel(self.history)
+            # Forget the oldest finished runs once too many are retained;
+            # runs still streaming are skipped, not waited for
+            excess = len(self._channels) - self.max_runs
+            if excess > 0:
+                finished = list(islice((run for run, c in self._channels.items() if c.closed), excess))
+                for finished_id in finished:
+                    del self._channels[finished_id]
+        return channel
+
+    def publish(self, run_id: str, event: Dict[str, Any]) -> None:
+        """Append an event to a run's stream"""
+        with self._lock:
+            channel = self._channel(run_id)
+            if channel.closed:
+                return
+            channel.seq += 1
+            event = {"seq": channel.seq, **event}
+            channel.history.append(event)
+            if event["type"] == END_EVENT:
+                channel.closed = True
+            subscribers = list(channel.subscribers)
+
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(self._deliver, queue, event)
+
+    @staticmethod
+    def _deliver(queue: asyncio.Queue, event: Dict[str, Any]) -> None:
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow consumer: drop output rather than buffer without bound,
+            # but always deliver the terminating event
+            if event["type"] == END_EVENT:
+                queue.get_nowait()
+                queue.put_nowait(event)
+
+    def close(self, run_id: str, **fields: Any) -> None:
+        """Terminate a run's stream"""
+        self.publish(run_id, {"type": END_EVENT, **fields})
+
+    def has_run(self, run_id: str) -> bool:
+        with self._lock:
+            return run_id in self._channels
+
+    async def subscribe(
+        self,
+        run_id: str,
+        after_seq: int = 0,
+        heartbeat: Optional[float] = None,
+    ) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Yield a run's backlog (after ``after_seq``) and then live events
+        until the stream ends. With ``heartbeat`` set, None is yielded
+        whenever no event arrives for that many seconds.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            channel = self._channel(run_id)
+            backlog = [e for e in channel.history if e["seq"] > after_seq]
+            closed = channel.closed
+            subscriber = (loop, queue)
+            if not closed:
+                channel.subscribers.append(subscriber)
+
+        try:
+            last_seq = after_seq
+            for event in backlog:
+                last_seq = event["seq"]
+                yield event
+                if event["type"] == END_EVENT:
+                    return
+            if closed:
+                return
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if event["seq"] <= last_seq:
+                    continue
+                last_seq = event["seq"]
+                yield event
+                if event["type"] == END_EVENT:
+                    return
+        finally:
+            with self._lock:
+                if subscriber in channel.subscribers:
+                    channel.subscribers.remove(subscriber)
+                # Nothing was ever published here: the run executes elsewhere
+                if not channel.subscribers and not channel.seq and self._channels.get(run_id) is channel:
+                    del self._channels[run_id]
+
+
+run_events = RunEventBus()
@@ -0,0 +1,212 @@
+"""
+Change-based test impact analysis.
+
+A run with impact analysis diffs the requested commit against a base and
+executes only the tests that can observe the change. Jest resolves related
+tests itself (``--findRelatedTests``); for pytest a file-level import graph
+is kept per repository, refreshed incrementally after every run. Whenever
+the change cannot be mapped reliably the full suite runs instead.
+"""
+import ast
+import asyncio
+import logging
+import posixpath
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from app.services.process import run_process
+from app.services.result_store import ResultStore, get_result_store
+
+logger = logging.getLogger(__name__)
+
+# Changes to these files can affect any test, so they always select the full suite
+PYTHON_FULL_SUITE_FILES = {
+    "conftest.py", "requirements.txt", "requirements-dev.txt", "setup.py",
+    "setup.cfg", "pyproject.toml", "pytest.ini", "tox.ini", ".coveragerc",
+}
+JEST_FULL_SUITE_FILES = {"package.json", "package-lock.json", "yarn.lock", ".babelrc", "tsconfig.json"}
+JEST_FULL_SUITE_PREFIXES = ("jest.config", "babel.config", "jest.setup")
+
+# Documentation never affects test outcomes
+DOC_SUFFIXES = (".md", ".rst", ".adoc")
+
+# Directories that are never part of the project's own import graph
+IGNORED_DIRS = {".git", "node_modules", "__pycache__", ".venv", "venv", "site-packages", ".tox"}
+
+
+async def changed_files(workdir: str, base: str, head: str = "HEAD") -> Optional[List[str]]:
+    """Paths changed between two commits, or None if either is unavailable"""
+    result = await run_process(
+        ["git", "diff", "--name-only", "--no-renames", base, head],
+        cwd=workdir,
+        timeout=60
+    )
+    if result.returncode != 0:
+        logger.info(f"Cannot diff {base}..{head}: {result.stderr.strip()}")
+        return None
+    return [line for line in result.stdout.splitlines() if line]
+
+
+async def tracked_files(workdir: str) -> Optional[List[str]]:
+    """Paths tracked in a checkout, or None outside a git work tree"""
+    result = await run_process(["git", "ls-files", "-z"], cwd=workdir, timeout=120)
+    if result.returncode != 0:
+        return None
+    return [path for path in result.stdout.split("\0") if path]
+
+
+async def resolve_commit(workdir: str, rev: str = "HEAD") -> Optional[str]:
+    """Full SHA of ``rev`` in a checkout"""
+    result = await run_process(["git", "rev-parse", "--verify", "--quiet", f"{rev}^{{commit}}"], cwd=workdir, timeout=30)
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def requires_full_suite(framework: str, paths: Iterable[str]) -> Optional[str]:
+    """Reason the change must run every test, if any"""
+    for path in paths:
+        name = posixpath.basename(path)
+        if framework == "pytest":
+            if name in PYTHON_FULL_SUITE_FILES or name.startswith("requirements"):
+                return f"{path} affects the whole suite"
+            if not path.endswith(".py") and not path.endswith(DOC_SUFFIXES):
+                return f"{path} is not mapped to tests"
+        elif name in JEST_FULL_SUITE_FILES or name.startswith(JEST_FULL_SUITE_PREFIXES):
+            return f"{path} affects the whole suite"
+    return None
+
+
+def is_python_test_file(path: str) -> bool:
+    name = posixpath.basename(path)
+    return name.endswith(".py") and (name.startswith("test_") or name.endswith("_test.py"))
+
+
+def _module_names(path: str) -> List[str]:
+    """Every dotted name ``path`` may be imported as (one per possible source root)"""
+    parts = path[:-3].split("/")
+    if parts[-1] == "__init__":
+        parts = parts[:-1]
+    return [".".join(parts[i:]) for i in range(len(parts))]
+
+
+def _imported_modules(path: str, source: str) -> Set[str]:
+    """Absolute module names a Python file imports (relative imports resolved)"""
+    tree = ast.parse(source, filename=path)
+    package = path[:-3].split("/")[:-1]
+    modules: Set[str] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                base = package[:len(package) - node.level + 1] if node.level > 1 else package
+                prefix = ".".join(base + ([node.module] if node.module else []))
+            else:
+                prefix = node.module or ""
+            if prefix:
+                modules.add(prefix)
+                # "from pkg import mod" may name a submodule
+                modules.update(f"{prefix}.{alias.name}" for alias in node.names if alias.name != "*")
+    return modules
+
+
+class ImportGraph:
+    """File-level import graph of a Python project: path -> imported module names"""
+
+    def __init__(self, imports: Optional[Dict[str, List[str]]] = None):
+        self.imports: Dict[str, List[str]] = imports or {}
+
+    @classmethod
+    def build(cls, root: str) -> "ImportGraph":
+        graph = cls()
+        base = Path(root)
+        for file in base.rglob("*.py"):
+            relative = file.relative_to(base)
+            if IGNORED_DIRS.intersection(relative.parts[:-1]):
+                continue
+            graph.refresh(root, [relative.as_posix()])
+        return graph
+
+    def refresh(self, root: str, paths: Iterable[str]) -> None:
+        """Re-read the given files; files that no longer exist are dropped"""
+        for path in paths:
+            if not path.endswith(".py"):
+                continue
+            file = Path(root) / path
+            try:
+                self.imports[path] = sorted(_imported_modules(path, file.read_text(errors="replace")))
+            except FileNotFoundError:
+                self.imports.pop(path, None)
+            except (OSError, SyntaxError, ValueError):
+                # Unparseable files keep no edges; changing them still selects themselves
+                self.imports[path] = []
+
+    def affected_tests(self, changed: Iterable[str]) -> Set[str]:
+        """Test files that import any changed file, directly or transitively"""
+        providers: Dict[str, Set[str]] = {}
+        for path in self.imports:
+            for name in _module_names(path):
+                providers.setdefault(name, set()).add(path)
+
+        importers: Dict[str, Set[str]] = {}
+        for path, modules in self.imports.items():
+            for module in modules:
+                # "import a.b.c" also executes a/__init__.py and a/b/__init__.py
+                parts = module.split(".")
+                for i in range(1, len(parts) + 1):
+                    for provider in providers.get(".".join(parts[:i]), ()):
+                        if provider != path:
+                            importers.setdefault(provider, set()).add(path)
+
+        seen = set(changed)
+        queue = deque(seen)
+        while queue:
+            for importer in importers.get(queue.popleft(), ()):
+                if importer not in seen:
+                    seen.add(importer)
+                    queue.append(importer)
+        return {path for path in seen if is_python_test_file(path)}
+
+    def to_dict(self, commit: str) -> Dict[str, Any]:
+        return {"commit": commit, "imports": self.imports}
+
+
+class ImpactMapStore:
+    """Per-repository import graphs, tagged with the commit they describe"""
+
+    def __init__(self, store: ResultStore):
+        self.store = store
+
+    def get(self, repository_url: str) -> Optional[Dict[str, Any]]:
+        return self.store.get(f"pytest:{repository_url}")
+
+    async def current(self, repository_url: str, workdir: str, commit: str) -> Optional[ImportGraph]:
+        """
+        The stored graph refreshed to ``commit``, or None when it is stale:
+        never recorded, or recorded at a commit this checkout cannot diff against.
+        """
+        stored = await self.store.call(self.get, repository_url)
+        if not stored:
+            return None
+        graph = ImportGraph(stored["imports"])
+        if stored["commit"] != commit:
+            drift = await changed_files(workdir, stored["commit"], commit)
+            if drift is None:
+                return None
+            await asyncio.to_thread(graph.refresh, workdir, drift)
+        return graph
+
+    async def update(self, repository_url: str, workdir: str, commit: str) -> ImportGraph:
+        """
+        Record the graph at ``commit``: only files changed since the stored
+        commit are re-parsed; without a usable stored graph the whole
+        checkout is scanned.
+        """
+        graph = await self.current(repository_url, workdir, commit)
+        if graph is None:
+            graph = await asyncio.to_thread(ImportGraph.build, workdir)
+        await self.store.aset(f"pytest:{repository_url}", graph.to_dict(commit))
+        return graph
+
+
+impact_maps = ImpactMapStore(get_result_store("impact_maps"))
@@ -0,0 +1,238 @@
+"""
+Pool of pre-started pytest interpreters.
+
+A pytest run spends its first few hundred milliseconds starting Python and
+importing pytest, coverage and the report plugins, which dominates small
+suites. The pool keeps interpreters of each cached virtualenv waiting with
+those modules imported; a run sends its arguments, working directory and
+environment over stdin and the waiting interpreter becomes that pytest
+process. Runs whose environment changes interpreter start-up (``PYTHON*``,
+locale or ``HOME``) always get a freshly started process.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.config import settings
+from app.services.dependency_cache import virtualenv_environment
+from app.services.metrics import POOL_CHECKOUTS, POOL_IDLE
+from app.services.process import OutputCallback, ProcessResult, kill_process_group, run_process, start_process
+from app.services.scheduler import execution_scheduler
+
+logger = logging.getLogger(__name__)
+
+# Executed by each pooled interpreter: import what every run needs, then wait for a run
+BOOTSTRAP = """
+import json, os, sys
+import pytest
+for module in ("_pytest.python", "_pytest.terminal", "_pytest.fixtures", "coverage", "pytest_cov.plugin", "pytest_jsonreport.plugin"):
+    try:
+        __import__(module)
+    except ImportError:
+        pass
+# Like the pytest script, do not put the working directory on sys.path
+if sys.path and sys.path[0] == "":
+    del sys.path[0]
+line = sys.stdin.readline()
+if not line:
+    sys.exit(0)
+request = json.loads(line)
+os.chdir(request["cwd"])
+os.environ.clear()
+os.environ.update(request["env"])
+sys.argv = ["pytest", *request["args"]]
+sys.exit(pytest.console_main())
+"""
+
+
+# Variables read when the interpreter starts (sys.path, site, locale), which a waiting interpreter cannot apply later
+STARTUP_VARIABLES = ("PYTHON", "LC_", "LANG", "HOME")
+
+
+def _startup_environment(env: Dict[str, str]) -> Dict[str, str]:
+    return {key: value for key, value in env.items() if key.startswith(STARTUP_VARIABLES)}
+
+
+def _generation(venv: Path) -> Optional[Tuple[int, float]]:
+    """Identity of a virtualenv build; changes when the cache evicts and rebuilds it"""
+    try:
+        st = (venv / "pyvenv.cfg").stat()
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime)
+
+
+@dataclass
+class _Interpreter:
+    process: asyncio.subprocess.Process
+    loop: asyncio.AbstractEventLoop
+    generation: Tuple[int, float]
+    environment: Dict[str, str]
+    started: float
+
+
+class InterpreterPool:
+    """Idle pytest interpreters per virtualenv"""
+
+    def __init__(self, enabled: bool, max_idle: int, idle_ttl: float):
+        self.enabled = enabled
+        self.max_idle = max_idle
+        self.idle_ttl = idle_ttl
+        self._idle: Dict[str, List[_Interpreter]] = {}
+        self._refilling: Set[Tuple[str, int]] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def target(self) -> int:
+        """Idle interpreters to keep per virtualenv: one per queued job, at least one"""
+        return max(1, min(self.max_idle, execution_scheduler.stats()["queued"]))
+
+    def _discard(self, interpreter: _Interpreter) -> None:
+        kill_process_group(interpreter.process)
+
+    def _prune(self, venv: str) -> None:
+        """Stop interpreters that can no longer be handed out (dead, stale, expired or on a closed loop)"""
+        generation = _generation(Path(venv))
+        keep = []
+        for interpreter in self._idle.get(venv, []):
+            expired = time.monotonic() - interpreter.started >= self.idle_ttl
+            if interpreter.loop.is_closed() or interpreter.process.returncode is not None \
+                    or interpreter.generation != generation or expired:
+                self._discard(interpreter)
+            else:
+                keep.append(interpreter)
+        self._idle[venv] = keep
+
+    def take(self, venv: Path, env: Dict[str, str]) -> Optional[asyncio.subprocess.Process]:
+        """A waiting interpreter that can run with ``env``, or None"""
+        if not self.enabled:
+            return None
+        loop = asyncio.get_running_loop()
+        key = str(venv)
+        self._prune(key)
+        wanted = _startup_environment(env)
+        for index, interpreter in enumerate(self._idle.get(key, [])):
+            if interpreter.loop is loop and interpreter.environment == wanted:
+                del self._idle[key][index]
+                return interpreter.process
+        return None
+
+    async def _spawn(self, venv: Path) -> _Interpreter:
+        env = {**os.environ, **virtualenv_environment(venv)}
+        process = await start_process(
+            [str(venv / "bin" / "python"), "-c", BOOTSTRAP],
+            cwd=str(venv),
+            env=env,
+            stdin=True
+        )
+        return _Interpreter(
+            process=process,
+            loop=asyncio.get_running_loop(),
+            generation=_generation(venv),
+            environment=_startup_environment(env),
+            started=time.monotonic()
+        )
+
+    async def fill(self, venv: Path) -> int:
+        """Start interpreters until ``venv`` has its target idle count on this loop"""
+        key = str(venv)
+        loop = asyncio.get_running_loop()
+        created = 0
+        self._prune(key)
+        while sum(interpreter.loop is loop for interpreter in self._idle.get(key, [])) < self.target():
+            if _generation(venv) is None:
+                break
+            try:
+                interpreter = await self._spawn(venv)
+            except OSError as e:
+                logger.warning(f"Could not pre-start an interpreter for {venv}: {e}")
+                break
+            self._idle.setdefault(key, []).append(interpreter)
+            created += 1
+        if created:
+            loop.call_later(self.idle_ttl, self._prune, key)
+        return created
+
+    def refill(self, venv: Path) -> None:
+        """Top up ``venv``'s interpreters in the background"""
+        if not self.enabled:
+            return
+        loop = asyncio.get_running_loop()
+        key = (str(venv), id(loop))
+        if key in self._refilling:
+            return
+        self._refilling.add(key)
+
+        async def run() -> None:
+            try:
+                await self.fill(venv)
+            finally:
+                self._refilling.discard(key)
+
+        task = loop.create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def run(
+        self,
+        venv: Path,
+        args: List[str],
+        cwd: str,
+        env: Dict[str, str],
+        timeout: Optional[float] = None,
+        on_output: Optional[OutputCallback] = None
+    ) -> ProcessResult:
+        """
+        Run ``pytest <args[1:]>`` from ``venv``, in a waiting interpreter when
+        one fits. The pool is topped up once the run ends, so replacements
+        never compete with it for CPU.
+        """
+        process = self.take(venv, env)
+        if self.enabled:
+            POOL_CHECKOUTS.labels(pool="interpreter", result="hit" if process else "miss").inc()
+        try:
+            if process is None:
+                return await run_process(args, cwd=cwd, env=env, timeout=timeout, on_output=on_output)
+            request = json.dumps({"cwd": cwd, "env": env, "args": args[1:]}) + "\n"
+            return await run_process(
+                args,
+                cwd=cwd,
+                env=env,
+                timeout=timeout,
+                on_output=on_output,
+                process=process,
+                input=request.encode()
+            )
+        finally:
+            self.refill(venv)
+
+    async def close(self) -> None:
+        """Stop every idle interpreter"""
+        idle = [interpreter for interpreters in self._idle.values() for interpreter in interpreters]
+        self._idle.clear()
+        loop = asyncio.get_running_loop()
+        for interpreter in idle:
+            self._discard(interpreter)
+        await asyncio.gather(*(interpreter.process.wait() for interpreter in idle if interpreter.loop is loop))
+
+    def idle_count(self) -> int:
+        return sum(len(interpreters) for interpreters in self._idle.values())
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "idle": {venv: len(interpreters) for venv, interpreters in self._idle.items() if interpreters},
+            "target": self.target()
+        }
+
+
+interpreter_pool = InterpreterPool(
+    settings.interpreter_pool_enabled,
+    max_idle=settings.interpreter_pool_max_idle,
+    idle_ttl=settings.interpreter_pool_idle_ttl
+)
+POOL_IDLE.labels(pool="interpreter").set_function(interpreter_pool.idle_count)
@@ -0,0 +1,181 @@
+"""
+Prometheus metrics for the executor.
+
+Phase histograms (and matching trace spans) show where run and scan time
+and child-process CPU, memory and I/O go, counters record
+outcomes and timeouts, and queue depth, active jobs and result-store sizes
+are read from their owners whenever ``/metrics`` is scraped.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client.core import GaugeMetricFamily
+
+from app.services.resources import ResourceUsage, accounted_phase
+from app.services.result_store import result_stores
+from app.services.scheduler import execution_scheduler
+from app.services.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# Phases range from sub-second parses to half-hour installs
+PHASE_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 1800)
+# Child process memory and I/O, from 1 MiB to 64 GiB
+BYTE_BUCKETS = tuple(2 ** 20 * 4 ** power for power in range(9))
+
+TEST_PHASE_SECONDS = Histogram(
+    "tsuite_test_phase_seconds",
+    "Duration of each test run phase (clone, install, run, parse, cleanup)",
+    ["framework", "phase"],
+    buckets=PHASE_BUCKETS
+)
+SCAN_PHASE_SECONDS = Histogram(
+    "tsuite_scan_phase_seconds",
+    "Duration of each security scan phase (checkout, scan, cleanup)",
+    ["scanner", "phase"],
+    buckets=PHASE_BUCKETS
+)
+TEST_PHASE_CPU_SECONDS = Histogram(
+    "tsuite_test_phase_cpu_seconds",
+    "CPU time used by the child processes of each test run phase",
+    ["framework", "phase"],
+    buckets=PHASE_BUCKETS
+)
+TEST_PHASE_PEAK_RSS = Histogram(
+    "tsuite_test_phase_peak_rss_bytes",
+    "Peak memory of the largest child process tree in each test run phase",
+    ["framework", "phase"],
+    buckets=BYTE_BUCKETS
+)
+TEST_PHASE_IO_BYTES = Histogram(
+    "tsuite_test_phase_io_bytes",
+    "Storage bytes read or written by the child processes of each test run phase",
+    ["framework", "phase", "direction"],
+    buckets=BYTE_BUCKETS
+)
+SCAN_PHASE_CPU_SECONDS = Histogram(
+    "tsuite_scan_phase_cpu_seconds",
+    "CPU time used by the child processes of each security scan phase",
+    ["scanner", "phase"],
+    buckets=PHASE_BUCKETS
+)
+SCAN_PHASE_PEAK_RSS = Histogram(
+    "tsuite_scan_phase_peak_rss_bytes",
+    "Peak memory of the largest child process tree in each security scan phase",
+    ["scanner", "phase"],
+    buckets=BYTE_BUCKETS
+)
+SCAN_PHASE_IO_BYTES = Histogram(
+    "tsuite_scan_phase_io_bytes",
+    "Storage bytes read or written by the child processes of each security scan phase",
+    ["scanner", "phase", "direction"],
+    buckets=BYTE_BUCKETS
+)
+TEST_RUNS = Counter(
+    "tsuite_test_runs_total",
+    "Finished test runs by outcome (passed, failed, error, timeout, cached)",
+    ["framework", "outcome"]
+)
+SCANS = Counter(
+    "tsuite_scans_total",
+    "Finished scans by outcome (succeeded, failed)",
+    ["scanner", "outcome"]
+)
+COMMAND_TIMEOUTS = Counter(
+    "tsuite_command_timeouts_total",
+    "Child processes killed for exceeding their timeout",
+    ["command"]
+)
+POOL_CHECKOUTS = Counter(
+    "tsuite_pool_checkouts_total",
+    "Sandboxes handed to runs, pre-warmed (hit) or created on demand (miss)",
+    ["pool", "result"]
+)
+POOL_IDLE = Gauge("tsuite_pool_idle", "Pre-warmed sandboxes ready for runs", ["pool"])
+WORKSPACE_DISK_BYTES = Gauge(
+    "tsuite_workspace_disk_bytes",
+    "Disk held by workspaces and pending deletions, as last measured"
+)
+WORKSPACE_TRASH = Gauge("tsuite_workspace_trash_pending", "Finished workspaces waiting for deletion")
+ACTIVE_TEST_RUNS = Gauge("tsuite_active_test_runs", "Test runs executing now", ["framework"])
+ACTIVE_SCANS = Gauge("tsuite_active_scans", "Scanners executing now", ["scanner"])
+
+
+def _observe_usage(usage: ResourceUsage, cpu: Histogram, peak_rss: Histogram, io: Histogram, **labels: str) -> None:
+    """Record a phase's child-process usage; phases that started no process are skipped"""
+    if not usage.processes:
+        return
+    cpu.labels(**labels).observe(usage.cpu_seconds)
+    peak_rss.labels(**labels).observe(usage.peak_rss_bytes)
+    io.labels(**labels, direction="read").observe(usage.read_bytes)
+    io.labels(**labels, direction="write").observe(usage.write_bytes)
+
+
+@contextmanager
+def run_phase(framework: str, phase: str) -> Iterator[None]:
+    """Time one phase of a test run, as a histogram sample and a trace span, and account its child processes"""
+    started = time.monotonic()
+    with accounted_phase(phase) as usage:
+        try:
+            with tracer.start_as_current_span(f"phase {phase}", attributes={"framework": framework, "phase": phase}):
+                yield
+        finally:
+            TEST_PHASE_SECONDS.labels(framework=framework, phase=phase).observe(time.monotonic() - started)
+            _observe_usage(usage, TEST_PHASE_CPU_SECONDS, TEST_PHASE_PEAK_RSS, TEST_PHASE_IO_BYTES,
+                           framework=framework, phase=phase)
+
+
+@contextmanager
+def scan_phase(scanner: str, phase: str) -> Iterator[None]:
+    """Time one phase of a security scan, as a histogram sample and a trace span, and account its child processes"""
+    started = time.monotonic()
+    with accounted_phase(phase) as usage:
+        try:
+            with tracer.start_as_current_span(f"{scanner} {phase}", attributes={"scanner": scanner, "phase": phase}):
+                yield
+        finally:
+            SCAN_PHASE_SECONDS.labels(scanner=scanner, phase=phase).observe(time.monotonic() - started)
+            _observe_usage(usage, SCAN_PHASE_CPU_SECONDS, SCAN_PHASE_PEAK_RSS, SCAN_PHASE_IO_BYTES,
+                           scanner=scanner, phase=phase)
+
+
+def record_test_run(framework: str, record: Dict[str, Any]) -> None:
+    """Count a finished test run from its stored record"""
+    results = record.get("results") or {}
+    if record.get("cached"):
+        outcome = "cached"
+    elif results.get("timed_out"):
+        outcome = "timeout"
+    elif record.get("error") or results.get("error"):
+        outcome = "error"
+    else:
+        outcome = "passed" if results.get("success") else "failed"
+    TEST_RUNS.labels(framework=framework, outcome=outcome).inc()
+
+
+def record_scan(scanner: str, results: Dict[str, Any]) -> None:
+    SCANS.labels(scanner=scanner, outcome="succeeded" if results.get("success") else "failed").inc()
+
+
+class ExecutorCollector:
+    """Gauges read at scrape time: scheduler queue and slots, result-store sizes"""
+
+    def collect(self):
+        stats = execution_scheduler.stats()
+        yield GaugeMetricFamily("tsuite_queue_depth", "Jobs waiting for an execution slot", value=stats["queued"])
+        yield GaugeMetricFamily("tsuite_running_jobs", "Jobs holding an execution slot", value=stats["running"])
+        yield GaugeMetricFamily("tsuite_execution_slots", "Configured execution slots", value=stats["max_concurrent"])
+
+        sizes = GaugeMetricFamily("tsuite_result_store_records", "Records per result store namespace", labels=["namespace"])
+        for namespace, store in list(result_stores.items()):
+            try:
+                sizes.add_metric([namespace], len(store))
+            except Exception as e:
+                logger.warning(f"Could not size result store {namespace}: {e}")
+        yield sizes
+
+
+REGISTRY.register(ExecutorCollector())
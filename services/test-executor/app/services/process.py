@@ -0,0 +1,235 @@
+"""
+Async process execution shared by test runners and security scanners.
+
+Child processes are driven through asyncio subprocesses so a long-running
+clone, install or test command never blocks the event loop. Each child is
+started under the configured resource limits, and what its process tree
+consumed is charged to the current run phase.
+"""
+import asyncio
+import errno
+import logging
+import os
+import shutil
+import signal
+import subprocess
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.services.metrics import COMMAND_TIMEOUTS
+from app.services.resources import ProcessAccount, ResourceUsage, charge, resource_accounting
+from app.services.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# Size of each read from a child's stdout/stderr pipe
+READ_CHUNK_SIZE = 64 * 1024
+
+# Called with (stream name, line) for every complete line a child writes
+OutputCallback = Callable[[str, str], None]
+
+
+@dataclass
+class ProcessResult:
+    """Outcome of a finished child process"""
+    args: List[str]
+    returncode: int
+    stdout: str
+    stderr: str
+    duration: float
+    resources: Optional[ResourceUsage] = None
+
+
+# Resource account of every child started by start_process
+_accounts: "weakref.WeakKeyDictionary[asyncio.subprocess.Process, ProcessAccount]" = weakref.WeakKeyDictionary()
+
+
+async def _read_stream(
+    stream: asyncio.StreamReader,
+    chunks: List[bytes],
+    name: str,
+    on_output: Optional[OutputCallback],
+) -> None:
+    """Drain a pipe in fixed-size chunks (safe for very long lines)"""
+    def emit(line: bytes) -> None:
+        on_output(name, line.decode("utf-8", errors="replace").rstrip("\r"))
+
+    pending: List[bytes] = []
+    while True:
+        chunk = await stream.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        if on_output is None:
+            continue
+        parts = chunk.split(b"\n")
+        if len(parts) == 1:
+            pending.append(chunk)
+            continue
+        pending.append(parts[0])
+        emit(b"".join(pending))
+        for line in parts[1:-1]:
+            emit(line)
+        pending = [parts[-1]] if parts[-1] else []
+    if on_output is not None and pending:
+        emit(b"".join(pending))
+
+
+def kill_process_group(process: asyncio.subprocess.Process) -> None:
+    """Kill the child and everything it spawned"""
+    if process.returncode is not None:
+        return
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+
+
+async def gather_or_cancel(*aws: Awaitable[Any]) -> List[Any]:
+    """
+    Await concurrent work like asyncio.gather, but when one awaitable raises,
+    cancel the others (which kills their process groups) and wait for them
+    to wind down before re-raising, so no child outlives the failure.
+    """
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+def _resolve(executable: str, env: Optional[Dict[str, str]]) -> str:
+    """Look a command up on the child's PATH as subprocess would, so a missing one still raises FileNotFoundError"""
+    if os.sep in executable:
+        return executable
+    found = shutil.which(executable, path=os.pathsep.join(os.get_exec_path(env)))
+    if found is None:
+        raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), executable)
+    return found
+
+
+async def start_process(
+    args: List[str],
+    cwd: Optional[str] = None,
+    env: Optional[Dict[str, str]] = None,
+    stdin: bool = False,
+) -> asyncio.subprocess.Process:
+    """
+    Spawn a child in its own session with piped output (and stdin when
+    asked), under the configured resource limits
+    """
+    account = resource_accounting.account()
+    try:
+        if account.limited:
+            args = account.command([_resolve(args[0], env), *args[1:]])
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            cwd=cwd,
+            env=env,
+            stdin=asyncio.subprocess.PIPE if stdin else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True,
+        )
+    except BaseException:
+        await account.close()
+        raise
+    resource_accounting.watch(account, process)
+    _accounts[process] = account
+    return process
+
+
+async def _account(process: asyncio.subprocess.Process, span) -> Optional[ResourceUsage]:
+    """Charge what an exited child's tree consumed to the current phase"""
+    account = _accounts.get(process)
+    if account is None:
+        return None
+    usage = await account.result()
+    charge(usage)
+    span.set_attribute("process.cpu_seconds", usage.cpu_seconds)
+    span.set_attribute("process.peak_rss_bytes", usage.peak_rss_bytes)
+    span.set_attribute("process.read_bytes", usage.read_bytes)
+    span.set_attribute("process.write_bytes", usage.write_bytes)
+    return usage
+
+
+async def run_process(
+    args: List[str],
+    cwd: Optional[str] = None,
+    env: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
+    on_output: Optional[OutputCallback] = None,
+    process: Optional[asyncio.subprocess.Process] = None,
+    input: Optional[bytes] = None,
+) -> ProcessResult:
+    """
+    Run a command without blocking the event loop.
+
+    ``on_output`` receives each stdout/stderr line as soon as it is read.
+    Raises subprocess.TimeoutExpired when the command exceeds ``timeout``;
+    the whole process group is killed in that case and on cancellation.
+
+    ``process`` is a child already started by ``start_process`` (e.g. a
+    pre-warmed interpreter) to drive instead of spawning ``args``; ``input``
+    is written to its stdin, which is then closed.
+    """
+    command = os.path.basename(args[0])
+    attributes = {"process.command": command, "process.command_line": " ".join(args)[:1024], "process.cwd": cwd or ""}
+    with tracer.start_as_current_span(f"process {command}", attributes=attributes) as span:
+        started = time.monotonic()
+        if process is None:
+            process = await start_process(args, cwd=cwd, env=env)
+        span.set_attribute("process.prestarted", process.stdin is not None)
+        if process in _accounts:
+            await _accounts[process].begin()
+
+        stdout_chunks: List[bytes] = []
+        stderr_chunks: List[bytes] = []
+
+        async def _communicate() -> None:
+            if process.stdin is not None:
+                if input:
+                    process.stdin.write(input)
+                    await process.stdin.drain()
+                process.stdin.close()
+            await asyncio.gather(
+                _read_stream(process.stdout, stdout_chunks, "stdout", on_output),
+                _read_stream(process.stderr, stderr_chunks, "stderr", on_output),
+            )
+            # The pipes close as the child exits; read its usage before it is reaped when possible
+            if process in _accounts:
+                await _accounts[process].asample()
+            await process.wait()
+
+        try:
+            await asyncio.wait_for(_communicate(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Command timed out after {timeout}s: {' '.join(args)}")
+            COMMAND_TIMEOUTS.labels(command=command).inc()
+            kill_process_group(process)
+            await process.wait()
+            await _account(process, span)
+            raise subprocess.TimeoutExpired(args, timeout)
+        except BaseException:
+            kill_process_group(process)
+            raise
+
+        span.set_attribute("process.exit_code", process.returncode)
+        duration = time.monotonic() - started
+        resources = await _account(process, span)
+        return ProcessResult(
+            args=list(args),
+            returncode=process.returncode,
+            stdout=b"".join(stdout_chunks).decode("utf-8", errors="replace"),
+            stderr=b"".join(stderr_chunks).decode("utf-8", errors="replace"),
+            duration=duration,
+            resources=resources,
+        )
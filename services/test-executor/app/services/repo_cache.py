@@ -0,0 +1,181 @@
+"""
+Local repository cache.
+
+Keeps one bare mirror per repository URL, fetches only new objects into it
+and checks each run out as a local ``--shared`` clone, which borrows the
+mirror's object store instead of copying it.
+"""
+import asyncio
+import hashlib
+import logging
+import re
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from app.config import settings
+from app.services.process import run_process
+
+logger = logging.getLogger(__name__)
+
+# Only branches and tags are mirrored; forge-specific refs (e.g. refs/pull/*)
+# can be orders of magnitude larger and are never checked out.
+MIRROR_REFSPECS = [
+    "+refs/heads/*:refs/heads/*",
+    "+refs/tags/*:refs/tags/*",
+]
+
+# A ref that already names a commit and never needs resolving
+FULL_SHA = re.compile(r"^[0-9a-fA-F]{40}$")
+
+
+class RepositoryCache:
+    """Bare mirror cache shared by all runners and scanners"""
+
+    def __init__(self, cache_dir: str, fetch_interval: float = 0):
+        self.cache_dir = Path(cache_dir)
+        self.fetch_interval = fetch_interval
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._last_fetch: Dict[str, float] = {}
+
+    def mirror_path(self, repository_url: str) -> Path:
+        """Location of the bare mirror for a repository URL"""
+        digest = hashlib.sha256(repository_url.encode()).hexdigest()[:24]
+        return self.cache_dir / f"{digest}.git"
+
+    def _lock(self, repository_url: str) -> asyncio.Lock:
+        if repository_url not in self._locks:
+            self._locks[repository_url] = asyncio.Lock()
+        return self._locks[repository_url]
+
+    async def _git(self, args, cwd=None, timeout: float = 300):
+        result = await run_process(["git", *args], cwd=cwd, timeout=timeout)
+        if result.returncode != 0:
+            raise Exception(f"git {args[0]} failed: {result.stderr.strip()}")
+        return result
+
+    async def _create_mirror(self, repository_url: str, mirror: Path, timeout: float) -> None:
+        """
+        Initialise a bare mirror in a scratch directory and move it into place.
+        Worker processes sharing the cache may race to create the same mirror;
+        each stages its own, and losing the final rename is not an error.
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(prefix=f".{mirror.name}.", suffix=".tmp", dir=self.cache_dir))
+        try:
+            await self._git(["init", "--bare", "--quiet", str(staging)])
+            await self._git(["remote", "add", "origin", repository_url], cwd=str(staging))
+            await self._git(["config", "--unset-all", "remote.origin.fetch"], cwd=str(staging))
+            for refspec in MIRROR_REFSPECS:
+                await self._git(["config", "--add", "remote.origin.fetch", refspec], cwd=str(staging))
+            await self._git(["fetch", "--prune", "--quiet", "origin"], cwd=str(staging), timeout=timeout)
+            try:
+                staging.rename(mirror)
+            except OSError:
+                if not mirror.is_dir():
+                    raise
+                logger.info(f"Another process created the mirror of {repository_url} first")
+                shutil.rmtree(staging, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+    async def update(self, repository_url: str, timeout: float = 300, force: bool = False) -> Path:
+        """
+        Ensure the mirror exists and is up to date.
+
+        Concurrent callers for the same repository share one fetch, and a
+        fetch completed within ``fetch_interval`` seconds is reused unless
+        ``force`` is set.
+        """
+        mirror = self.mirror_path(repository_url)
+        async with self._lock(repository_url):
+            last = self._last_fetch.get(repository_url)
+            if not force and mirror.exists() and last is not None and time.monotonic() - last < self.fetch_interval:
+                return mirror
+
+            if mirror.exists():
+                logger.info(f"Fetching updates for cached mirror of {repository_url}")
+                await self._git(["fetch", "--prune", "--quiet", "origin"], cwd=str(mirror), timeout=timeout)
+            else:
+                logger.info(f"Creating cached mirror of {repository_url}")
+                await self._create_mirror(repository_url, mirror, timeout)
+
+            self._last_fetch[repository_url] = time.monotonic()
+        return mirror
+
+    async def resolve(self, repository_url: str, ref: str, timeout: float = 300) -> Optional[str]:
+        """Full commit SHA ``ref`` (branch, tag or commit) currently points to, if known"""
+        if FULL_SHA.match(ref):
+            return ref.lower()
+        if not settings.repo_cache_enabled:
+            result = await run_process(["git", "ls-remote", repository_url, ref], timeout=timeout)
+            lines = result.stdout.split("\n") if result.returncode == 0 else []
+            return lines[0].split()[0] if lines and lines[0] else None
+
+        mirror = await self.update(repository_url, timeout=timeout)
+        result = await run_process(
+            ["git", "rev-parse", "--verify", "--quiet", f"{ref}^{{commit}}"],
+            cwd=str(mirror),
+            timeout=30
+        )
+        return result.stdout.strip() if result.returncode == 0 else None
+
+    async def checkout(
+        self,
+        repository_url: str,
+        branch: str,
+        dest: str,
+        timeout: float = 300,
+        commit: Optional[str] = None
+    ) -> None:
+        """
+        Check out ``branch`` of ``repository_url`` into the empty directory
+        ``dest``, detached at ``commit`` when one is given.
+        """
+        if not settings.repo_cache_enabled:
+            result = await run_process(
+                ["git", "clone", "-b", branch, "--depth", "1", repository_url, dest],
+                timeout=timeout
+            )
+            if result.returncode != 0:
+                raise Exception(f"Git clone failed: {result.stderr}")
+            if commit:
+                result = await run_process(
+                    ["git", "fetch", "--quiet", "--depth", "1", "origin", commit],
+                    cwd=dest,
+                    timeout=timeout
+                )
+                if result.returncode != 0:
+                    raise Exception(f"Git checkout failed: {result.stderr}")
+                await self._checkout_commit(dest, "FETCH_HEAD")
+            return
+
+        mirror = await self.update(repository_url, timeout=timeout)
+        result = await run_process(
+            ["git", "clone", "--shared", "--quiet", "--single-branch", "-b", branch, str(mirror), dest],
+            timeout=timeout
+        )
+        if result.returncode != 0:
+            raise Exception(f"Git clone failed: {result.stderr}")
+        if commit:
+            # The shared clone borrows the mirror's objects, so any fetched commit resolves;
+            # a commit pushed since the last fetch needs one more fetch
+            try:
+                await self._checkout_commit(dest, commit)
+            except Exception:
+                await self.update(repository_url, timeout=timeout, force=True)
+                await self._checkout_commit(dest, commit)
+
+    async def _checkout_commit(self, dest: str, commit: str) -> None:
+        result = await run_process(["git", "checkout", "--quiet", "--detach", commit], cwd=dest, timeout=120)
+        if result.returncode != 0:
+            raise Exception(f"Git checkout failed: {result.stderr}")
+
+
+repository_cache = RepositoryCache(
+    settings.repo_cache_dir,
+    fetch_interval=settings.repo_cache_fetch_interval
+)
@@ -0,0 +1,421 @@
+"""
+Resource limits and accounting for child processes.
+
+Every command a run starts (clone, install, tests, scanners) is placed
+under limits together with everything it spawns. With a delegated cgroup
+v2 directory (``RESOURCE_CGROUP_ROOT``) each command gets its own cgroup:
+memory, CPU bandwidth and process count are enforced for the whole tree,
+and its CPU time, peak memory and I/O are read from the cgroup once it
+exits. Elsewhere each process gets rlimits (data segment size and CPU
+seconds), and usage is sampled from /proc for the command's session every
+``RESOURCE_SAMPLE_INTERVAL`` seconds, so work after the last sample and
+memory spikes between samples are missed. Samples walk all of /proc, so they
+are taken in a worker thread, never on the event loop.
+
+Limits are applied by a ``/bin/sh`` trampoline that joins the cgroup and
+sets the rlimits, then execs the command, so no Python code runs in the
+child between fork and exec.
+
+Usage is summed per phase (clone, install, run, ...): ``run_phase`` and
+``scan_phase`` export it as metrics, and ``accounted_run`` collects it for
+the run's result.
+"""
+import asyncio
+import logging
+import os
+import resource
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from itertools import count
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+CGROUP_CONTROLLERS = ("cpu", "memory", "io", "pids")
+
+# cpu.max period, in microseconds
+CPU_PERIOD = 100000
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+# ulimit flag and unit of each rlimit the trampoline applies
+ULIMIT_FLAGS = {resource.RLIMIT_DATA: ("-d", 1024), resource.RLIMIT_CPU: ("-t", 1)}
+
+
+@dataclass
+class ResourceUsage:
+    """What one or more command trees consumed"""
+    cpu_seconds: float = 0.0
+    peak_rss_bytes: int = 0
+    read_bytes: int = 0
+    write_bytes: int = 0
+    processes: int = 0  # commands accounted
+
+    def add(self, other: "ResourceUsage") -> None:
+        self.cpu_seconds += other.cpu_seconds
+        self.peak_rss_bytes = max(self.peak_rss_bytes, other.peak_rss_bytes)
+        self.read_bytes += other.read_bytes
+        self.write_bytes += other.write_bytes
+        self.processes += other.processes
+
+    def to_dict(self) -> Dict:
+        return {
+            "cpu_seconds": round(self.cpu_seconds, 3),
+            "peak_rss_bytes": self.peak_rss_bytes,
+            "read_bytes": self.read_bytes,
+            "write_bytes": self.write_bytes,
+            "processes": self.processes
+        }
+
+
+_run_usage: ContextVar[Optional[Dict[str, ResourceUsage]]] = ContextVar("run_usage", default=None)
+_phase_usage: ContextVar[Optional[ResourceUsage]] = ContextVar("phase_usage", default=None)
+
+
+@contextmanager
+def accounted_run() -> Iterator[Dict[str, ResourceUsage]]:
+    """Collect the usage of every phase of a run, keyed by phase name"""
+    usage: Dict[str, ResourceUsage] = {}
+    token = _run_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _run_usage.reset(token)
+
+
+@contextmanager
+def accounted_phase(phase: str) -> Iterator[ResourceUsage]:
+    """Charge commands finishing inside the block to ``phase``"""
+    usage = ResourceUsage()
+    token = _phase_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _phase_usage.reset(token)
+        run = _run_usage.get()
+        if run is not None and usage.processes:
+            run.setdefault(phase, ResourceUsage()).add(usage)
+
+
+def charge(usage: ResourceUsage) -> None:
+    """Add a finished command's usage to the current phase"""
+    phase = _phase_usage.get()
+    if phase is not None:
+        phase.add(usage)
+
+
+def usage_report(usage: Dict[str, ResourceUsage]) -> Dict[str, Dict]:
+    return {phase: phase_usage.to_dict() for phase, phase_usage in usage.items()}
+
+
+def _read_keyed(path: Path) -> Dict[str, int]:
+    """``key value`` lines (cpu.stat) or ``dev key=value ...`` lines (io.stat), summed per key"""
+    values: Dict[str, int] = {}
+    for line in path.read_text().splitlines():
+        fields = line.split()
+        if len(fields) == 2 and fields[1].isdigit():
+            values[fields[0]] = values.get(fields[0], 0) + int(fields[1])
+            continue
+        for field in fields[1:]:
+            key, _, value = field.partition("=")
+            if value.isdigit():
+                values[key] = values.get(key, 0) + int(value)
+    return values
+
+
+def _session_usage(session: int) -> Optional[Tuple[float, int, int, int]]:
+    """
+    CPU seconds, RSS bytes, read and write bytes of the processes in a
+    session; each process's CPU and I/O include its reaped children
+    """
+    found = False
+    cpu = rss = read = write = 0
+    with os.scandir("/proc") as entries:
+        for entry in entries:
+            if not entry.name.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry.name}/stat") as f:
+                    stat = f.read()
+                fields = stat[stat.rindex(")") + 2:].split()
+                if int(fields[3]) != session:
+                    continue
+                found = True
+                cpu += sum(int(ticks) for ticks in fields[11:15])
+                rss += int(fields[21]) * PAGE_SIZE
+                with open(f"/proc/{entry.name}/io") as f:
+                    io = dict(line.split(": ") for line in f.read().splitlines())
+                read += int(io.get("read_bytes", 0))
+                write += int(io.get("write_bytes", 0))
+            except (OSError, ValueError, IndexError):
+                continue
+    return (cpu / CLOCK_TICKS, rss, read, write) if found else None
+
+
+class ProcessAccount:
+    """Limits and usage of one command tree, from spawn until it exits"""
+
+    def __init__(self, cgroup: Optional[Path], rlimits: List[Tuple[int, int]], sample_interval: float):
+        self.cgroup = cgroup
+        self.rlimits = rlimits
+        self.sample_interval = sample_interval
+        self.pid: Optional[int] = None
+        self._baseline = ResourceUsage()
+        self._latest = ResourceUsage()
+        self._result: Optional[asyncio.Future] = None
+        # Samples are folded in from worker threads
+        self._lock = threading.Lock()
+
+    @property
+    def limited(self) -> bool:
+        """Whether the command needs the trampoline to apply any limit"""
+        return self.cgroup is not None or bool(self.rlimits)
+
+    def command(self, args: List[str]) -> List[str]:
+        """
+        ``args`` behind the trampoline: the shell sets the rlimits and moves
+        itself into the cgroup, then execs the command in its place (same
+        PID). Fails with exit status 126 when a limit cannot be applied.
+        """
+        if not self.limited:
+            return list(args)
+        steps = []
+        for limit, value in self.rlimits:
+            flag, unit = ULIMIT_FLAGS[limit]
+            steps.append(f"ulimit {flag} {value // unit}")
+        if self.cgroup is not None:
+            steps.append('echo $$ > "$0"')
+        procs = str(self.cgroup / "cgroup.procs") if self.cgroup is not None else "sh"
+        return ["/bin/sh", "-c", " && ".join(steps) + ' || exit 126\nexec "$@"', procs, *args]
+
+    def _read(self) -> Optional[ResourceUsage]:
+        """Cumulative usage so far, or None once nothing is left to read"""
+        # close() may drop the cgroup while a sampling thread runs
+        cgroup = self.cgroup
+        if cgroup is not None:
+            try:
+                cpu = _read_keyed(cgroup / "cpu.stat")
+                io = _read_keyed(cgroup / "io.stat") if (cgroup / "io.stat").exists() else {}
+                peak = cgroup / "memory.peak"
+                return ResourceUsage(
+                    cpu_seconds=cpu.get("usage_usec", 0) / 1e6,
+                    peak_rss_bytes=int(peak.read_text()) if peak.exists() else 0,
+                    read_bytes=io.get("rbytes", 0),
+                    write_bytes=io.get("wbytes", 0)
+                )
+            except OSError:
+                return None
+        sample = _session_usage(self.pid)
+        if sample is None:
+            return None
+        cpu, rss, read, write = sample
+        return ResourceUsage(cpu_seconds=cpu, peak_rss_bytes=rss, read_bytes=read, write_bytes=write)
+
+    def sample(self) -> None:
+        """Fold the current reading in (counters only grow; memory keeps its peak)"""
+        if self.pid is None:
+            return
+        current = self._read()
+        if current is None:
+            return
+        with self._lock:
+            latest = self._latest
+            latest.cpu_seconds = max(latest.cpu_seconds, current.cpu_seconds)
+            latest.peak_rss_bytes = max(latest.peak_rss_bytes, current.peak_rss_bytes)
+            latest.read_bytes = max(latest.read_bytes, current.read_bytes)
+            latest.write_bytes = max(latest.write_bytes, current.write_bytes)
+
+    async def asample(self) -> None:
+        """``sample`` off the event loop; a /proc walk reads every process on the host"""
+        await asyncio.to_thread(self.sample)
+
+    def start(self, process: asyncio.subprocess.Process) -> asyncio.Task:
+        """Watch ``process`` until it exits (sampling at once); returns the watching task"""
+        self.pid = process.pid
+        self._result = asyncio.get_running_loop().create_future()
+        return asyncio.get_running_loop().create_task(self._watch(process))
+
+    async def _watch(self, process: asyncio.subprocess.Process) -> None:
+        exited = asyncio.ensure_future(process.wait())
+        # A cgroup keeps the totals after exit; /proc has to be sampled while the tree runs
+        interval = self.sample_interval if self.cgroup is None and self.sample_interval > 0 else None
+        samples = 0
+        try:
+            while not exited.done():
+                await self.asample()
+                # Sample short commands densely at first, backing off to the configured interval
+                delay = min(interval, 0.05 * 2 ** samples) if interval else None
+                samples += 1
+                await asyncio.wait([exited], timeout=delay)
+            await self.asample()
+        finally:
+            if not self._result.done():
+                self._result.set_result(self.usage())
+            await self.close()
+
+    async def begin(self) -> None:
+        """Count from now on (a pre-started process's start-up belongs to no phase)"""
+        await self.asample()
+        with self._lock:
+            latest = self._latest
+            self._baseline = ResourceUsage(cpu_seconds=latest.cpu_seconds, read_bytes=latest.read_bytes,
+                                           write_bytes=latest.write_bytes)
+
+    def usage(self) -> ResourceUsage:
+        with self._lock:
+            return ResourceUsage(
+                cpu_seconds=max(0.0, self._latest.cpu_seconds - self._baseline.cpu_seconds),
+                peak_rss_bytes=self._latest.peak_rss_bytes,
+                read_bytes=max(0, self._latest.read_bytes - self._baseline.read_bytes),
+                write_bytes=max(0, self._latest.write_bytes - self._baseline.write_bytes),
+                processes=1
+            )
+
+    async def result(self) -> ResourceUsage:
+        """Usage of the whole tree, once the command has exited"""
+        if self._result is None:
+            return ResourceUsage()
+        return await asyncio.shield(self._result)
+
+    async def close(self) -> None:
+        """Stop whatever the command left running and remove its cgroup"""
+        if self.cgroup is None:
+            return
+        cgroup, self.cgroup = self.cgroup, None
+        for _ in range(20):
+            try:
+                cgroup.rmdir()
+                return
+            except FileNotFoundError:
+                return
+            except OSError:
+                try:
+                    (cgroup / "cgroup.kill").write_text("1")
+                except OSError:
+                    pass
+                await asyncio.sleep(0.05)
+        logger.warning(f"Could not remove cgroup {cgroup}")
+
+
+class ResourceAccounting:
+    """Creates a ``ProcessAccount`` for every child process"""
+
+    def __init__(
+        self,
+        cgroup_root: Optional[str],
+        memory_limit_mb: int,
+        cpu_limit: float,
+        max_processes: int,
+        cpu_time_limit: int,
+        sample_interval: float
+    ):
+        self.cgroup_root = Path(cgroup_root) if cgroup_root else None
+        self.memory_limit = memory_limit_mb * 1024 * 1024
+        self.cpu_limit = cpu_limit
+        self.max_processes = max_processes
+        self.cpu_time_limit = cpu_time_limit
+        self.sample_interval = sample_interval
+        self._cgroups: Optional[bool] = None
+        self._names = count()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def cgroups_available(self) -> bool:
+        """Whether the cgroup root is a writable cgroup v2 directory; checked once"""
+        if self._cgroups is None:
+            self._cgroups = self._prepare_cgroup_root()
+        return self._cgroups
+
+    def _prepare_cgroup_root(self) -> bool:
+        root = self.cgroup_root
+        if root is None or not (root.parent / "cgroup.controllers").exists():
+            return False
+        try:
+            root.mkdir(exist_ok=True)
+            available = (root / "cgroup.controllers").read_text().split()
+            for controller in CGROUP_CONTROLLERS:
+                if controller not in available:
+                    continue
+                # Child cgroups get the controllers the root was delegated
+                with open(root / "cgroup.subtree_control", "w") as f:
+                    f.write(f"+{controller}")
+            # Probe: create and remove a child cgroup
+            probe = root / f"probe-{os.getpid()}"
+            probe.mkdir()
+            probe.rmdir()
+        except OSError as e:
+            logger.info(f"cgroups v2 unavailable under {root} ({e}); limiting processes with rlimits")
+            return False
+        logger.info(f"Placing child processes in cgroups under {root}")
+        return True
+
+    def _rlimits(self) -> List[Tuple[int, int]]:
+        wanted = []
+        if self.memory_limit and not self.cgroups_available():
+            wanted.append((resource.RLIMIT_DATA, self.memory_limit))
+        if self.cpu_time_limit:
+            wanted.append((resource.RLIMIT_CPU, self.cpu_time_limit))
+        rlimits = []
+        for limit, value in wanted:
+            # Never ask for more than the hard limit the service itself runs under
+            hard = resource.getrlimit(limit)[1]
+            rlimits.append((limit, value if hard == resource.RLIM_INFINITY else min(value, hard)))
+        return rlimits
+
+    def _create_cgroup(self) -> Path:
+        cgroup = self.cgroup_root / f"cmd-{os.getpid()}-{next(self._names)}"
+        cgroup.mkdir()
+        limits = {
+            "memory.max": str(self.memory_limit) if self.memory_limit else None,
+            "memory.swap.max": "0" if self.memory_limit else None,
+            "cpu.max": f"{int(self.cpu_limit * CPU_PERIOD)} {CPU_PERIOD}" if self.cpu_limit else None,
+            "pids.max": str(self.max_processes) if self.max_processes else None
+        }
+        for name, value in limits.items():
+            if value is None:
+                continue
+            try:
+                (cgroup / name).write_text(value)
+            except OSError as e:
+                logger.debug(f"Could not set {name} on {cgroup}: {e}")
+        return cgroup
+
+    def account(self) -> ProcessAccount:
+        """Limits for a process about to be spawned"""
+        cgroup = None
+        if self.cgroups_available():
+            try:
+                cgroup = self._create_cgroup()
+            except OSError as e:
+                logger.warning(f"Could not create a cgroup under {self.cgroup_root}: {e}")
+        return ProcessAccount(cgroup, self._rlimits(), self.sample_interval)
+
+    def watch(self, account: ProcessAccount, process: asyncio.subprocess.Process) -> None:
+        task = account.start(process)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def status(self) -> Dict:
+        return {
+            "mode": "cgroup" if self.cgroups_available() else "rlimit",
+            "cgroup_root": str(self.cgroup_root) if self.cgroup_root else None,
+            "memory_limit_bytes": self.memory_limit,
+            "cpu_limit": self.cpu_limit if self.cgroups_available() else None,
+            "max_processes": self.max_processes if self.cgroups_available() else None,
+            "cpu_time_limit": self.cpu_time_limit
+        }
+
+
+resource_accounting = ResourceAccounting(
+    settings.resource_cgroup_root,
+    memory_limit_mb=settings.resource_memory_limit_mb,
+    cpu_limit=settings.resource_cpu_limit,
+    max_processes=settings.resource_max_processes,
+    cpu_time_limit=settings.resource_cpu_time_limit,
+    sample_interval=settings.resource_sample_interval
+)
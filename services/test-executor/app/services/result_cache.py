@@ -0,0 +1,67 @@
+"""
+Memoized test run results.
+
+A run is identified by repository, resolved commit SHA, framework, test
+command, run options and a fingerprint of its environment variables.
+Successful results are stored under that identity so re-triggered jobs and
+parallel pipelines on the same SHA are answered without running anything.
+Failed runs are never memoized, so retrying a flaky failure always re-runs.
+"""
+import hashlib
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from app.config import settings
+from app.services.result_store import ResultStore, get_result_store
+
+logger = logging.getLogger(__name__)
+
+
+def run_key(
+    repository_url: str,
+    commit: str,
+    framework: str,
+    test_command: Optional[str],
+    environment_vars: Optional[Dict[str, str]],
+    **options: Any
+) -> str:
+    """
+    Stable key for a run. Environment values are part of the digest but are
+    never stored themselves.
+    """
+    identity = {
+        "repository_url": repository_url,
+        "commit": commit,
+        "framework": framework.lower(),
+        "test_command": test_command or "",
+        "environment": sorted((environment_vars or {}).items()),
+        "options": options,
+    }
+    return hashlib.sha256(json.dumps(identity, sort_keys=True).encode()).hexdigest()
+
+
+class RunResultCache:
+    """Successful run results keyed by ``run_key``"""
+
+    def __init__(self, store: ResultStore, ttl: Optional[float] = None):
+        self.store = store
+        self.ttl = ttl
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.store.get(key)
+
+    def put(self, key: str, test_run_id: str, results: Dict[str, Any]) -> bool:
+        """Memoize ``results`` if the run succeeded"""
+        if not results.get("success") or results.get("error"):
+            return False
+        self.store.set(key, {
+            "test_run_id": test_run_id,
+            "stored_at": datetime.utcnow().isoformat(),
+            "results": results
+        }, ttl=self.ttl)
+        return True
+
+
+run_result_cache = RunResultCache(get_result_store("run_results"), ttl=settings.result_cache_ttl)
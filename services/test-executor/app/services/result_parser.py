@@ -0,0 +1,233 @@
+"""
+Streaming parsers for test framework reports.
+
+Reports are read incrementally from a file object so that only one element
+(e.g. one Jest test suite) is decoded at a time, instead of materialising
+documents that can reach hundreds of megabytes on large monorepos.
+"""
+import json
+import logging
+from typing import Any, Callable, Dict, Iterator, List, Optional, TextIO
+
+logger = logging.getLogger(__name__)
+
+# Failure messages kept per test record; full stack traces stay in the logs
+MAX_FAILURE_MESSAGE_LENGTH = 2000
+
+WHITESPACE = " \t\r\n"
+
+# Called with each compact per-test record as soon as it is parsed
+TestRecordCallback = Callable[[Dict[str, Any]], None]
+
+
+class JsonStreamReader:
+    """
+    Pull-based reader for one JSON document.
+
+    ``iter_object`` yields keys and ``iter_array`` yields once per element;
+    after each yield the caller consumes the value with ``read_value`` or a
+    nested ``iter_*`` call.
+    """
+
+    def __init__(self, fp: TextIO, chunk_size: int = 64 * 1024):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self, size: int) -> bool:
+        """Drop consumed input and append up to ``size`` more characters"""
+        if self.eof:
+            return False
+        chunk = self.fp.read(size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character without consuming it ('' at EOF)"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill(self.chunk_size):
+                return ""
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} in JSON stream, found {found!r}")
+        self.pos += 1
+
+    def read_value(self) -> Any:
+        """Decode the next complete value, reading more input as needed"""
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill(size):
+                    raise
+                # Grow reads geometrically so large values decode in O(n)
+                size *= 2
+                continue
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self.buf) and not self.eof and self._fill(size):
+                continue
+            self.pos = end
+            return value
+
+    def iter_object(self) -> Iterator[str]:
+        self.expect("{")
+        first = True
+        while True:
+            char = self.peek()
+            if char == "}":
+                self.pos += 1
+                return
+            if not first:
+                self.expect(",")
+            first = False
+            key = self.read_value()
+            self.expect(":")
+            yield key
+
+    def iter_array(self) -> Iterator[int]:
+        self.expect("[")
+        index = 0
+        while True:
+            char = self.peek()
+            if char == "]":
+                self.pos += 1
+                return
+            if index:
+                self.expect(",")
+            yield index
+            index += 1
+
+
+# Jest's top-level aggregate counters
+JEST_COUNTERS = {
+    "numTotalTests": "total_tests",
+    "numPassedTests": "passed",
+    "numFailedTests": "failed",
+    "numPendingTests": "skipped",
+    "numTodoTests": "todo",
+}
+
+JEST_STATUS = {
+    "passed": "passed",
+    "failed": "failed",
+    "pending": "skipped",
+    "skipped": "skipped",
+    "disabled": "skipped",
+    "todo": "todo",
+}
+
+
+def compact_jest_test(suite_name: str, assertion: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce a Jest assertion result to the fields the platform stores"""
+    record = {
+        "suite": suite_name,
+        "name": assertion.get("fullName") or assertion.get("title", ""),
+        "status": JEST_STATUS.get(assertion.get("status"), assertion.get("status", "unknown")),
+        "duration": (assertion.get("duration") or 0) / 1000,
+    }
+    failures = assertion.get("failureMessages") or []
+    if failures:
+        record["failure"] = failures[0][:MAX_FAILURE_MESSAGE_LENGTH]
+    return record
+
+
+def parse_jest_report(
+    fp: TextIO,
+    on_test: Optional[TestRecordCallback] = None,
+    on_coverage_file: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Parse a Jest ``--json`` report incrementally.
+
+    Suites are decoded one at a time and folded into compact per-test
+    records and aggregate counts. ``duration`` is the wall-clock span of all
+    suites. Coverage entries are handed to ``on_coverage_file`` one file at
+    a time when given, otherwise returned raw under ``coverage``.
+    """
+    reader = JsonStreamReader(fp)
+    counters: Dict[str, int] = {}
+    counted = {"total_tests": 0, "passed": 0, "failed": 0, "skipped": 0, "todo": 0}
+    tests: List[Dict[str, Any]] = []
+    coverage: Dict[str, Any] = {}
+    first_start = last_end = None
+    runtime_total = 0
+
+    for key in reader.iter_object():
+        if key in JEST_COUNTERS:
+            counters[JEST_COUNTERS[key]] = reader.read_value()
+        elif key == "testResults":
+            for _ in reader.iter_array():
+                suite = reader.read_value()
+                suite_name = suite.get("name") or suite.get("testFilePath", "")
+
+                stats = suite.get("perfStats") or {}
+                if stats.get("start") and stats.get("end"):
+                    first_start = stats["start"] if first_start is None else min(first_start, stats["start"])
+                    last_end = stats["end"] if last_end is None else max(last_end, stats["end"])
+                runtime_total += stats.get("runtime") or 0
+
+                for assertion in suite.get("assertionResults") or []:
+                    record = compact_jest_test(suite_name, assertion)
+                    counted["total_tests"] += 1
+                    if record["status"] in counted:
+                        counted[record["status"]] += 1
+                    tests.append(record)
+                    if on_test:
+                        on_test(record)
+        elif key == "coverageMap" and reader.peek() == "{":
+            for path in reader.iter_object():
+                file_coverage = reader.read_value()
+                if on_coverage_file:
+                    on_coverage_file(path, file_coverage)
+                else:
+                    coverage[path] = file_coverage
+        else:
+            reader.read_value()
+
+    if first_start is not None and last_end is not None:
+        duration = (last_end - first_start) / 1000
+    else:
+        duration = runtime_total / 1000
+
+    return {
+        "total_tests": counters.get("total_tests", counted["total_tests"]),
+        "passed": counters.get("passed", counted["passed"]),
+        "failed": counters.get("failed", counted["failed"]),
+        "skipped": counters.get("skipped", counted["skipped"]),
+        "duration": duration,
+        "test_results": tests,
+        "coverage": coverage
+    }
+
+
+def compact_pytest_test(test: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce a pytest-json-report test entry to the same shape as Jest records"""
+    nodeid = test.get("nodeid", "")
+    duration = sum((test.get(stage) or {}).get("duration", 0) for stage in ("setup", "call", "teardown"))
+    record = {
+        "suite": nodeid.split("::", 1)[0],
+        "name": nodeid,
+        "status": test.get("outcome", "unknown"),
+        "duration": duration,
+    }
+    for stage in ("setup", "call", "teardown"):
+        longrepr = (test.get(stage) or {}).get("longrepr")
+        if longrepr:
+            record["failure"] = longrepr[:MAX_FAILURE_MESSAGE_LENGTH]
+            break
+    return record
@@ -0,0 +1,314 @@
+"""
+Result stores for test run and scan records.
+
+Records are JSON-serialisable dicts keyed by run or scan id. The in-memory
+store bounds memory with LRU and TTL eviction; the Redis store shares
+records between executor replicas and Celery workers and survives restarts.
+
+Code running on an event loop uses the ``a``-prefixed methods (or ``call``
+for helpers built on a store), which move blocking Redis round-trips off
+the loop.
+
+A job ID is claimed atomically when the job is accepted, and the claim
+expires unless the job keeps renewing it, so a job lost with a crashed
+replica stops blocking resubmission of its ID after one claim TTL.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, TypeVar
+
+import redis
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Records in these states belong to a job that is still executing
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class ResultStore:
+    """Dict-like store of records; subclasses implement _load/_save/_remove"""
+
+    # Whether store calls block on network I/O and must leave the event loop
+    blocking = False
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def _save(self, key: str, value: Dict[str, Any], ttl: Optional[float]) -> None:
+        raise NotImplementedError
+
+    def _remove(self, key: str) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def claim(self, key: str, ttl: float) -> bool:
+        """Atomically claim ``key`` for ``ttl`` seconds; False while another live claim holds it"""
+        raise NotImplementedError
+
+    def renew_claim(self, key: str, ttl: float) -> None:
+        """Extend (or re-take) a claim for another ``ttl`` seconds"""
+        raise NotImplementedError
+
+    def release_claim(self, key: str) -> None:
+        raise NotImplementedError
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self._load(key)
+        return default if value is None else value
+
+    def get_many(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Records for every key that exists, in key order"""
+        found = {}
+        for key in keys:
+            value = self._load(key)
+            if value is not None:
+                found[key] = value
+        return found
+
+    def set(self, key: str, value: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        """Store a record, optionally with a TTL shorter than the store's default"""
+        self._save(key, value, ttl)
+
+    def __getitem__(self, key: str) -> Dict[str, Any]:
+        value = self._load(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: Dict[str, Any]) -> None:
+        self._save(key, value, None)
+
+    def __delitem__(self, key: str) -> None:
+        self._remove(key)
+
+    def __contains__(self, key: str) -> bool:
+        return self._load(key) is not None
+
+    async def call(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run ``fn`` (which uses this store) without blocking the event loop on store I/O"""
+        if self.blocking:
+            return await asyncio.to_thread(fn, *args, **kwargs)
+        return fn(*args, **kwargs)
+
+    async def aget(self, key: str, default: Any = None) -> Any:
+        return await self.call(self.get, key, default)
+
+    async def aget_many(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        return await self.call(self.get_many, keys)
+
+    async def aset(self, key: str, value: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        await self.call(self._save, key, value, ttl)
+
+    async def adelete(self, key: str) -> None:
+        await self.call(self._remove, key)
+
+    async def aclaim(self, key: str, ttl: float) -> bool:
+        return await self.call(self.claim, key, ttl)
+
+    async def arelease_claim(self, key: str) -> None:
+        await self.call(self.release_claim, key)
+
+    @asynccontextmanager
+    async def held_claim(self, key: str, ttl: float) -> AsyncIterator[None]:
+        """Keep ``key`` claimed while the block runs, renewing it as a heartbeat, then release it"""
+        async def heartbeat() -> None:
+            while True:
+                try:
+                    await self.call(self.renew_claim, key, ttl)
+                except Exception as e:
+                    logger.warning(f"Could not renew the claim on {key}: {e}")
+                await asyncio.sleep(ttl / 4)
+
+        task = asyncio.ensure_future(heartbeat())
+        try:
+            yield
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await self.arelease_claim(key)
+
+
+class InMemoryResultStore(ResultStore):
+    """
+    Process-local store bounded by entry count (LRU) and age (TTL).
+
+    Records of jobs that are still queued or running are never evicted for
+    space, so the store may briefly exceed ``max_entries`` while many jobs
+    are in flight.
+    """
+
+    def __init__(self, namespace: str, max_entries: int, ttl: Optional[float]):
+        super().__init__(namespace)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[Optional[float], Dict[str, Any]]]" = OrderedDict()
+        # Claim expiry (monotonic) per key
+        self._claims: Dict[str, float] = {}
+        # Celery eager tasks may write from worker threads
+        self._lock = threading.Lock()
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def _save(self, key: str, value: Dict[str, Any], ttl: Optional[float]) -> None:
+        ttl = ttl if ttl is not None else self.ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            if len(self._data) > self.max_entries:
+                self._evict(keep=key)
+
+    def _evict(self, keep: str) -> None:
+        """Drop least recently used records of finished jobs (never ``keep``) until the store fits"""
+        excess = len(self._data) - self.max_entries
+        victims = []
+        for key, (_, value) in self._data.items():
+            if len(victims) == excess:
+                break
+            if key != keep and value.get("status") not in ACTIVE_STATUSES:
+                victims.append(key)
+        for key in victims:
+            del self._data[key]
+
+    def _remove(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def claim(self, key: str, ttl: float) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if self._claims.get(key, 0) > now:
+                return False
+            self._claims[key] = now + ttl
+            return True
+
+    def renew_claim(self, key: str, ttl: float) -> None:
+        with self._lock:
+            self._claims[key] = time.monotonic() + ttl
+
+    def release_claim(self, key: str) -> None:
+        with self._lock:
+            self._claims.pop(key, None)
+
+
+class RedisResultStore(ResultStore):
+    """
+    Redis-backed store shared by all replicas.
+
+    Every record carries the store TTL; memory bounds beyond that come from
+    the Redis server's maxmemory/LRU policy. A sorted set of keys scored by
+    expiry time counts the namespace's records without scanning the keyspace.
+    """
+
+    blocking = True
+
+    def __init__(self, namespace: str, client: "redis.Redis", ttl: Optional[float]):
+        super().__init__(namespace)
+        self.client = client
+        self.ttl = ttl
+        self._index = f"tsuite:{namespace}:__index__"
+
+    def _key(self, key: str) -> str:
+        return f"tsuite:{self.namespace}:{key}"
+
+    def _claim_key(self, key: str) -> str:
+        return f"tsuite:{self.namespace}:__claim__:{key}"
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        raw = self.client.get(self._key(key))
+        return json.loads(raw) if raw is not None else None
+
+    def _save(self, key: str, value: Dict[str, Any], ttl: Optional[float]) -> None:
+        ttl = ttl if ttl is not None else self.ttl
+        pipe = self.client.pipeline()
+        pipe.set(self._key(key), json.dumps(value), ex=int(ttl) if ttl else None)
+        pipe.zadd(self._index, {key: time.time() + ttl if ttl else float("inf")})
+        pipe.execute()
+
+    def get_many(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        """One MGET round-trip for the whole batch"""
+        if not keys:
+            return {}
+        raws = self.client.mget([self._key(key) for key in keys])
+        return {key: json.loads(raw) for key, raw in zip(keys, raws) if raw is not None}
+
+    def _remove(self, key: str) -> None:
+        pipe = self.client.pipeline()
+        pipe.delete(self._key(key))
+        pipe.zrem(self._index, key)
+        pipe.execute()
+
+    def __len__(self) -> int:
+        pipe = self.client.pipeline()
+        pipe.zremrangebyscore(self._index, "-inf", time.time())
+        pipe.zcard(self._index)
+        return pipe.execute()[1]
+
+    def claim(self, key: str, ttl: float) -> bool:
+        """SET NX: exactly one replica wins a claim"""
+        return bool(self.client.set(self._claim_key(key), "1", nx=True, px=int(ttl * 1000)))
+
+    def renew_claim(self, key: str, ttl: float) -> None:
+        self.client.set(self._claim_key(key), "1", px=int(ttl * 1000))
+
+    def release_claim(self, key: str) -> None:
+        self.client.delete(self._claim_key(key))
+
+
+# Every store created by get_result_store, by namespace (reported by /metrics)
+result_stores: Dict[str, ResultStore] = {}
+
+
+def get_result_store(
+    namespace: str,
+    max_entries: Optional[int] = None,
+    ttl: Optional[float] = None
+) -> ResultStore:
+    """
+    Factory function to get the configured result store for a namespace.
+    ``max_entries`` and ``ttl`` override the store-wide defaults for
+    namespaces whose records live longer than run records.
+    """
+    backend = settings.result_store_backend.lower()
+    ttl = ttl if ttl is not None else settings.result_store_ttl
+    if backend == "memory":
+        store = InMemoryResultStore(
+            namespace,
+            max_entries=max_entries if max_entries is not None else settings.result_store_max_entries,
+            ttl=ttl
+        )
+    elif backend == "redis":
+        client = redis.Redis.from_url(settings.result_store_redis_url or settings.redis_url)
+        store = RedisResultStore(namespace, client, ttl=ttl)
+    else:
+        raise ValueError(f"Unsupported result store backend: {settings.result_store_backend}")
+    result_stores[namespace] = store
+    return store
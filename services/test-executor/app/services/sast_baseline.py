@@ -0,0 +1,74 @@
+"""
+SAST baselines.
+
+Every SAST scan of a known commit stores its findings as that commit's
+baseline. An incremental scan then only re-scans files changed since a
+baseline commit, carries the baseline's findings for untouched files
+forward, and compares fingerprints to report new and fixed findings.
+"""
+import hashlib
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.config import settings
+from app.services.result_store import ResultStore, get_result_store
+
+logger = logging.getLogger(__name__)
+
+
+def assign_fingerprints(findings: List[Dict[str, Any]], code: Dict[int, str]) -> None:
+    """
+    Give each finding a fingerprint that survives line shifts: rule, file
+    and matched code, plus an occurrence counter for identical matches.
+    ``code`` maps a finding's index to its matched source text.
+    """
+    seen: Dict[str, int] = {}
+    for index, finding in enumerate(findings):
+        matched = " ".join((code.get(index) or finding.get("message", "")).split())
+        identity = f"{finding.get('rule_id')}\0{finding.get('file')}\0{matched}"
+        occurrence = seen.get(identity, 0)
+        seen[identity] = occurrence + 1
+        finding["fingerprint"] = hashlib.sha256(f"{identity}\0{occurrence}".encode()).hexdigest()[:32]
+
+
+def diff_findings(
+    baseline: Iterable[Dict[str, Any]],
+    current: Iterable[Dict[str, Any]]
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Findings only in ``current`` (new) and only in ``baseline`` (fixed)"""
+    baseline = list(baseline)
+    current = list(current)
+    before = {f.get("fingerprint") for f in baseline}
+    after = {f.get("fingerprint") for f in current}
+    return {
+        "new": [f for f in current if f.get("fingerprint") not in before],
+        "fixed": [f for f in baseline if f.get("fingerprint") not in after],
+    }
+
+
+class SASTBaselineStore:
+    """Findings per (repository, commit, ruleset version)"""
+
+    def __init__(self, store: ResultStore):
+        self.store = store
+
+    def _key(self, repository_url: str, commit: str, rules_version: str) -> str:
+        return f"{repository_url}:{commit}:{rules_version}"
+
+    def get(self, repository_url: str, commit: str, rules_version: str) -> Optional[List[Dict[str, Any]]]:
+        entry = self.store.get(self._key(repository_url, commit, rules_version))
+        return entry["findings"] if entry else None
+
+    def put(self, repository_url: str, commit: str, rules_version: str, findings: List[Dict[str, Any]]) -> None:
+        self.store[self._key(repository_url, commit, rules_version)] = {
+            "stored_at": datetime.utcnow().isoformat(),
+            "findings": findings
+        }
+
+
+sast_baselines = SASTBaselineStore(get_result_store(
+    "sast_baselines",
+    max_entries=settings.sast_baseline_max_entries,
+    ttl=settings.sast_baseline_ttl
+))
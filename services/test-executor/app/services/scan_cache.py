@@ -0,0 +1,80 @@
+"""
+Dependency scan result cache.
+
+Audit findings depend only on a project's dependency manifest and on the
+advisory data it is checked against, so they are memoized by ecosystem,
+manifest content hash and advisory database version, and shared by every
+project with an identical lockfile. A new advisory database version changes
+every key, so stale findings are never served after the data updates.
+"""
+import hashlib
+import logging
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+from app.services.result_store import ResultStore, get_result_store
+
+logger = logging.getLogger(__name__)
+
+# Manifests audited per ecosystem, most precise first
+SCAN_MANIFESTS = {
+    "npm": ["package-lock.json", "npm-shrinkwrap.json", "package.json"],
+    "python": ["requirements.txt"],
+}
+
+
+def manifest_digest(project_dir: str, ecosystem: str) -> Optional[str]:
+    """Hash of the manifest an audit of ``ecosystem`` reads; None when there is none"""
+    for name in SCAN_MANIFESTS[ecosystem]:
+        path = Path(project_dir, name)
+        if path.is_file():
+            digest = hashlib.sha256(f"{name}\0".encode())
+            digest.update(path.read_bytes())
+            return digest.hexdigest()
+    return None
+
+
+def advisory_db_version(ecosystem: str) -> str:
+    """
+    Version of the advisory data audits of ``ecosystem`` run against.
+
+    Online advisory services publish no version, so unless one is configured
+    the data is assumed to change once per refresh interval.
+    """
+    if settings.advisory_db_version:
+        return settings.advisory_db_version
+    return f"t{int(time.time() // settings.advisory_db_refresh_interval)}"
+
+
+class DependencyScanCache:
+    """Vulnerability lists keyed by (ecosystem, advisory version, manifest hash)"""
+
+    def __init__(self, store: ResultStore, ttl: Optional[float] = None):
+        self.store = store
+        self.ttl = ttl
+
+    def key(self, project_dir: str, ecosystem: str, advisory_version: Optional[str] = None) -> Optional[str]:
+        """Cache key, or None without a manifest; ``advisory_version`` overrides the online data version"""
+        digest = manifest_digest(project_dir, ecosystem)
+        if digest is None:
+            return None
+        return f"{ecosystem}:{advisory_version or advisory_db_version(ecosystem)}:{digest}"
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        entry = self.store.get(key)
+        return entry["vulnerabilities"] if entry else None
+
+    def put(self, key: str, vulnerabilities: List[Dict[str, Any]]) -> None:
+        self.store.set(key, {
+            "stored_at": datetime.utcnow().isoformat(),
+            "vulnerabilities": vulnerabilities
+        }, ttl=self.ttl)
+
+
+dependency_scan_cache = DependencyScanCache(
+    get_result_store("dependency_scans"),
+    ttl=settings.advisory_db_refresh_interval
+)
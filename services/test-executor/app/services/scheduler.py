@@ -0,0 +1,136 @@
+"""
+Bounded priority scheduler for test runs and security scans.
+
+At most ``max_concurrent`` jobs hold an execution slot at once. Waiting jobs
+are ordered by priority class, then by how many jobs their project already
+has running, then by how recently their project was last served, and
+finally by arrival, so one busy project cannot starve the others.
+"""
+import asyncio
+import itertools
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.services.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# Lower rank runs first
+PRIORITY_CLASSES = {
+    "urgent": 0,
+    "pr": 1,
+    "normal": 2,
+    "nightly": 3,
+}
+
+
+class _Waiter:
+    def __init__(self, job_id: str, project_id: str, rank: int, seq: int, future: asyncio.Future):
+        self.job_id = job_id
+        self.project_id = project_id
+        self.rank = rank
+        self.seq = seq
+        self.future = future
+
+
+class JobScheduler:
+    """In-process scheduler with a fixed number of execution slots"""
+
+    def __init__(self, max_concurrent: int):
+        self.max_concurrent = max_concurrent
+        self._waiting: Dict[str, _Waiter] = {}
+        self._running: Dict[str, str] = {}
+        self._project_running: Dict[str, int] = {}
+        self._project_served: Dict[str, int] = {}
+        self._seq = itertools.count()
+
+    def _order_key(self, waiter: _Waiter) -> Tuple[int, int, int, int]:
+        return (
+            waiter.rank,
+            self._project_running.get(waiter.project_id, 0),
+            self._project_served.get(waiter.project_id, -1),
+            waiter.seq,
+        )
+
+    def _ordered_waiters(self) -> List[_Waiter]:
+        return sorted(self._waiting.values(), key=self._order_key)
+
+    def _grant(self, job_id: str, project_id: str) -> None:
+        self._running[job_id] = project_id
+        self._project_running[project_id] = self._project_running.get(project_id, 0) + 1
+        self._project_served[project_id] = next(self._seq)
+
+    def _release(self, job_id: str) -> None:
+        project_id = self._running.pop(job_id, None)
+        if project_id is not None:
+            self._project_running[project_id] -= 1
+            if not self._project_running[project_id]:
+                del self._project_running[project_id]
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Hand free slots to the best waiting jobs"""
+        while len(self._running) < self.max_concurrent and self._waiting:
+            waiter = self._ordered_waiters()[0]
+            del self._waiting[waiter.job_id]
+            if waiter.future.done():
+                continue
+            self._grant(waiter.job_id, waiter.project_id)
+            waiter.future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, job_id: str, project_id: str, priority: str = "normal") -> AsyncIterator[None]:
+        """
+        Wait for an execution slot and hold it for the duration of the block.
+
+        Raises ValueError if ``job_id`` is already waiting or running, since
+        a second waiter under the same ID would orphan the first.
+        """
+        if job_id in self._waiting or job_id in self._running:
+            raise ValueError(f"Job {job_id} is already queued or running")
+        rank = PRIORITY_CLASSES.get(priority, PRIORITY_CLASSES["normal"])
+
+        if len(self._running) < self.max_concurrent and not self._waiting:
+            self._grant(job_id, project_id)
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._waiting[job_id] = _Waiter(job_id, project_id, rank, next(self._seq), future)
+            position = self.queue_position(job_id)
+            logger.info(f"Job {job_id} queued at position {position}")
+            try:
+                with tracer.start_as_current_span("queue wait", attributes={"queue.position": position, "priority": priority}):
+                    await future
+            except BaseException:
+                if self._waiting.pop(job_id, None) is None and job_id in self._running:
+                    self._release(job_id)
+                raise
+
+        try:
+            yield
+        finally:
+            self._release(job_id)
+
+    def queue_position(self, job_id: str) -> Optional[int]:
+        """1-based position of a waiting job, or None if it is not queued"""
+        if job_id not in self._waiting:
+            return None
+        for position, waiter in enumerate(self._ordered_waiters(), start=1):
+            if waiter.job_id == job_id:
+                return position
+        return None
+
+    def queue_positions(self) -> Dict[str, int]:
+        """1-based positions of all waiting jobs, computed in one pass"""
+        return {waiter.job_id: position for position, waiter in enumerate(self._ordered_waiters(), start=1)}
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "running": len(self._running),
+            "queued": len(self._waiting),
+            "max_concurrent": self.max_concurrent,
+        }
+
+
+execution_scheduler = JobScheduler(settings.max_concurrent_tests)
@@ -0,0 +1,110 @@
+"""
+Multi-scanner security pipeline.
+
+The repository is checked out once and every requested scanner runs
+concurrently against that shared, read-only checkout. Findings from all
+scanners are merged into one report with normalized severities.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from app.services.metrics import scan_phase
+from app.services.repo_cache import repository_cache
+from app.services.security_scanner import (
+    SEVERITY_LEVELS,
+    SecurityScanner,
+    get_security_scanner,
+    normalize_severity,
+)
+from app.services.workspace_pool import workspace_pool
+
+logger = logging.getLogger(__name__)
+
+# Result keys holding each scanner's list of issues
+FINDING_KEYS = ["vulnerabilities", "findings"]
+
+
+async def _run_scanner(
+    scanner: SecurityScanner,
+    project_dir: str,
+    repository_url: str,
+    baseline_commit: Optional[str]
+) -> Dict[str, Any]:
+    started = time.monotonic()
+    results = await scanner.scan_checkout(project_dir, repository_url, baseline_commit)
+    results["duration"] = round(time.monotonic() - started, 3)
+    return results
+
+
+def combine_results(scanner_results: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge per-scanner results into one report with normalized severities"""
+    findings: List[Dict[str, Any]] = []
+    summaries: Dict[str, Dict[str, Any]] = {}
+    for scanner_type, results in scanner_results.items():
+        for key in FINDING_KEYS:
+            for finding in results.get(key) or []:
+                findings.append({
+                    **finding,
+                    "scanner": scanner_type,
+                    "severity": normalize_severity(finding.get("severity"), finding.get("source", "")),
+                    "native_severity": finding.get("severity")
+                })
+        summaries[scanner_type] = {k: v for k, v in results.items() if k not in FINDING_KEYS}
+
+    findings.sort(key=lambda f: SEVERITY_LEVELS.index(f["severity"]))
+    report = {
+        "scanner": "pipeline",
+        "scanners": list(scanner_results),
+        "total_findings": len(findings),
+        **{level: sum(1 for f in findings if f["severity"] == level) for level in SEVERITY_LEVELS},
+        "findings": findings,
+        "scanner_results": summaries,
+        "success": all(r.get("success") for r in scanner_results.values())
+    }
+    failed = [t for t, r in scanner_results.items() if not r.get("success")]
+    if failed:
+        report["error"] = f"Scanners failed: {', '.join(failed)}"
+    return report
+
+
+async def run_security_pipeline(
+    repository_url: str,
+    scanner_types: List[str],
+    branch: str = "main",
+    commit: Optional[str] = None,
+    baseline_commit: Optional[str] = None
+) -> Dict[str, Any]:
+    """Check the repository out once and run every scanner against it concurrently"""
+    scanners = [get_security_scanner(scanner_type) for scanner_type in scanner_types]
+    temp_dir = None
+    started = time.monotonic()
+
+    try:
+        temp_dir = await workspace_pool.acquire("tsuite_pipeline_")
+        logger.info(f"Cloning {repository_url} (branch: {branch}) for {', '.join(scanner_types)} scans")
+        with scan_phase("pipeline", "checkout"):
+            await repository_cache.checkout(repository_url, branch, temp_dir, commit=commit)
+        checkout_duration = time.monotonic() - started
+
+        results = await asyncio.gather(*(
+            _run_scanner(scanner, temp_dir, repository_url, baseline_commit) for scanner in scanners
+        ))
+        report = combine_results({scanner.scanner_type: result for scanner, result in zip(scanners, results)})
+        report["checkout_duration"] = round(checkout_duration, 3)
+        report["duration"] = round(time.monotonic() - started, 3)
+        return report
+
+    except Exception as e:
+        logger.error(f"Security pipeline failed: {str(e)}")
+        return {
+            "scanner": "pipeline",
+            "scanners": scanner_types,
+            "success": False,
+            "error": str(e),
+            "total_findings": 0
+        }
+    finally:
+        with scan_phase("pipeline", "cleanup"):
+            workspace_pool.release(temp_dir)
@@ -1,23 +1,124 @@
-import subprocess
+import asyncio
 import json
 import logging
-from typing import Dict, Any, List, Optional
+import time
+from typing import Awaitable, Callable, Dict, Any, List, Optional, Tuple
 from pathlib import Path
 import tempfile
 import shutil
 
+from app.config import settings
+from app.services.advisory_db import NPM_LOCKFILES, advisory_db, installed_packages, unpinned_requirements
+from app.services.process import gather_or_cancel, run_process
+from app.services.impact import changed_files, resolve_commit, tracked_files
+from app.services.metrics import ACTIVE_SCANS, record_scan, scan_phase
+from app.services.repo_cache import repository_cache
+from app.services.sast_baseline import assign_fingerprints, diff_findings, sast_baselines
+from app.services.scan_cache import dependency_scan_cache
+from app.services.sharding import partition_by_duration
+from app.services.toolchain import toolchain
+from app.services.workspace_pool import workspace_pool
+
 logger = logging.getLogger(__name__)
 
+SEVERITY_LEVELS = ["critical", "high", "medium", "low"]
+
+# Bytes of target paths per semgrep command line, far below ARG_MAX with room for the environment
+SEMGREP_ARGUMENT_BUDGET = 128 * 1024
+
+# Scanner-native severities onto SEVERITY_LEVELS (semgrep follows the SAST summary counts)
+SEVERITY_MAPS = {
+    "semgrep": {"error": "critical", "warning": "high", "info": "medium"},
+    "npm": {"moderate": "medium", "info": "low"},
+}
+
+
+def normalize_severity(severity: Optional[str], source: str = "") -> str:
+    """Map a finding's severity onto critical/high/medium/low"""
+    severity = (severity or "").lower()
+    severity = SEVERITY_MAPS.get(source, {}).get(severity, severity)
+    return severity if severity in SEVERITY_LEVELS else "medium"
+
 
 class SecurityScanner:
     """Base class for security scanners"""
     
+    # Prefix of the scanner's own checkout directory
+    TEMP_PREFIX = "tsuite_security_"
+    # Result key holding the number of issues found
+    TOTAL_KEY = "total_findings"
+    
     def __init__(self, scanner_type: str):
         self.scanner_type = scanner_type
     
-    async def scan(self, repository_url: str, branch: str = "main") -> Dict[str, Any]:
-        """Run security scan and return results"""
+    async def scan(
+        self,
+        repository_url: str,
+        branch: str = "main",
+        commit: Optional[str] = None,
+        baseline_commit: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Check out the repository and scan it"""
+        temp_dir = None
+        
+        try:
+            # Create temporary directory
+            temp_dir = await workspace_pool.acquire(self.TEMP_PREFIX)
+            logger.info(f"Using workspace for {self.scanner_type} scan: {temp_dir}")
+            
+            # Clone repository
+            logger.info(f"Cloning {repository_url} (branch: {branch})")
+            with scan_phase(self.scanner_type, "checkout"):
+                await repository_cache.checkout(repository_url, branch, temp_dir, commit=commit)
+            
+            return await self.scan_checkout(temp_dir, repository_url, baseline_commit)
+            
+        except Exception as e:
+            logger.error(f"{self.scanner_type} scan failed: {str(e)}")
+            results = self.failure(str(e))
+            record_scan(self.scanner_type, results)
+            return results
+        finally:
+            # Clean up
+            with scan_phase(self.scanner_type, "cleanup"):
+                workspace_pool.release(temp_dir)
+    
+    async def scan_checkout(
+        self,
+        project_dir: str,
+        repository_url: Optional[str] = None,
+        baseline_commit: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Run scan_path with timing and outcome metrics; failures become failed results"""
+        with ACTIVE_SCANS.labels(scanner=self.scanner_type).track_inprogress(), scan_phase(self.scanner_type, "scan"):
+            try:
+                results = await self.scan_path(project_dir, repository_url, baseline_commit)
+            except Exception as e:
+                logger.error(f"{self.scanner_type} scan failed: {str(e)}")
+                results = self.failure(str(e))
+        record_scan(self.scanner_type, results)
+        return results
+    
+    async def scan_path(
+        self,
+        project_dir: str,
+        repository_url: Optional[str] = None,
+        baseline_commit: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Scan an existing checkout and return results. The checkout is treated
+        as read-only so several scanners can share it. Scanners that support
+        it only re-scan what changed since ``baseline_commit``.
+        """
         raise NotImplementedError
+    
+    def failure(self, error: str) -> Dict[str, Any]:
+        return {
+            "scanner": self.scanner_type,
+            "success": False,
+            "error": error,
+            self.TOTAL_KEY: 0
+        }
 
 
 class DependencyScanner(SecurityScanner):
@@ -26,92 +127,154 @@ class DependencyScanner(SecurityScanner):
     def __init__(self):
         super().__init__("dependency")
     
-    async def scan(self, repository_url: str, branch: str = "main") -> Dict[str, Any]:
+    TOTAL_KEY = "total_vulnerabilities"
+    
+    async def scan_path(
+        self,
+        project_dir: str,
+        repository_url: Optional[str] = None,
+        baseline_commit: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
         Scan dependencies for vulnerabilities
-        Supports npm audit for JavaScript and safety for Python
+        Uses the offline advisory database where it can, otherwise
+        npm audit for JavaScript and safety for Python
         """
-        temp_dir = None
+        vulnerabilities = []
+        cached = []
+        backends = {}
+        unaudited = {}
+        unpinned = {}
         
-        try:
-            # Create temporary directory
-            temp_dir = tempfile.mkdtemp(prefix="tsuite_security_")
-            logger.info(f"Created temp directory for security scan: {temp_dir}")
-            
-            # Clone repository
-            logger.info(f"Cloning {repository_url} (branch: {branch})")
-            clone_result = subprocess.run(
-                ["git", "clone", "-b", branch, "--depth", "1", repository_url, temp_dir],
-                capture_output=True,
-                text=True,
-                timeout=300
-            )
-            
-            if clone_result.returncode != 0:
-                raise Exception(f"Git clone failed: {clone_result.stderr}")
-            
-            vulnerabilities = []
-            
-            # Check for package.json (Node.js project)
-            if Path(temp_dir, "package.json").exists():
-                logger.info("Detected Node.js project, running npm audit")
-                npm_vulns = await self._scan_npm(temp_dir)
-                vulnerabilities.extend(npm_vulns)
-            
-            # Check for requirements.txt (Python project)
-            if Path(temp_dir, "requirements.txt").exists():
-                logger.info("Detected Python project, running safety check")
-                python_vulns = await self._scan_python(temp_dir)
-                vulnerabilities.extend(python_vulns)
-            
-            # Categorize by severity
-            critical = [v for v in vulnerabilities if v.get("severity") == "critical"]
-            high = [v for v in vulnerabilities if v.get("severity") == "high"]
-            medium = [v for v in vulnerabilities if v.get("severity") == "medium"]
-            low = [v for v in vulnerabilities if v.get("severity") == "low"]
-            
-            return {
-                "scanner": "dependency",
-                "total_vulnerabilities": len(vulnerabilities),
-                "critical": len(critical),
-                "high": len(high),
-                "medium": len(medium),
-                "low": len(low),
-                "vulnerabilities": vulnerabilities,
-                "success": True
-            }
-            
-        except Exception as e:
-            logger.error(f"Security scan failed: {str(e)}")
-            return {
-                "scanner": "dependency",
-                "success": False,
-                "error": str(e),
-                "total_vulnerabilities": 0
-            }
-        finally:
-            # Clean up
-            if temp_dir and Path(temp_dir).exists():
-                logger.info(f"Cleaning up temp directory: {temp_dir}")
-                shutil.rmtree(temp_dir, ignore_errors=True)
+        async def audit(ecosystem: str, online: Callable[[str], Awaitable[Optional[List[Dict[str, Any]]]]]) -> None:
+            found, hit, backends[ecosystem], skipped = await self._audit(project_dir, ecosystem, online)
+            if found is None:
+                # Never report an audit that could not run as a clean one
+                unaudited[ecosystem] = f"{backends[ecosystem]} audit could not run"
+                return
+            vulnerabilities.extend(found)
+            if hit:
+                cached.append(ecosystem)
+            if skipped:
+                unpinned[ecosystem] = skipped
+        
+        # Check for package.json (Node.js project)
+        if Path(project_dir, "package.json").exists():
+            logger.info("Detected Node.js project, auditing npm dependencies")
+            await audit("npm", self._scan_npm)
+        
+        # Check for requirements.txt (Python project)
+        if Path(project_dir, "requirements.txt").exists():
+            logger.info("Detected Python project, auditing Python dependencies")
+            await audit("python", self._scan_python)
+        
+        # Categorize by severity
+        critical = [v for v in vulnerabilities if v.get("severity") == "critical"]
+        high = [v for v in vulnerabilities if v.get("severity") == "high"]
+        medium = [v for v in vulnerabilities if v.get("severity") == "medium"]
+        low = [v for v in vulnerabilities if v.get("severity") == "low"]
+        
+        return {
+            "scanner": "dependency",
+            "total_vulnerabilities": len(vulnerabilities),
+            "critical": len(critical),
+            "high": len(high),
+            "medium": len(medium),
+            "low": len(low),
+            "vulnerabilities": vulnerabilities,
+            "cached": cached,
+            "backends": backends,
+            "unaudited": unaudited,
+            "unpinned": unpinned,
+            "success": not unaudited
+        }
+    
+    async def _audit(
+        self,
+        project_dir: str,
+        ecosystem: str,
+        online: Callable[[str], Awaitable[Optional[List[Dict[str, Any]]]]]
+    ) -> Tuple[Optional[List[Dict[str, Any]]], bool, str, List[str]]:
+        """
+        Audit one ecosystem against the offline advisory database when it
+        covers the ecosystem and every version is pinned, otherwise with the
+        online tool. Returns (vulnerabilities, cache hit, backend, requirements
+        the offline match skipped); vulnerabilities is None if the audit could
+        not run.
+        """
+        backend = settings.dependency_scan_backend
+        if backend != "online":
+            await asyncio.to_thread(advisory_db.refresh)
+            packages = installed_packages(project_dir, ecosystem)
+            unpinned = unpinned_requirements(project_dir, ecosystem)
+            fully_pinned = packages is not None and not unpinned
+            if backend == "offline" or (fully_pinned and advisory_db.covers(ecosystem)):
+                async def offline(_: str) -> Optional[List[Dict[str, Any]]]:
+                    if not advisory_db.loaded:
+                        logger.warning("Offline advisory database is not loaded")
+                        return None
+                    if packages is None:
+                        logger.warning(f"No pinned {ecosystem} versions to match offline")
+                        return None
+                    return advisory_db.match(ecosystem, packages)
+                
+                if unpinned:
+                    logger.warning(f"Offline {ecosystem} audit skips unpinned requirements: {', '.join(unpinned)}")
+                vulnerabilities, hit = await self._cached_scan(project_dir, ecosystem, offline, advisory_db.version)
+                return vulnerabilities, hit, "offline", unpinned
+        
+        vulnerabilities, hit = await self._cached_scan(project_dir, ecosystem, online)
+        return vulnerabilities, hit, "online", []
     
-    async def _scan_npm(self, project_dir: str) -> List[Dict[str, Any]]:
-        """Run npm audit"""
+    async def _cached_scan(
+        self,
+        project_dir: str,
+        ecosystem: str,
+        scan: Callable[[str], Awaitable[Optional[List[Dict[str, Any]]]]],
+        advisory_version: Optional[str] = None
+    ) -> Tuple[Optional[List[Dict[str, Any]]], bool]:
+        """
+        Audit one ecosystem, reusing findings for an identical manifest checked
+        against the same advisory data. Returns (vulnerabilities, cache hit);
+        vulnerabilities is None if the audit could not run.
+        """
+        key = dependency_scan_cache.key(project_dir, ecosystem, advisory_version) if settings.dependency_scan_cache_enabled else None
+        if key:
+            vulnerabilities = await dependency_scan_cache.store.call(dependency_scan_cache.get, key)
+            if vulnerabilities is not None:
+                logger.info(f"Reusing cached {ecosystem} audit ({key})")
+                return vulnerabilities, True
+        
+        vulnerabilities = await scan(project_dir)
+        if vulnerabilities is None:
+            # The audit itself failed; never cache that as "no vulnerabilities"
+            return None, False
+        if key:
+            await dependency_scan_cache.store.call(dependency_scan_cache.put, key, vulnerabilities)
+        return vulnerabilities, False
+    
+    async def _scan_npm(self, project_dir: str) -> Optional[List[Dict[str, Any]]]:
+        """Run npm audit (None if the audit could not run)"""
+        scratch_dir = None
         try:
-            # Install dependencies first
-            subprocess.run(
-                ["npm", "install", "--package-lock-only"],
-                cwd=project_dir,
-                capture_output=True,
-                timeout=300
-            )
+            audit_dir = project_dir
+            if not any(Path(project_dir, name).exists() for name in NPM_LOCKFILES):
+                # Resolve a lockfile in a scratch directory so the shared checkout stays untouched
+                scratch_dir = tempfile.mkdtemp(prefix="tsuite_npm_audit_")
+                for name in ["package.json", ".npmrc"]:
+                    if Path(project_dir, name).exists():
+                        shutil.copy2(Path(project_dir, name), Path(scratch_dir, name))
+                await run_process(
+                    ["npm", "install", "--package-lock-only", "--ignore-scripts"],
+                    cwd=scratch_dir,
+                    timeout=300
+                )
+                audit_dir = scratch_dir
             
             # Run npm audit
-            result = subprocess.run(
+            result = await run_process(
                 ["npm", "audit", "--json"],
-                cwd=project_dir,
-                capture_output=True,
-                text=True,
+                cwd=audit_dir,
                 timeout=60
             )
             
@@ -134,25 +297,19 @@ class DependencyScanner(SecurityScanner):
                 return vulnerabilities
         except Exception as e:
             logger.warning(f"npm audit failed: {str(e)}")
+        finally:
+            if scratch_dir:
+                shutil.rmtree(scratch_dir, ignore_errors=True)
         
-        return []
+        return None
     
-    async def _scan_python(self, project_dir: str) -> List[Dict[str, Any]]:
-        """Run safety check for Python dependencies"""
+    async def _scan_python(self, project_dir: str) -> Optional[List[Dict[str, Any]]]:
+        """Run safety check for Python dependencies (None if the check could not run)"""
         try:
-            # Check if safety is installed
-            subprocess.run(
-                ["pip", "install", "safety"],
-                capture_output=True,
-                timeout=60
-            )
-            
-            # Run safety check
-            result = subprocess.run(
-                ["safety", "check", "--json", "--file", "requirements.txt"],
+            # Run safety check with the provisioned toolchain
+            result = await run_process(
+                [toolchain.binary("safety"), "check", "--json", "--file", "requirements.txt"],
                 cwd=project_dir,
-                capture_output=True,
-                text=True,
                 timeout=60
             )
             
@@ -175,7 +332,7 @@ class DependencyScanner(SecurityScanner):
         except Exception as e:
             logger.warning(f"safety check failed: {str(e)}")
         
-        return []
+        return None
     
     def _map_python_severity(self, severity: str) -> str:
         """Map Python severity to standard levels"""
@@ -193,95 +350,241 @@ class SASTScanner(SecurityScanner):
     def __init__(self):
         super().__init__("sast")
     
-    async def scan(self, repository_url: str, branch: str = "main") -> Dict[str, Any]:
+    TEMP_PREFIX = "tsuite_sast_"
+    
+    async def scan_path(
+        self,
+        project_dir: str,
+        repository_url: Optional[str] = None,
+        baseline_commit: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
         Run SAST scan using semgrep
+        
+        With ``baseline_commit`` and a stored baseline for it, only files
+        changed since then are scanned; findings in other files are carried
+        over from the baseline and new/fixed findings are reported.
         """
-        temp_dir = None
+        commit = await resolve_commit(project_dir) if repository_url else None
+        rules_version = toolchain.rules_version()
+        incremental = None
+        if baseline_commit and commit:
+            incremental = await self._incremental_plan(project_dir, repository_url, baseline_commit, commit, rules_version)
         
-        try:
-            # Create temporary directory
-            temp_dir = tempfile.mkdtemp(prefix="tsuite_sast_")
-            logger.info(f"Created temp directory for SAST scan: {temp_dir}")
-            
-            # Clone repository
-            logger.info(f"Cloning {repository_url} (branch: {branch})")
-            clone_result = subprocess.run(
-                ["git", "clone", "-b", branch, "--depth", "1", repository_url, temp_dir],
-                capture_output=True,
-                text=True,
-                timeout=300
-            )
-            
-            if clone_result.returncode != 0:
-                raise Exception(f"Git clone failed: {clone_result.stderr}")
-            
-            # Install semgrep if not available
+        if incremental:
+            scanned, chunks = await self._scan_tree(project_dir, incremental["targets"]) if incremental["targets"] else ([], [])
+            changed = incremental["changed"]
+            baseline = incremental["baseline"]
+            findings = [f for f in baseline if f.get("file") not in changed] + scanned
+            diff = diff_findings([f for f in baseline if f.get("file") in changed], scanned)
+        else:
+            findings, chunks = await self._scan_tree(project_dir)
+        
+        if commit:
+            await sast_baselines.store.call(sast_baselines.put, repository_url, commit, rules_version, findings)
+        
+        results = self._summarize(findings)
+        results["chunks"] = chunks
+        if incremental:
+            results.update({
+                "mode": "incremental",
+                "commit": commit,
+                "baseline_commit": incremental["baseline_commit"],
+                "scanned_files": len(incremental["targets"]),
+                "new_findings": diff["new"],
+                "fixed_findings": diff["fixed"]
+            })
+        elif baseline_commit:
+            results.update({"mode": "full", "reason": "no stored baseline for that commit"})
+        return results
+    
+    async def _incremental_plan(
+        self,
+        project_dir: str,
+        repository_url: str,
+        baseline_commit: str,
+        commit: str,
+        rules_version: str
+    ) -> Optional[Dict[str, Any]]:
+        """Files to re-scan and the baseline to carry forward; None when a full scan is needed"""
+        base = await resolve_commit(project_dir, baseline_commit)
+        baseline = await sast_baselines.store.call(sast_baselines.get, repository_url, base, rules_version) if base else None
+        if baseline is None:
+            logger.info(f"No SAST baseline for {baseline_commit}; running a full scan")
+            return None
+        changed = await changed_files(project_dir, base, commit)
+        if changed is None:
+            return None
+        targets = [path for path in changed if Path(project_dir, path).is_file()]
+        logger.info(f"Incremental SAST scan of {len(targets)} changed files since {base}")
+        return {"baseline_commit": base, "baseline": baseline, "changed": set(changed), "targets": targets}
+    
+    async def _scan_tree(
+        self,
+        project_dir: str,
+        targets: Optional[List[str]] = None
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Scan ``targets`` (default: every tracked file) as size-balanced chunks,
+        each in its own semgrep process, and merge the findings. Returns the
+        findings and per-chunk timings.
+        """
+        files = targets if targets is not None else await tracked_files(project_dir)
+        sizes: Dict[str, float] = {}
+        for path in files or []:
             try:
-                subprocess.run(
-                    ["pip", "install", "semgrep"],
-                    capture_output=True,
-                    timeout=60
-                )
-            except:
-                pass
-            
-            # Run semgrep
-            logger.info("Running semgrep SAST scan")
-            result = subprocess.run(
-                ["semgrep", "--config=auto", "--json", "."],
-                cwd=temp_dir,
-                capture_output=True,
-                text=True,
-                timeout=300
-            )
-            
-            findings = []
-            if result.stdout:
-                try:
-                    data = json.loads(result.stdout)
-                    for finding in data.get("results", []):
-                        findings.append({
-                            "rule_id": finding.get("check_id", ""),
-                            "severity": finding.get("extra", {}).get("severity", "medium"),
-                            "message": finding.get("extra", {}).get("message", ""),
-                            "file": finding.get("path", ""),
-                            "line": finding.get("start", {}).get("line", 0),
-                            "category": finding.get("extra", {}).get("metadata", {}).get("category", "security"),
-                            "source": "semgrep"
-                        })
-                except json.JSONDecodeError:
-                    logger.warning("Could not parse semgrep output")
-            
-            # Categorize by severity
-            critical = [f for f in findings if f.get("severity") == "ERROR"]
-            high = [f for f in findings if f.get("severity") == "WARNING"]
-            medium = [f for f in findings if f.get("severity") == "INFO"]
-            
-            return {
-                "scanner": "sast",
-                "total_findings": len(findings),
-                "critical": len(critical),
-                "high": len(high),
-                "medium": len(medium),
-                "low": 0,
-                "findings": findings,
-                "success": True
-            }
-            
-        except Exception as e:
-            logger.error(f"SAST scan failed: {str(e)}")
-            return {
-                "scanner": "sast",
-                "success": False,
-                "error": str(e),
-                "total_findings": 0
+                sizes[path] = Path(project_dir, path).stat().st_size
+            except OSError:
+                continue
+        
+        chunk_count = min(settings.sast_parallelism, len(sizes) // max(1, settings.sast_min_chunk_files))
+        if chunk_count > 1:
+            chunks = partition_by_duration(list(sizes), sizes, chunk_count)
+            logger.info(f"Scanning {len(sizes)} files in {len(chunks)} SAST chunks")
+        else:
+            # Small trees keep a single run; semgrep walks the tree itself
+            chunks = [targets]
+        
+        async def scan_chunk(index: int, chunk: Optional[List[str]]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+            started = time.monotonic()
+            found = await self._semgrep(project_dir, chunk)
+            return found, {
+                "chunk": index,
+                "files": len(chunk) if chunk is not None else len(sizes) or None,
+                "bytes": int(sum(sizes.get(path, 0) for path in chunk)) if chunk is not None else None,
+                "findings": len(found),
+                "duration": round(time.monotonic() - started, 3)
             }
-        finally:
-            # Clean up
-            if temp_dir and Path(temp_dir).exists():
-                logger.info(f"Cleaning up temp directory: {temp_dir}")
-                shutil.rmtree(temp_dir, ignore_errors=True)
+        
+        # One failed chunk fails the scan; the other semgrep processes are stopped
+        outcomes = await gather_or_cancel(*(scan_chunk(index, chunk) for index, chunk in enumerate(chunks)))
+        
+        findings: List[Dict[str, Any]] = []
+        seen = set()
+        for found, _ in outcomes:
+            for finding in found:
+                identity = (finding.get("rule_id"), finding.get("file"), finding.get("line"), finding.get("fingerprint"))
+                if identity not in seen:
+                    seen.add(identity)
+                    findings.append(finding)
+        findings.sort(key=lambda f: (f.get("file", ""), f.get("line", 0)))
+        return findings, [timing for _, timing in outcomes]
+    
+    async def _semgrep(self, project_dir: str, targets: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Run semgrep over ``targets`` (default: the whole tree) and return
+        findings. Long target lists are passed in several consecutive
+        semgrep runs so no command line approaches ARG_MAX.
+        """
+        if not targets:
+            return await self._semgrep_run(project_dir, ["."])
+        findings: List[Dict[str, Any]] = []
+        for batch in _argument_batches(targets, SEMGREP_ARGUMENT_BUDGET):
+            findings.extend(await self._semgrep_run(project_dir, batch))
+        return findings
+    
+    async def _semgrep_run(self, project_dir: str, targets: List[str]) -> List[Dict[str, Any]]:
+        """One semgrep process over ``targets``"""
+        # Run semgrep with the provisioned toolchain and local ruleset
+        logger.info(f"Running semgrep SAST scan over {len(targets)} targets")
+        result = await run_process(
+            [
+                toolchain.binary("semgrep"),
+                f"--config={toolchain.semgrep_config()}",
+                "--metrics=off",
+                "--disable-version-check",
+                "--json",
+                *targets
+            ],
+            cwd=project_dir,
+            timeout=settings.sast_chunk_timeout
+        )
+        
+        findings = []
+        matched_code = {}
+        if result.stdout:
+            try:
+                data = json.loads(result.stdout)
+                matched_code = await asyncio.to_thread(_matched_sources, project_dir, data.get("results", []))
+                for finding in data.get("results", []):
+                    findings.append({
+                        "rule_id": finding.get("check_id", ""),
+                        "severity": finding.get("extra", {}).get("severity", "medium"),
+                        "message": finding.get("extra", {}).get("message", ""),
+                        "file": finding.get("path", ""),
+                        "line": finding.get("start", {}).get("line", 0),
+                        "category": finding.get("extra", {}).get("metadata", {}).get("category", "security"),
+                        "source": "semgrep"
+                    })
+            except json.JSONDecodeError:
+                logger.warning("Could not parse semgrep output")
+        elif result.returncode not in (0, 1):
+            # No report at all: never mistake a crashed scan for a clean one
+            raise Exception(f"semgrep failed: {result.stderr.strip()[-2000:]}")
+        assign_fingerprints(findings, matched_code)
+        return findings
+    
+    def _summarize(self, findings: List[Dict[str, Any]]) -> Dict[str, Any]:
+        # Categorize by severity
+        critical = [f for f in findings if f.get("severity") == "ERROR"]
+        high = [f for f in findings if f.get("severity") == "WARNING"]
+        medium = [f for f in findings if f.get("severity") == "INFO"]
+        
+        return {
+            "scanner": "sast",
+            "total_findings": len(findings),
+            "critical": len(critical),
+            "high": len(high),
+            "medium": len(medium),
+            "low": 0,
+            "findings": findings,
+            "success": True
+        }
+
+
+def _argument_batches(paths: List[str], budget: int) -> List[List[str]]:
+    """Split ``paths`` into consecutive batches whose command-line size stays within ``budget`` bytes"""
+    batches: List[List[str]] = []
+    batch: List[str] = []
+    size = 0
+    for path in paths:
+        # Each argument costs its bytes, a terminating NUL and an argv pointer
+        cost = len(path.encode()) + 1 + 8
+        if batch and size + cost > budget:
+            batches.append(batch)
+            batch, size = [], 0
+        batch.append(path)
+        size += cost
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _matched_sources(project_dir: str, results: List[Dict[str, Any]]) -> Dict[int, str]:
+    """
+    Source each semgrep result matched, keyed by result index, read from the
+    scanned file by byte offset. ``extra.lines`` is only a fallback: without
+    a semgrep login it is the placeholder "requires login" for every result.
+    """
+    files: Dict[str, Optional[bytes]] = {}
+    matched = {}
+    for index, finding in enumerate(results):
+        path = finding.get("path", "")
+        start = finding.get("start", {}).get("offset")
+        end = finding.get("end", {}).get("offset")
+        if path not in files:
+            try:
+                files[path] = Path(project_dir, path).read_bytes()
+            except OSError:
+                files[path] = None
+        source = files[path]
+        if source is not None and isinstance(start, int) and isinstance(end, int) and start < end:
+            matched[index] = source[start:end].decode("utf-8", errors="replace")
+            continue
+        lines = finding.get("extra", {}).get("lines", "")
+        if lines != "requires login":
+            matched[index] = lines
+    return matched
 
 
 def get_security_scanner(scanner_type: str) -> SecurityScanner:
@@ -0,0 +1,100 @@
+"""
+Test sharding helpers.
+
+Suites are split into shards balanced by historical per-test durations
+(longest-processing-time-first), and the durations observed in each run are
+fed back into a history shared through the result store.
+"""
+import heapq
+import logging
+import statistics
+from typing import Any, Dict, List
+
+from app.services.coverage import CoverageReport
+from app.services.result_store import ResultStore, get_result_store
+
+logger = logging.getLogger(__name__)
+
+# Assumed duration for tests that have never been seen
+DEFAULT_TEST_DURATION = 1.0
+
+
+def partition_by_duration(test_ids: List[str], durations: Dict[str, float], shards: int) -> List[List[str]]:
+    """
+    Split ``test_ids`` into at most ``shards`` non-empty groups of similar
+    total duration. Unknown tests are assumed to take the median known time.
+    """
+    shards = max(1, min(shards, len(test_ids)))
+    known = [durations[t] for t in test_ids if t in durations]
+    fallback = statistics.median(known) if known else DEFAULT_TEST_DURATION
+
+    order = {test_id: index for index, test_id in enumerate(test_ids)}
+    heap = [(0.0, index) for index in range(shards)]
+    groups: List[List[str]] = [[] for _ in range(shards)]
+    for test_id in sorted(test_ids, key=lambda t: durations.get(t, fallback), reverse=True):
+        load, index = heapq.heappop(heap)
+        groups[index].append(test_id)
+        heapq.heappush(heap, (load + durations.get(test_id, fallback), index))
+
+    # Keep the original collection order inside each shard
+    return [sorted(group, key=order.__getitem__) for group in groups if group]
+
+
+class DurationHistory:
+    """Most recent duration per test (or suite) for each repository"""
+
+    def __init__(self, store: ResultStore):
+        self.store = store
+
+    def _key(self, framework: str, repository_url: str) -> str:
+        return f"{framework}:{repository_url}"
+
+    def get(self, framework: str, repository_url: str) -> Dict[str, float]:
+        return self.store.get(self._key(framework, repository_url), {}).get("durations", {})
+
+    def record(self, framework: str, repository_url: str, test_results: List[Dict[str, Any]], unit: str) -> None:
+        """Fold a run's compact test records into the history, grouped by ``unit`` ("suite" or "name")"""
+        observed: Dict[str, float] = {}
+        for record in test_results:
+            key = record.get(unit)
+            if key:
+                observed[key] = observed.get(key, 0.0) + (record.get("duration") or 0.0)
+        if not observed:
+            return
+
+        durations = self.get(framework, repository_url)
+        durations.update(observed)
+        self.store[self._key(framework, repository_url)] = {"durations": durations}
+
+
+def merge_shard_results(shard_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine per-shard results (counts, test records, coverage) into one run result"""
+    coverage = CoverageReport()
+    for result in shard_results:
+        coverage.merge(CoverageReport.from_dict(result.get("coverage") or {}))
+
+    merged = {
+        "total_tests": sum(r.get("total_tests", 0) for r in shard_results),
+        "passed": sum(r.get("passed", 0) for r in shard_results),
+        "failed": sum(r.get("failed", 0) for r in shard_results),
+        "skipped": sum(r.get("skipped", 0) for r in shard_results),
+        # Shards run concurrently, so the run takes as long as its slowest shard
+        "duration": max((r.get("duration", 0) for r in shard_results), default=0),
+        "test_results": [record for r in shard_results for record in r.get("test_results", [])],
+        "coverage": coverage.to_dict(),
+        "exit_code": next((r["exit_code"] for r in shard_results if r.get("exit_code")), 0),
+        "shards": [
+            {
+                "index": index,
+                "tests": r.get("total_tests", 0),
+                "duration": r.get("duration", 0),
+                "exit_code": r.get("exit_code"),
+            }
+            for index, r in enumerate(shard_results)
+        ],
+    }
+    merged["success"] = all(r.get("exit_code") == 0 for r in shard_results)
+    return merged
+
+
+duration_history = DurationHistory(get_result_store("test_durations"))
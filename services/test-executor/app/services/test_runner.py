@@ -1,13 +1,47 @@
+import asyncio
+import io
 import subprocess
 import json
 import logging
-from typing import Dict, Any, Optional
+import os
+import re
+from contextlib import AsyncExitStack
+from typing import Callable, Dict, Any, List, Optional, Tuple
 from pathlib import Path
-import tempfile
-import shutil
+
+from app.config import settings
+from app.services.coverage import CoverageReport, FileCoverage, relative_path
+from app.services.dependency_cache import dependency_cache, virtualenv_environment
+from app.services.impact import changed_files, impact_maps, requires_full_suite, resolve_commit
+from app.services.interpreter_pool import interpreter_pool
+from app.services.metrics import run_phase
+from app.services.process import OutputCallback, ProcessResult, gather_or_cancel, run_process
+from app.services.repo_cache import repository_cache
+from app.services.result_parser import compact_pytest_test, parse_jest_report
+from app.services.sharding import duration_history, merge_shard_results, partition_by_duration
+from app.services.workspace_pool import workspace_pool
 
 logger = logging.getLogger(__name__)
 
+# Receives live events (phase, progress, output, suite, test) during a run
+EventCallback = Callable[[Dict[str, Any]], None]
+
+# Output lines longer than this are truncated in live events
+MAX_EVENT_LINE_LENGTH = 4096
+
+# Overall progress reported when each phase starts; the test phase
+# advances from PROGRESS_TESTS towards PROGRESS_PARSE as tests report in
+PROGRESS_CLONE = 0
+PROGRESS_INSTALL = 10
+PROGRESS_TESTS = 30
+PROGRESS_PARSE = 95
+
+# Name prefix of test run workspaces
+WORKSPACE_PREFIX = "tsuite_test_"
+
+# Report file the default Jest command writes inside the workspace ({suffix} is "-<shard>" when sharded)
+JEST_REPORT_FILE = "tsuite-jest-report{suffix}.json"
+
 
 class TestRunner:
     """Base class for test runners"""
@@ -20,10 +54,177 @@ class TestRunner:
         repository_url: str,
         branch: str = "main",
         test_command: Optional[str] = None,
-        environment_vars: Optional[Dict[str, str]] = None
+        environment_vars: Optional[Dict[str, str]] = None,
+        on_event: Optional[EventCallback] = None,
+        shards: Optional[int] = None,
+        commit: Optional[str] = None,
+        base_commit: Optional[str] = None,
+        impact_analysis: bool = False
     ) -> Dict[str, Any]:
         """Run tests and return results"""
         raise NotImplementedError
+    
+    # What historical durations and shards are keyed by: "suite" (test file) or "name" (single test)
+    SHARD_UNIT = "name"
+    
+    async def _list_tests(self, temp_dir: str, env: Dict[str, str], selection: Optional[List[str]] = None) -> List[str]:
+        """Identifiers of every test (or suite) in the checkout or ``selection``, in SHARD_UNIT terms"""
+        raise NotImplementedError
+    
+    async def _related_tests(
+        self,
+        repository_url: str,
+        temp_dir: str,
+        env: Dict[str, str],
+        commit: str,
+        changed: List[str]
+    ) -> Tuple[Optional[List[str]], Optional[str]]:
+        """Tests affected by ``changed`` files, or (None, reason) when the full suite must run"""
+        return None, f"impact analysis is not supported for {self.framework}"
+    
+    async def _record_run(self, repository_url: str, temp_dir: str, commit: Optional[str]) -> None:
+        """Update per-repository state derived from a finished run"""
+    
+    async def _select_impacted(
+        self,
+        repository_url: str,
+        temp_dir: str,
+        env: Dict[str, str],
+        commit: Optional[str],
+        base_commit: Optional[str]
+    ) -> Tuple[Optional[List[str]], Dict[str, Any]]:
+        """
+        Diff the checkout against ``base_commit`` (default: its parent) and
+        pick the tests the change can affect. None means run the full suite.
+        """
+        base = base_commit or f"{commit or 'HEAD'}~1"
+        impact: Dict[str, Any] = {"mode": "full", "commit": commit, "base_commit": base}
+        changed = await changed_files(temp_dir, base, commit or "HEAD")
+        if changed is None:
+            impact["reason"] = f"base commit {base} is not available"
+            return None, impact
+        impact["changed_files"] = len(changed)
+        
+        reason = requires_full_suite(self.framework, changed)
+        if reason:
+            impact["reason"] = reason
+            return None, impact
+        
+        selection, reason = await self._related_tests(repository_url, temp_dir, env, commit, changed)
+        if selection is None:
+            impact["reason"] = reason
+            return None, impact
+        impact.update({"mode": "impacted", "selected_tests": len(selection)})
+        return selection, impact
+    
+    async def _run_selection(
+        self,
+        temp_dir: str,
+        env: Dict[str, str],
+        on_event: Optional[EventCallback],
+        test_command: Optional[str] = None,
+        selection: Optional[List[str]] = None,
+        shard: Optional[Tuple[int, int]] = None
+    ) -> Dict[str, Any]:
+        """Run the whole suite, or only ``selection``, as one test process and parse its report"""
+        raise NotImplementedError
+    
+    async def _run_suite(
+        self,
+        repository_url: str,
+        temp_dir: str,
+        env: Dict[str, str],
+        on_event: Optional[EventCallback],
+        test_command: Optional[str] = None,
+        shards: Optional[int] = None,
+        base_commit: Optional[str] = None,
+        impact_analysis: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Run the test phase, split across parallel shards when requested.
+        
+        Shards are balanced by the durations recorded from earlier runs of
+        the same repository. With impact analysis only the tests affected by
+        the change since ``base_commit`` run. Custom test commands always run
+        unsharded and unfiltered.
+        """
+        self._phase(on_event, "test", PROGRESS_TESTS)
+        commit = await resolve_commit(temp_dir)
+        
+        selection = None
+        impact = None
+        if impact_analysis:
+            if test_command:
+                impact = {"mode": "full", "commit": commit, "reason": "custom test command"}
+            else:
+                selection, impact = await self._select_impacted(repository_url, temp_dir, env, commit, base_commit)
+            logger.info(f"Impact analysis: {impact}")
+        
+        shard_count = min(shards or 1, settings.max_shards)
+        if selection == []:
+            logger.info("No tests affected by the change")
+            results = {
+                "success": True,
+                "exit_code": 0,
+                "total_tests": 0,
+                "passed": 0,
+                "failed": 0,
+                "skipped": 0,
+                "duration": 0,
+                "test_results": [],
+                "coverage": {}
+            }
+        elif shard_count > 1 and not test_command:
+            test_ids = await self._list_tests(temp_dir, env, selection)
+            if len(test_ids) > 1:
+                durations = await duration_history.store.call(duration_history.get, self.framework, repository_url)
+                partitions = partition_by_duration(test_ids, durations, shard_count)
+                logger.info(f"Running {len(test_ids)} {self.SHARD_UNIT}s in {len(partitions)} shards")
+                # A failed shard fails the run; the others are stopped before the workspace goes
+                shard_results = await gather_or_cancel(*(
+                    self._run_selection(temp_dir, env, on_event, selection=ids, shard=(index, len(partitions)))
+                    for index, ids in enumerate(partitions)
+                ))
+                results = merge_shard_results(shard_results)
+            else:
+                results = await self._run_selection(temp_dir, env, on_event, selection=selection)
+        else:
+            results = await self._run_selection(temp_dir, env, on_event, test_command=test_command, selection=selection)
+        
+        if impact:
+            results["impact"] = impact
+        if not test_command:
+            await duration_history.store.call(
+                duration_history.record, self.framework, repository_url, results.get("test_results", []), self.SHARD_UNIT
+            )
+        try:
+            await self._record_run(repository_url, temp_dir, commit)
+        except Exception as e:
+            logger.warning(f"Could not update impact map for {repository_url}: {e}")
+        return results
+    
+    def _phase(self, on_event: Optional[EventCallback], phase: str, progress: int) -> None:
+        """Report the start of a pipeline phase"""
+        if on_event:
+            on_event({"type": "phase", "phase": phase, "progress": progress})
+    
+    def _output_handler(self, on_event: Optional[EventCallback]) -> Optional[OutputCallback]:
+        """Turn child process output lines into live events"""
+        if on_event is None:
+            return None
+        
+        def handle(stream: str, line: str) -> None:
+            if len(line) > MAX_EVENT_LINE_LENGTH:
+                line = line[:MAX_EVENT_LINE_LENGTH] + "..."
+            on_event({"type": "output", "stream": stream, "line": line})
+            for event in self._parse_output_line(line):
+                on_event(event)
+        
+        return handle
+    
+    def _parse_output_line(self, line: str) -> List[Dict[str, Any]]:
+        """Extract suite/test/progress events from one line of test output"""
+        return []
 
 
 class JestRunner(TestRunner):
@@ -37,7 +238,12 @@ class JestRunner(TestRunner):
         repository_url: str,
         branch: str = "main",
         test_command: Optional[str] = None,
-        environment_vars: Optional[Dict[str, str]] = None
+        environment_vars: Optional[Dict[str, str]] = None,
+        on_event: Optional[EventCallback] = None,
+        shards: Optional[int] = None,
+        commit: Optional[str] = None,
+        base_commit: Optional[str] = None,
+        impact_analysis: bool = False
     ) -> Dict[str, Any]:
         """
         Run Jest tests
@@ -45,7 +251,7 @@ class JestRunner(TestRunner):
         Steps:
         1. Clone repository
         2. Install dependencies (npm install)
-        3. Run tests with coverage
+        3. Run tests with coverage, optionally split into parallel shards
         4. Parse results
         5. Clean up
         """
@@ -53,62 +259,49 @@ class JestRunner(TestRunner):
         
         try:
             # Create temporary directory
-            temp_dir = tempfile.mkdtemp(prefix="tsuite_test_")
-            logger.info(f"Created temp directory: {temp_dir}")
+            temp_dir = await workspace_pool.acquire(WORKSPACE_PREFIX)
+            logger.info(f"Using workspace: {temp_dir}")
             
             # Clone repository
-            logger.info(f"Cloning {repository_url} (branch: {branch})")
-            clone_result = subprocess.run(
-                ["git", "clone", "-b", branch, "--depth", "1", repository_url, temp_dir],
-                capture_output=True,
-                text=True,
-                timeout=300
-            )
-            
-            if clone_result.returncode != 0:
-                raise Exception(f"Git clone failed: {clone_result.stderr}")
+            logger.info(f"Cloning {repository_url} (branch: {branch}, commit: {commit or 'latest'})")
+            self._phase(on_event, "clone", PROGRESS_CLONE)
+            with run_phase(self.framework, "clone"):
+                await repository_cache.checkout(repository_url, branch, temp_dir, commit=commit)
             
-            # Install dependencies
-            logger.info("Installing dependencies...")
-            install_result = subprocess.run(
-                ["npm", "install"],
-                cwd=temp_dir,
-                capture_output=True,
-                text=True,
-                timeout=600
-            )
-            
-            if install_result.returncode != 0:
-                logger.warning(f"npm install had warnings: {install_result.stderr}")
+            # Install dependencies, reusing a cached node_modules tree when the lockfile matches
+            self._phase(on_event, "install", PROGRESS_INSTALL)
+            with run_phase(self.framework, "install"):
+                cache_key = dependency_cache.lockfile_key(temp_dir, "npm") if settings.dependency_cache_enabled else None
+                if cache_key and await dependency_cache.restore_node_modules(cache_key, temp_dir):
+                    logger.info(f"Restored node_modules from dependency cache ({cache_key})")
+                else:
+                    logger.info("Installing dependencies...")
+                    install_result = await run_process(
+                        ["npm", "install"],
+                        cwd=temp_dir,
+                        timeout=600
+                    )
+                    
+                    if install_result.returncode != 0:
+                        logger.warning(f"npm install had warnings: {install_result.stderr}")
+                    elif cache_key:
+                        await dependency_cache.store_node_modules(cache_key, temp_dir)
             
             # Run tests
-            test_cmd = test_command or "npm test -- --json --coverage"
-            logger.info(f"Running tests: {test_cmd}")
-            
             env = environment_vars or {}
             env["CI"] = "true"  # Run in CI mode
             
-            test_result = subprocess.run(
-                test_cmd.split(),
-                cwd=temp_dir,
-                capture_output=True,
-                text=True,
-                timeout=600,
-                env={**subprocess.os.environ, **env}
+            return await self._run_suite(
+                repository_url, temp_dir, {**os.environ, **env}, on_event, test_command, shards,
+                base_commit, impact_analysis
             )
             
-            # Parse Jest JSON output
-            results = self._parse_jest_output(test_result.stdout, test_result.stderr)
-            results["exit_code"] = test_result.returncode
-            results["success"] = test_result.returncode == 0
-            
-            return results
-            
         except subprocess.TimeoutExpired:
             logger.error("Test execution timed out")
             return {
                 "success": False,
                 "error": "Test execution timed out",
+                "timed_out": True,
                 "total_tests": 0,
                 "passed": 0,
                 "failed": 0,
@@ -126,27 +319,145 @@ class JestRunner(TestRunner):
             }
         finally:
             # Clean up
-            if temp_dir and Path(temp_dir).exists():
-                logger.info(f"Cleaning up temp directory: {temp_dir}")
-                shutil.rmtree(temp_dir, ignore_errors=True)
+            with run_phase(self.framework, "cleanup"):
+                workspace_pool.release(temp_dir)
     
-    def _parse_jest_output(self, stdout: str, stderr: str) -> Dict[str, Any]:
-        """Parse Jest JSON output"""
+    # "PASS src/a.test.js (1.2 s)" / "FAIL src/b.test.js"
+    SUITE_LINE = re.compile(r"^\s*(PASS|FAIL)\s+(\S+)")
+    # Verbose reporter: "✓ adds numbers (3 ms)", "✕ fails", "○ skipped pending"
+    TEST_LINE = re.compile(r"^\s*(✓|✕|○|√|×)\s+(?:skipped\s+)?(.+?)(?:\s+\((\d+)\s*ms\))?$")
+    TEST_STATUS = {"✓": "passed", "√": "passed", "✕": "failed", "×": "failed", "○": "skipped"}
+    
+    def _parse_output_line(self, line: str) -> List[Dict[str, Any]]:
+        """Jest prints one line per finished suite, and per test with --verbose"""
+        match = self.SUITE_LINE.match(line)
+        if match:
+            status = "passed" if match.group(1) == "PASS" else "failed"
+            return [{"type": "suite", "name": match.group(2), "status": status}]
+        
+        match = self.TEST_LINE.match(line)
+        if match:
+            event = {"type": "test", "name": match.group(2), "status": self.TEST_STATUS[match.group(1)]}
+            if match.group(3):
+                event["duration"] = int(match.group(3)) / 1000
+            return [event]
+        return []
+    
+    SHARD_UNIT = "suite"
+    
+    async def _list_tests(self, temp_dir: str, env: Dict[str, str], selection: Optional[List[str]] = None) -> List[str]:
+        """Test files Jest would run, relative to the checkout"""
+        if selection is not None:
+            return selection
+        return await self._jest_list(temp_dir, env) or []
+    
+    async def _jest_list(self, temp_dir: str, env: Dict[str, str], *args: str) -> Optional[List[str]]:
+        """Run ``jest --listTests`` with extra arguments; None if Jest could not list tests"""
+        result = await run_process(
+            ["npm", "test", "--silent", "--", "--listTests", "--json", *args],
+            cwd=temp_dir,
+            timeout=300,
+            env=env
+        )
+        for line in reversed(result.stdout.splitlines()):
+            if line.startswith("["):
+                try:
+                    return sorted(relative_path(path, temp_dir) for path in json.loads(line))
+                except ValueError:
+                    break
+        logger.warning(f"Could not list Jest tests: {result.stderr.strip()}")
+        return None
+    
+    async def _related_tests(
+        self,
+        repository_url: str,
+        temp_dir: str,
+        env: Dict[str, str],
+        commit: str,
+        changed: List[str]
+    ) -> Tuple[Optional[List[str]], Optional[str]]:
+        """Jest resolves the tests that import changed files from its own module graph"""
+        existing = [path for path in changed if (Path(temp_dir) / path).exists()]
+        if len(existing) != len(changed):
+            # A deleted module is no longer in Jest's graph, so its dependents cannot be found
+            return None, "files were deleted"
+        if not existing:
+            return [], None
+        related = await self._jest_list(temp_dir, env, "--findRelatedTests", *existing)
+        if related is None:
+            return None, "Jest could not resolve related tests"
+        return related, None
+    
+    async def _run_selection(
+        self,
+        temp_dir: str,
+        env: Dict[str, str],
+        on_event: Optional[EventCallback],
+        test_command: Optional[str] = None,
+        selection: Optional[List[str]] = None,
+        shard: Optional[Tuple[int, int]] = None
+    ) -> Dict[str, Any]:
+        """Run Jest once; the default command writes its JSON report to a file so it can be streamed"""
+        report_path = os.path.join(temp_dir, JEST_REPORT_FILE.format(suffix=f"-{shard[0]}" if shard else ""))
+        if test_command:
+            args = test_command.split()
+        else:
+            args = ["npm", "test", "--", "--json", "--coverage", f"--outputFile={report_path}"]
+            if shard:
+                # Shards share the host's cores instead of each starting a full worker pool
+                args.append(f"--maxWorkers={max(1, (os.cpu_count() or 1) // shard[1])}")
+            if selection is not None:
+                args += ["--runTestsByPath", *selection]
+        logger.info(f"Running tests: {' '.join(args[:12])}{' ...' if len(args) > 12 else ''}")
+        
+        with run_phase(self.framework, "run"):
+            test_result = await run_process(
+                args,
+                cwd=temp_dir,
+                timeout=settings.test_timeout,
+                env=env,
+                on_output=self._output_handler(on_event)
+            )
+        
+        # Parse Jest JSON output
+        self._phase(on_event, "parse", PROGRESS_PARSE)
+        with run_phase(self.framework, "parse"):
+            results = await asyncio.to_thread(
+                self._parse_jest_output, test_result.stdout, test_result.stderr, report_path, temp_dir
+            )
+        results["exit_code"] = test_result.returncode
+        results["success"] = test_result.returncode == 0
+        
+        return results
+    
+    def _parse_jest_output(
+        self,
+        stdout: str,
+        stderr: str,
+        report_path: Optional[str] = None,
+        root: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Parse Jest JSON output, streaming it from the report file when present"""
+        coverage = CoverageReport()
+        
+        def add_coverage(path: str, data: Dict[str, Any]) -> None:
+            coverage.add(relative_path(path, root), FileCoverage.from_istanbul(data))
+        
         try:
-            # Try to parse JSON output
-            if stdout.strip():
-                data = json.loads(stdout)
-                
-                return {
-                    "total_tests": data.get("numTotalTests", 0),
-                    "passed": data.get("numPassedTests", 0),
-                    "failed": data.get("numFailedTests", 0),
-                    "skipped": data.get("numPendingTests", 0),
-                    "duration": data.get("testResults", [{}])[0].get("perfStats", {}).get("runtime", 0) / 1000,
-                    "test_results": data.get("testResults", []),
-                    "coverage": data.get("coverageMap", {})
-                }
-        except json.JSONDecodeError:
+            results = None
+            if report_path and Path(report_path).exists():
+                with open(report_path) as f:
+                    results = parse_jest_report(f, on_coverage_file=add_coverage)
+            elif stdout.strip():
+                # Custom test commands print the report to stdout
+                results = parse_jest_report(io.StringIO(stdout), on_coverage_file=add_coverage)
+            
+            if results is not None:
+                for record in results["test_results"]:
+                    record["suite"] = relative_path(record["suite"], root)
+                results["coverage"] = coverage.to_dict()
+                return results
+        except ValueError:
             logger.warning("Could not parse Jest JSON output, using fallback parsing")
         
         # Fallback: parse text output
@@ -189,60 +500,62 @@ class PytestRunner(TestRunner):
         repository_url: str,
         branch: str = "main",
         test_command: Optional[str] = None,
-        environment_vars: Optional[Dict[str, str]] = None
+        environment_vars: Optional[Dict[str, str]] = None,
+        on_event: Optional[EventCallback] = None,
+        shards: Optional[int] = None,
+        commit: Optional[str] = None,
+        base_commit: Optional[str] = None,
+        impact_analysis: bool = False
     ) -> Dict[str, Any]:
         """Run pytest tests"""
         temp_dir = None
+        stack = AsyncExitStack()
         
         try:
             # Create temporary directory
-            temp_dir = tempfile.mkdtemp(prefix="tsuite_test_")
-            logger.info(f"Created temp directory: {temp_dir}")
+            temp_dir = await workspace_pool.acquire(WORKSPACE_PREFIX)
+            logger.info(f"Using workspace: {temp_dir}")
             
             # Clone repository
-            logger.info(f"Cloning {repository_url} (branch: {branch})")
-            clone_result = subprocess.run(
-                ["git", "clone", "-b", branch, "--depth", "1", repository_url, temp_dir],
-                capture_output=True,
-                text=True,
-                timeout=300
-            )
-            
-            if clone_result.returncode != 0:
-                raise Exception(f"Git clone failed: {clone_result.stderr}")
+            logger.info(f"Cloning {repository_url} (branch: {branch}, commit: {commit or 'latest'})")
+            self._phase(on_event, "clone", PROGRESS_CLONE)
+            with run_phase(self.framework, "clone"):
+                await repository_cache.checkout(repository_url, branch, temp_dir, commit=commit)
             
-            # Install dependencies
-            logger.info("Installing dependencies...")
-            install_result = subprocess.run(
-                ["pip", "install", "-r", "requirements.txt"],
-                cwd=temp_dir,
-                capture_output=True,
-                text=True,
-                timeout=600
-            )
+            # Install dependencies into a virtualenv cached by requirements.txt hash
+            self._phase(on_event, "install", PROGRESS_INSTALL)
+            env = dict(environment_vars or {})
+            with run_phase(self.framework, "install"):
+                cache_key = dependency_cache.lockfile_key(temp_dir, "python") if settings.dependency_cache_enabled else None
+                if cache_key:
+                    logger.info(f"Using cached virtualenv ({cache_key})")
+                    venv = await stack.enter_async_context(dependency_cache.virtualenv(cache_key, temp_dir))
+                    env.update(virtualenv_environment(venv))
+                else:
+                    logger.info("Installing dependencies...")
+                    await run_process(
+                        ["pip", "install", "-r", "requirements.txt"],
+                        cwd=temp_dir,
+                        timeout=600
+                    )
             
             # Run tests
-            test_cmd = test_command or "pytest --json-report --json-report-file=report.json --cov"
-            logger.info(f"Running tests: {test_cmd}")
-            
-            env = environment_vars or {}
-            
-            test_result = subprocess.run(
-                test_cmd.split(),
-                cwd=temp_dir,
-                capture_output=True,
-                text=True,
-                timeout=600,
-                env={**subprocess.os.environ, **env}
+            return await self._run_suite(
+                repository_url, temp_dir, {**os.environ, **env}, on_event, test_command, shards,
+                base_commit, impact_analysis
             )
             
-            # Parse pytest output
-            results = self._parse_pytest_output(temp_dir, test_result.stdout, test_result.stderr)
-            results["exit_code"] = test_result.returncode
-            results["success"] = test_result.returncode == 0
-            
-            return results
-            
+        except subprocess.TimeoutExpired:
+            logger.error("Test execution timed out")
+            return {
+                "success": False,
+                "error": "Test execution timed out",
+                "timed_out": True,
+                "total_tests": 0,
+                "passed": 0,
+                "failed": 0,
+                "skipped": 0
+            }
         except Exception as e:
             logger.error(f"Test execution failed: {str(e)}")
             return {
@@ -254,15 +567,149 @@ class PytestRunner(TestRunner):
                 "skipped": 0
             }
         finally:
-            # Clean up
-            if temp_dir and Path(temp_dir).exists():
-                logger.info(f"Cleaning up temp directory: {temp_dir}")
-                shutil.rmtree(temp_dir, ignore_errors=True)
+            with run_phase(self.framework, "cleanup"):
+                await stack.aclose()
+                # Clean up
+                workspace_pool.release(temp_dir)
+    
+    # "tests/test_a.py::test_x PASSED        [ 40%]" (verbose) or "tests/test_a.py ..F. [ 40%]"
+    TEST_LINE = re.compile(r"^(\S+::\S.*?)\s+(PASSED|FAILED|SKIPPED|ERROR|XFAIL|XPASS)\b")
+    PROGRESS_MARKER = re.compile(r"\[\s*(\d{1,3})%\]\s*$")
+    TEST_STATUS = {
+        "PASSED": "passed",
+        "XPASS": "passed",
+        "FAILED": "failed",
+        "ERROR": "failed",
+        "SKIPPED": "skipped",
+        "XFAIL": "skipped",
+    }
+    
+    def _parse_output_line(self, line: str) -> List[Dict[str, Any]]:
+        """pytest reports per-test outcomes with -v and a percentage marker per line"""
+        events = []
+        match = self.TEST_LINE.match(line)
+        if match:
+            events.append({"type": "test", "name": match.group(1), "status": self.TEST_STATUS[match.group(2)]})
+        
+        marker = self.PROGRESS_MARKER.search(line)
+        if marker:
+            fraction = min(int(marker.group(1)), 100) / 100
+            progress = PROGRESS_TESTS + int((PROGRESS_PARSE - PROGRESS_TESTS) * fraction)
+            events.append({"type": "progress", "progress": progress})
+        return events
+    
+    async def _list_tests(self, temp_dir: str, env: Dict[str, str], selection: Optional[List[str]] = None) -> List[str]:
+        """Node IDs pytest collects in the checkout (or in the ``selection`` files)"""
+        result = await self._pytest(
+            ["pytest", "--collect-only", "-q", "-p", "no:cacheprovider", *(selection or [])],
+            cwd=temp_dir,
+            timeout=300,
+            env=env
+        )
+        node_ids = [line.strip() for line in result.stdout.splitlines() if "::" in line and not line.startswith(" ")]
+        if not node_ids:
+            logger.warning(f"Could not collect pytest node IDs: {result.stderr.strip()}")
+        return node_ids
+    
+    async def _related_tests(
+        self,
+        repository_url: str,
+        temp_dir: str,
+        env: Dict[str, str],
+        commit: str,
+        changed: List[str]
+    ) -> Tuple[Optional[List[str]], Optional[str]]:
+        """Test files that import the changed modules, per the import graph from earlier runs"""
+        if any(path.endswith(".py") and not (Path(temp_dir) / path).exists() for path in changed):
+            # A deleted module drops out of the refreshed graph, so its importers cannot be found
+            return None, "files were deleted"
+        graph = await impact_maps.current(repository_url, temp_dir, commit)
+        if graph is None:
+            return None, "no usable import map recorded for this repository"
+        affected = graph.affected_tests(changed)
+        return sorted(path for path in affected if (Path(temp_dir) / path).exists()), None
+    
+    async def _record_run(self, repository_url: str, temp_dir: str, commit: Optional[str]) -> None:
+        """Keep the repository's import graph current for later impact analysis"""
+        if commit:
+            await impact_maps.update(repository_url, temp_dir, commit)
+    
+    async def _run_selection(
+        self,
+        temp_dir: str,
+        env: Dict[str, str],
+        on_event: Optional[EventCallback],
+        test_command: Optional[str] = None,
+        selection: Optional[List[str]] = None,
+        shard: Optional[Tuple[int, int]] = None
+    ) -> Dict[str, Any]:
+        """Run pytest once, writing its JSON and coverage reports under per-shard names"""
+        suffix = f"-{shard[0]}" if shard else ""
+        report_file = f"report{suffix}.json"
+        coverage_file = f"coverage{suffix}.json"
+        if test_command:
+            args = test_command.split()
+        else:
+            args = [
+                "pytest", "-v",
+                "--json-report", f"--json-report-file={report_file}",
+                "--cov", "--cov-branch", f"--cov-report=json:{coverage_file}"
+            ]
+            if shard:
+                # Concurrent shards must not share pytest's cache or coverage's data file
+                args += ["-p", "no:cacheprovider"]
+                env = {**env, "COVERAGE_FILE": f".coverage{suffix}"}
+            if selection is not None:
+                args += selection
+        logger.info(f"Running tests: {' '.join(args[:12])}{' ...' if len(args) > 12 else ''}")
+        
+        with run_phase(self.framework, "run"):
+            test_result = await self._pytest(
+                args,
+                cwd=temp_dir,
+                timeout=settings.test_timeout,
+                env=env,
+                on_output=self._output_handler(on_event)
+            )
+        
+        # Parse pytest output
+        self._phase(on_event, "parse", PROGRESS_PARSE)
+        with run_phase(self.framework, "parse"):
+            results = self._parse_pytest_output(
+                temp_dir, test_result.stdout, test_result.stderr, report_file, coverage_file
+            )
+        results["exit_code"] = test_result.returncode
+        results["success"] = test_result.returncode == 0
+        
+        return results
     
-    def _parse_pytest_output(self, temp_dir: str, stdout: str, stderr: str) -> Dict[str, Any]:
+    async def _pytest(
+        self,
+        args: List[str],
+        cwd: str,
+        env: Dict[str, str],
+        timeout: Optional[float] = None,
+        on_output: Optional[OutputCallback] = None
+    ) -> ProcessResult:
+        """Run a pytest command, in a pre-started interpreter of the run's cached virtualenv when one is ready"""
+        venv = env.get("VIRTUAL_ENV")
+        if args[0] == "pytest" and venv and Path(venv).is_relative_to(dependency_cache.cache_dir):
+            return await interpreter_pool.run(Path(venv), args, cwd, env, timeout=timeout, on_output=on_output)
+        return await run_process(args, cwd=cwd, timeout=timeout, env=env, on_output=on_output)
+    
+    def _parse_pytest_output(
+        self,
+        temp_dir: str,
+        stdout: str,
+        stderr: str,
+        report_file: str = "report.json",
+        coverage_file: str = "coverage.json"
+    ) -> Dict[str, Any]:
         """Parse pytest output"""
+        coverage = self._parse_coverage(temp_dir, coverage_file)
+        
         # Try to read JSON report
-        report_path = Path(temp_dir) / "report.json"
+        report_path = Path(temp_dir) / report_file
         if report_path.exists():
             try:
                 with open(report_path) as f:
@@ -275,8 +722,8 @@ class PytestRunner(TestRunner):
                         "failed": summary.get("failed", 0),
                         "skipped": summary.get("skipped", 0),
                         "duration": data.get("duration", 0),
-                        "test_results": data.get("tests", []),
-                        "coverage": {}
+                        "test_results": [compact_pytest_test(test) for test in data.get("tests", [])],
+                        "coverage": coverage
                     }
             except Exception as e:
                 logger.warning(f"Could not parse pytest JSON report: {e}")
@@ -289,8 +736,20 @@ class PytestRunner(TestRunner):
             "skipped": 0,
             "duration": 0,
             "test_results": [],
-            "coverage": {}
+            "coverage": coverage
         }
+    
+    def _parse_coverage(self, temp_dir: str, coverage_file: str = "coverage.json") -> Dict[str, Any]:
+        """Convert coverage.py's JSON report into the compact coverage model"""
+        coverage_path = Path(temp_dir) / coverage_file
+        if not coverage_path.exists():
+            return {}
+        try:
+            with open(coverage_path) as f:
+                return CoverageReport.from_coverage_py(json.load(f), root=temp_dir).to_dict()
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not parse coverage report: {e}")
+            return {}
 
 
 def get_test_runner(framework: str) -> TestRunner:
@@ -0,0 +1,167 @@
+"""
+Scanner toolchain.
+
+Scanner CLIs are provisioned once, at pinned versions, into a dedicated
+virtualenv, and the semgrep ruleset is kept as a local file, instead of
+pip-installing tools and downloading rules on every scan. Scans resolve
+their binaries and rules here, and ``/health`` reports readiness.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import shutil
+import sys
+import time
+import urllib.request
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from app.config import settings
+from app.services.process import run_process
+
+logger = logging.getLogger(__name__)
+
+VERSION_PATTERN = re.compile(r"\d+(?:\.\d+)+")
+
+# System tools that runners and scanners expect on PATH
+SYSTEM_TOOLS = ["git", "node", "npm"]
+
+
+class Toolchain:
+    """Pinned scanner binaries and the local semgrep ruleset"""
+
+    def __init__(
+        self,
+        root: str,
+        packages: Dict[str, str],
+        rules_path: Optional[str] = None,
+        rules_url: Optional[str] = None
+    ):
+        self.root = Path(root)
+        self.packages = packages
+        self.rules_path = Path(rules_path) if rules_path else self.root / "semgrep-rules.yml"
+        self.rules_url = rules_url
+        self.state = "pending"
+        self.tools: Dict[str, Dict[str, Any]] = {}
+        self._lock = asyncio.Lock()
+
+    @property
+    def venv(self) -> Path:
+        return self.root / "venv"
+
+    def binary(self, name: str) -> str:
+        """Path of a tool: the provisioned copy first, then PATH"""
+        provisioned = self.venv / ("Scripts" if os.name == "nt" else "bin") / name
+        if provisioned.exists():
+            return str(provisioned)
+        found = shutil.which(name)
+        if not found:
+            raise Exception(f"{name} is not installed; scanner toolchain is not ready")
+        return found
+
+    def semgrep_config(self) -> str:
+        """Local semgrep rules; scans never fetch rules from the registry"""
+        if not self.rules_path.exists():
+            raise Exception(f"semgrep ruleset not found at {self.rules_path}; scanner toolchain is not ready")
+        return str(self.rules_path)
+
+    def rules_version(self) -> str:
+        """Short digest of the local ruleset, so results from different rules never mix"""
+        path = self.rules_path
+        if path.is_dir():
+            entries = sorted(
+                f"{f.relative_to(path)}:{f.stat().st_size}:{f.stat().st_mtime_ns}"
+                for f in path.rglob("*") if f.is_file()
+            )
+            data = "\n".join(entries).encode()
+        elif path.exists():
+            data = path.read_bytes()
+        else:
+            return "none"
+        return hashlib.sha256(data).hexdigest()[:16]
+
+    async def _version(self, name: str) -> Optional[str]:
+        try:
+            result = await run_process([self.binary(name), "--version"], timeout=60)
+        except Exception:
+            return None
+        if result.returncode != 0:
+            return None
+        match = VERSION_PATTERN.search(result.stdout or result.stderr)
+        return match.group(0) if match else "unknown"
+
+    async def _install(self, install_packages: Dict[str, str]) -> None:
+        """Install pinned packages into the toolchain virtualenv"""
+        if not self.venv.exists():
+            self.root.mkdir(parents=True, exist_ok=True)
+            result = await run_process([sys.executable, "-m", "venv", str(self.venv)], timeout=300)
+            if result.returncode != 0:
+                raise Exception(f"Could not create toolchain virtualenv: {result.stderr}")
+        pip = self.venv / ("Scripts" if os.name == "nt" else "bin") / "pip"
+        specs = [f"{name}=={version}" for name, version in install_packages.items()]
+        logger.info(f"Installing scanner toolchain: {' '.join(specs)}")
+        result = await run_process([str(pip), "install", "--quiet", *specs], timeout=1800)
+        if result.returncode != 0:
+            raise Exception(f"Toolchain install failed: {result.stderr.strip()[-2000:]}")
+
+    def _download_rules(self) -> None:
+        self.rules_path.parent.mkdir(parents=True, exist_ok=True)
+        staging = self.rules_path.with_name(f"{self.rules_path.name}.tmp")
+        with urllib.request.urlopen(self.rules_url, timeout=120) as response:
+            staging.write_bytes(response.read())
+        staging.replace(self.rules_path)
+
+    async def warm(self, install: bool = True) -> Dict[str, Any]:
+        """
+        Check every tool once, installing missing or mismatched scanner
+        versions and fetching the semgrep ruleset when ``install`` is set.
+        """
+        async with self._lock:
+            self.state = "warming"
+            started = time.monotonic()
+
+            versions = {name: await self._version(name) for name in self.packages}
+            outdated = {name: pinned for name, pinned in self.packages.items() if versions[name] != pinned}
+            if outdated and install:
+                try:
+                    await self._install(outdated)
+                    versions.update({name: await self._version(name) for name in outdated})
+                except Exception as e:
+                    logger.error(str(e))
+
+            tools: Dict[str, Dict[str, Any]] = {}
+            for name, pinned in self.packages.items():
+                tools[name] = {"ready": versions[name] is not None, "version": versions[name], "pinned": pinned}
+            for name in SYSTEM_TOOLS:
+                version = await self._version(name) if shutil.which(name) else None
+                tools[name] = {"ready": version is not None, "version": version}
+
+            if not self.rules_path.exists() and install and self.rules_url:
+                try:
+                    logger.info(f"Fetching semgrep ruleset from {self.rules_url}")
+                    await asyncio.to_thread(self._download_rules)
+                except Exception as e:
+                    logger.error(f"Could not fetch semgrep ruleset: {e}")
+            tools["semgrep_rules"] = {"ready": self.rules_path.exists(), "path": str(self.rules_path)}
+
+            self.tools = tools
+            self.state = "ready" if all(tool["ready"] for tool in tools.values()) else "degraded"
+            logger.info(f"Scanner toolchain {self.state} after {time.monotonic() - started:.1f}s")
+            return self.readiness()
+
+    def readiness(self) -> Dict[str, Any]:
+        return {
+            "ready": self.state == "ready",
+            "state": self.state,
+            "tools": self.tools
+        }
+
+
+toolchain = Toolchain(
+    settings.toolchain_dir,
+    packages={"safety": settings.safety_version, "semgrep": settings.semgrep_version},
+    rules_path=settings.semgrep_rules,
+    rules_url=settings.semgrep_rules_url
+)
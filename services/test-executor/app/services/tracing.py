@@ -0,0 +1,124 @@
+"""
+OpenTelemetry tracing.
+
+Each API request gets a server span continued from the caller's
+``traceparent`` header, and the jobs it queues run in child spans: locally
+through the request's context, on Celery workers through a trace context
+passed along with the task. Phases and child processes add their own
+spans, so one trace shows where a slow run spent its time.
+
+Tracing is off unless ``TRACING_ENABLED`` is set or an exporter is passed
+to ``configure_tracing`` (tests use an in-memory exporter); until then the
+API's no-op tracer makes every span free.
+"""
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from opentelemetry import context, propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SimpleSpanProcessor, SpanExporter
+from opentelemetry.sdk.trace.sampling import ParentBasedTraceIdRatio
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+tracer = trace.get_tracer("tsuite.test-executor")
+
+_provider: Optional[TracerProvider] = None
+
+
+def configure_tracing(exporter: Optional[SpanExporter] = None) -> Optional[TracerProvider]:
+    """
+    Install the SDK tracer provider once. An explicit ``exporter`` is added
+    with a synchronous processor; otherwise spans are batched to the OTLP
+    endpoint when tracing is enabled.
+    """
+    global _provider
+    if exporter is None and not settings.tracing_enabled:
+        return _provider
+
+    if _provider is None:
+        _provider = TracerProvider(
+            resource=Resource.create({"service.name": settings.tracing_service_name}),
+            sampler=ParentBasedTraceIdRatio(settings.tracing_sample_ratio)
+        )
+        trace.set_tracer_provider(_provider)
+        if settings.tracing_enabled:
+            _provider.add_span_processor(BatchSpanProcessor(_otlp_exporter()))
+            logger.info(f"Exporting traces to {settings.otlp_endpoint}")
+
+    if exporter is not None:
+        _provider.add_span_processor(SimpleSpanProcessor(exporter))
+    return _provider
+
+
+def _otlp_exporter() -> SpanExporter:
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    return OTLPSpanExporter(endpoint=settings.otlp_endpoint)
+
+
+def flush_tracing() -> None:
+    """Export buffered spans now, e.g. before a pool process exits without running atexit hooks"""
+    if _provider is not None:
+        _provider.force_flush()
+
+
+def inject_context() -> Dict[str, str]:
+    """The current trace context as headers, for handing work to another process"""
+    carrier: Dict[str, str] = {}
+    propagate.inject(carrier)
+    return carrier
+
+
+@contextmanager
+def job_span(name: str, attributes: Dict[str, Any], carrier: Optional[Dict[str, str]] = None) -> Iterator[trace.Span]:
+    """Span for a queued job, continuing ``carrier``'s trace when given, else the current one"""
+    parent = propagate.extract(carrier) if carrier else None
+    with tracer.start_as_current_span(name, context=parent, attributes=attributes) as span:
+        yield span
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening a server span per HTTP request, continued from
+    the caller's trace headers. The span ends once the response is sent, so
+    background work queued by the request shows up as its children.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope.get("headers", [])}
+        span = tracer.start_span(
+            f"{scope['method']} {scope['path']}",
+            context=propagate.extract(headers),
+            kind=trace.SpanKind.SERVER,
+            attributes={"http.method": scope["method"], "http.target": scope["path"]}
+        )
+        token = context.attach(trace.set_span_in_context(span))
+
+        async def send_and_finish(message):
+            if message["type"] == "http.response.start":
+                span.set_attribute("http.status_code", message["status"])
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body"):
+                span.end()
+
+        try:
+            await self.app(scope, receive, send_and_finish)
+        except Exception as e:
+            span.record_exception(e)
+            span.set_status(trace.Status(trace.StatusCode.ERROR))
+            raise
+        finally:
+            context.detach(token)
+            if span.is_recording():
+                span.end()
@@ -0,0 +1,152 @@
+"""
+Pool of pre-created run workspaces.
+
+Runners and scanners take a ready, empty workspace instead of creating one
+when a job starts. Workspaces live under ``WORKSPACE_ROOT`` when it is set
+(e.g. a tmpfs, so checkouts and installs stay in memory). After every
+checkout the pool refills in the background, keeping one spare workspace
+per queued job, bounded by the configured minimum and maximum. Released
+workspaces are handed to the workspace reaper, which deletes them in the
+background, and checkouts wait while the workspace disk quota is exceeded.
+"""
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+
+from app.config import settings
+from app.services.metrics import POOL_CHECKOUTS, POOL_IDLE
+from app.services.scheduler import execution_scheduler
+from app.services.workspace_reaper import owner_prefix, workspace_reaper
+
+logger = logging.getLogger(__name__)
+
+
+class WorkspacePool:
+    """Idle workspace directories per name prefix (one prefix per kind of job)"""
+
+    def __init__(self, root: Optional[str], min_idle: int, max_idle: int):
+        self.root = root
+        self.min_idle = min_idle
+        self.max_idle = max_idle
+        self._idle: Dict[str, List[str]] = {}
+        # Refills run in worker threads
+        self._lock = threading.Lock()
+        self._refilling: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self) -> None:
+        """Idle workspaces belong to the parent; a forked child must not hand the same ones out"""
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._refilling = set()
+        self._tasks = set()
+
+    def _create(self, prefix: str) -> str:
+        if self.root:
+            os.makedirs(self.root, exist_ok=True)
+        # The owner's PID lets the reaper tell orphaned workspaces from live ones
+        return tempfile.mkdtemp(prefix=owner_prefix(prefix), dir=self.root)
+
+    def target(self) -> int:
+        """Idle workspaces to keep per prefix: one per queued job, within the bounds"""
+        return max(self.min_idle, min(self.max_idle, execution_scheduler.stats()["queued"]))
+
+    async def acquire(self, prefix: str) -> str:
+        """
+        An empty workspace directory named ``<prefix>...``, owned by the caller
+        until released. Waits while the workspace disk quota is exceeded.
+        """
+        await workspace_reaper.wait_for_space()
+        with self._lock:
+            idle = self._idle.setdefault(prefix, [])
+            path = idle.pop() if idle else None
+        # Skip workspaces removed behind the pool's back (e.g. by a temp cleaner)
+        if path is not None and not os.path.isdir(path):
+            path = None
+        POOL_CHECKOUTS.labels(pool="workspace", result="hit" if path else "miss").inc()
+        if path is None:
+            path = self._create(prefix)
+        self.refill(prefix)
+        return path
+
+    def release(self, path: Optional[str]) -> None:
+        """Hand a workspace from ``acquire`` to the reaper for deletion"""
+        if path and os.path.exists(path):
+            logger.info(f"Cleaning up temp directory: {path}")
+            workspace_reaper.discard(path)
+
+    def fill(self, prefix: str) -> int:
+        """Create workspaces until ``prefix`` has its target idle count; returns how many were created"""
+        created = 0
+        target = self.target()
+        while True:
+            with self._lock:
+                if len(self._idle.setdefault(prefix, [])) >= target:
+                    return created
+            try:
+                path = self._create(prefix)
+            except OSError as e:
+                logger.warning(f"Could not pre-create {prefix} workspace: {e}")
+                return created
+            with self._lock:
+                self._idle[prefix].append(path)
+            created += 1
+
+    def refill(self, prefix: str) -> None:
+        """Top up ``prefix`` in the background; a no-op outside an event loop or while a refill runs"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        with self._lock:
+            if prefix in self._refilling:
+                return
+            self._refilling.add(prefix)
+
+        async def run() -> None:
+            try:
+                await asyncio.to_thread(self.fill, prefix)
+            finally:
+                with self._lock:
+                    self._refilling.discard(prefix)
+
+        task = loop.create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def warm(self, prefixes: Iterable[str]) -> None:
+        """Fill the pool for ``prefixes`` now (at startup, before jobs arrive)"""
+        for prefix in prefixes:
+            created = self.fill(prefix)
+            if created:
+                logger.info(f"Pre-created {created} {prefix} workspaces under {self.root or tempfile.gettempdir()}")
+
+    def close(self) -> None:
+        """Delete every idle workspace"""
+        with self._lock:
+            paths = [path for idle in self._idle.values() for path in idle]
+            self._idle.clear()
+        for path in paths:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def idle_count(self) -> int:
+        with self._lock:
+            return sum(len(idle) for idle in self._idle.values())
+
+    def stats(self) -> Dict:
+        with self._lock:
+            idle = {prefix: len(paths) for prefix, paths in self._idle.items()}
+        return {"root": self.root or tempfile.gettempdir(), "idle": idle, "target": self.target()}
+
+
+workspace_pool = WorkspacePool(
+    settings.workspace_root,
+    min_idle=settings.workspace_pool_min_idle,
+    max_idle=settings.workspace_pool_max_idle
+)
+POOL_IDLE.labels(pool="workspace").set_function(workspace_pool.idle_count)
@@ -0,0 +1,277 @@
+"""
+Background deletion of finished workspaces.
+
+Deleting a checkout (often with ``node_modules``) takes seconds, so jobs
+only rename their workspace into a trash directory, which is instant on
+the same filesystem. The trash is emptied by one background thread per
+reaper, so deletions keep going whether or not the discarding job's event
+loop is still running (Celery runs jobs on per-thread loops that only turn
+while a job executes). The disk held by
+live workspaces plus the trash is kept under ``WORKSPACE_QUOTA_MB``: new
+jobs wait for space while the workspace root is over quota. At startup,
+workspaces left behind by crashed processes are swept.
+
+Workspace names carry the owning process ID and a tag for its PID
+namespace on this boot (``tsuite_test_<tag>-<pid>_...``). A process only
+judges workspaces carrying its own tag by their PID; workspaces from other
+containers or hosts sharing the directory are left to their owners.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import socket
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Deque, Optional, Tuple
+
+from app.config import settings
+from app.services.metrics import WORKSPACE_DISK_BYTES, WORKSPACE_TRASH
+
+logger = logging.getLogger(__name__)
+
+# Name prefixes of run workspaces (test runs, scans, SAST scans, scan pipelines)
+WORKSPACE_PREFIXES = ("tsuite_test_", "tsuite_security_", "tsuite_sast_", "tsuite_pipeline_")
+
+TRASH_DIR = ".tsuite_trash"
+
+# Workspaces named without an owner PID count as orphans once untouched this long
+LEGACY_ORPHAN_AGE = 3600
+
+
+def _read_id(path: str) -> str:
+    try:
+        return os.readlink(path) if os.path.islink(path) else Path(path).read_text().strip()
+    except OSError:
+        return ""
+
+
+def _namespace_tag() -> str:
+    """Short ID of this boot and PID namespace; PIDs are only comparable between processes sharing it"""
+    ids = [_read_id("/proc/sys/kernel/random/boot_id"), _read_id("/proc/self/ns/pid"), socket.gethostname()]
+    return hashlib.sha256("\0".join(ids).encode()).hexdigest()[:8]
+
+
+NAMESPACE_TAG = _namespace_tag()
+
+
+def owner_prefix(prefix: str) -> str:
+    """Workspace name prefix recording the calling process as the owner"""
+    return f"{prefix}{NAMESPACE_TAG}-{os.getpid()}_"
+
+
+def _owner(name: str) -> Optional[Tuple[str, int]]:
+    """(namespace tag, PID) encoded in a workspace name, or None for names without an owner"""
+    for prefix in WORKSPACE_PREFIXES:
+        if name.startswith(prefix):
+            tag, _, pid = name[len(prefix):].split("_", 1)[0].rpartition("-")
+            return (tag, int(pid)) if tag and pid.isdigit() else None
+    return None
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _disk_usage(root: Path) -> int:
+    """Bytes allocated to a tree, not counting files hardlinked from elsewhere (e.g. the dependency cache)"""
+    total = 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            try:
+                st = os.lstat(os.path.join(dirpath, name))
+            except OSError:
+                continue
+            if st.st_nlink == 1:
+                total += st.st_blocks * 512
+    return total
+
+
+class WorkspaceReaper:
+    """Deferred, quota-bounded deletion of workspaces under one root directory"""
+
+    def __init__(self, root: Optional[str], quota_bytes: int, usage_interval: float, quota_wait: float):
+        self.root = Path(root or tempfile.gettempdir())
+        self.trash = self.root / TRASH_DIR
+        self.quota_bytes = quota_bytes
+        self.usage_interval = usage_interval
+        self.quota_wait = quota_wait
+        self.usage = 0
+        self._measured_at: Optional[float] = None
+        self._pending: Deque[Path] = deque()
+        # Jobs on Celery worker threads discard from their own loops
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._deleting: Optional[Path] = None
+        self._drainer: Optional[threading.Thread] = None
+        self._measuring = False
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self) -> None:
+        """The parent's drain thread keeps deleting its queue; a forked child starts empty"""
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._pending.clear()
+        self._deleting = None
+        self._drainer = None
+        self._measuring = False
+
+    def _workspaces(self):
+        for entry in self.root.iterdir():
+            if entry.name.startswith(WORKSPACE_PREFIXES) and entry.is_dir() and not entry.is_symlink():
+                yield entry
+
+    def discard(self, path: Optional[str]) -> None:
+        """Move a finished workspace aside now and delete it in the background"""
+        if not path or not os.path.exists(path):
+            return
+        target = Path(path)
+        # A trash directory next to the workspace keeps the rename on one filesystem
+        trash = target.parent / TRASH_DIR
+        try:
+            trash.mkdir(exist_ok=True)
+            moved = trash / f"{target.name}.{time.monotonic_ns()}"
+            target.rename(moved)
+            target = moved
+        except OSError as e:
+            # Delete in place, still off the caller's path
+            logger.debug(f"Could not move {path} to the workspace trash: {e}")
+        with self._changed:
+            self._pending.append(target)
+            if self._drainer is None:
+                self._drainer = threading.Thread(target=self._drain, name="workspace-reaper", daemon=True)
+                self._drainer.start()
+            self._changed.notify_all()
+
+    def _drain(self) -> None:
+        """Delete pending workspaces one at a time, so deletions never compete with each other for I/O"""
+        while True:
+            with self._changed:
+                self._deleting = None
+                self._changed.notify_all()
+                while not self._pending:
+                    self._changed.wait()
+                path = self._deleting = self._pending.popleft()
+            shutil.rmtree(path, ignore_errors=True)
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Block until every discarded workspace is deleted; False if ``timeout`` passes first"""
+        with self._changed:
+            return self._changed.wait_for(lambda: not self._pending and self._deleting is None, timeout)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending) + (self._deleting is not None)
+
+    def sweep(self) -> int:
+        """Delete workspaces whose owning process is gone, and trash left by earlier processes"""
+        if not self.root.is_dir():
+            return 0
+        orphans = []
+        for entry in self._workspaces():
+            owner = _owner(entry.name)
+            if owner is None:
+                try:
+                    orphaned = time.time() - entry.stat().st_mtime > LEGACY_ORPHAN_AGE
+                except OSError:
+                    continue
+            else:
+                tag, pid = owner
+                # PIDs from another namespace or boot say nothing about liveness here
+                orphaned = tag == NAMESPACE_TAG and pid != os.getpid() and not _alive(pid)
+            if orphaned:
+                orphans.append(entry)
+
+        for entry in orphans:
+            logger.info(f"Removing orphaned workspace {entry}")
+            shutil.rmtree(entry, ignore_errors=True)
+        if self.trash.is_dir():
+            with self._lock:
+                queued = {*self._pending, self._deleting}
+            for entry in self.trash.iterdir():
+                if entry not in queued:
+                    shutil.rmtree(entry, ignore_errors=True)
+        return len(orphans)
+
+    def measure(self) -> int:
+        """Walk live workspaces and the trash; blocking, run it in a thread"""
+        usage = 0
+        if self.root.is_dir():
+            for entry in self._workspaces():
+                usage += _disk_usage(entry)
+        if self.trash.is_dir():
+            usage += _disk_usage(self.trash)
+        self.usage = usage
+        self._measured_at = time.monotonic()
+        return usage
+
+    def _refresh_usage(self) -> None:
+        """Re-measure in the background when the last measurement is stale"""
+        if self._measured_at is not None and time.monotonic() - self._measured_at < self.usage_interval:
+            return
+        with self._lock:
+            if self._measuring:
+                return
+            self._measuring = True
+
+        def run() -> None:
+            try:
+                self.measure()
+            finally:
+                self._measuring = False
+
+        threading.Thread(target=run, name="workspace-usage", daemon=True).start()
+
+    async def wait_for_space(self) -> None:
+        """
+        Return once the workspace root is under its quota; raises if it stays
+        over quota for ``quota_wait`` seconds.
+        """
+        if not self.quota_bytes:
+            return
+        self._refresh_usage()
+        if self.usage < self.quota_bytes:
+            return
+
+        deadline = time.monotonic() + self.quota_wait
+        logger.warning(f"Workspaces use {self.usage} bytes, over the {self.quota_bytes} byte quota; waiting for space")
+        while True:
+            if await asyncio.to_thread(self.measure) < self.quota_bytes:
+                return
+            if time.monotonic() >= deadline:
+                raise Exception(
+                    f"Workspace disk quota exceeded: {self.usage} bytes in use, quota {self.quota_bytes} bytes"
+                )
+            await asyncio.sleep(min(5.0, self.usage_interval, max(0.0, deadline - time.monotonic())))
+
+    async def close(self) -> None:
+        """Finish pending deletions"""
+        await asyncio.to_thread(self.wait_idle)
+
+    def status(self) -> dict:
+        return {
+            "root": str(self.root),
+            "usage_bytes": self.usage,
+            "quota_bytes": self.quota_bytes,
+            "pending_deletions": self.pending()
+        }
+
+
+workspace_reaper = WorkspaceReaper(
+    settings.workspace_root,
+    quota_bytes=settings.workspace_quota_mb * 1024 * 1024,
+    usage_interval=settings.workspace_usage_interval,
+    quota_wait=settings.workspace_quota_wait
+)
+WORKSPACE_DISK_BYTES.set_function(lambda: workspace_reaper.usage)
+WORKSPACE_TRASH.set_function(workspace_reaper.pending)
@@ -0,0 +1,222 @@
+"""
+Celery tasks executed by worker nodes.
+
+The API tier only accepts and tracks jobs when ``EXECUTION_BACKEND=celery``;
+these tasks do the actual cloning, installing, testing and scanning.
+"""
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from celery import states
+from celery.backends.base import KeyValueStoreBackend
+from celery.concurrency import get_implementation
+from celery.concurrency.prefork import TaskPool as PreforkPool
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown
+
+from app.celery_app import celery_app
+from app.config import settings
+from app.routers.security import (
+    SecurityPipelineRequest,
+    SecurityScanRequest,
+    perform_security_pipeline,
+    perform_security_scan,
+    scan_results_store,
+    scan_span_attributes,
+)
+from app.routers.test_execution import (
+    TestExecutionRequest,
+    perform_test_run,
+    run_span_attributes,
+    serve_cached_result,
+    test_results_store,
+)
+from app.services.result_store import ResultStore
+from app.services.scheduler import PRIORITY_CLASSES
+from app.services.advisory_db import advisory_db
+from app.services.test_runner import WORKSPACE_PREFIX
+from app.services.toolchain import toolchain
+from app.services.tracing import configure_tracing, flush_tracing, job_span
+from app.services.workspace_pool import workspace_pool
+from app.services.workspace_reaper import workspace_reaper
+
+logger = logging.getLogger(__name__)
+
+# Celery calls tasks synchronously, so each worker thread keeps one event loop
+# for its lifetime; caches and locks created on it stay usable across tasks.
+_thread_state = threading.local()
+
+
+def _run(coro):
+    loop = getattr(_thread_state, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        _thread_state.loop = loop
+    return loop.run_until_complete(coro)
+
+
+def _forks_pool_processes(worker) -> bool:
+    """Whether tasks run in forked pool processes rather than in the worker process itself"""
+    pool_cls = getattr(worker, "pool_cls", None)
+    return pool_cls is not None and issubclass(get_implementation(pool_cls), PreforkPool)
+
+
+@worker_init.connect
+def warm_toolchain(sender=None, **kwargs) -> None:
+    """Provision scanner tools, load advisories, sweep orphaned workspaces and pre-create fresh ones before the worker takes jobs"""
+    # A span exporter's thread does not survive fork, and pre-created
+    # workspaces must not be shared; prefork pools set both up in each pool
+    # process instead
+    forks = _forks_pool_processes(sender)
+    if not forks:
+        configure_tracing()
+    # A throwaway loop: prefork children must not inherit a loop (and its
+    # epoll fd and self-pipe) created in the parent
+    asyncio.run(toolchain.warm(install=settings.toolchain_auto_install))
+    advisory_db.refresh()
+    workspace_reaper.sweep()
+    if not forks:
+        workspace_pool.warm([WORKSPACE_PREFIX])
+
+
+@worker_process_init.connect
+def reset_event_loop(**kwargs) -> None:
+    """Drop any event loop inherited from the parent; each pool process creates its own"""
+    _thread_state.loop = None
+
+
+@worker_process_init.connect
+def start_pool_process_tracing(**kwargs) -> None:
+    """Export this pool process's spans from a processor started in the process itself"""
+    configure_tracing()
+
+
+@worker_process_init.connect
+def warm_pool_process_workspaces(**kwargs) -> None:
+    """Pre-create workspaces owned by this pool process"""
+    workspace_pool.warm([WORKSPACE_PREFIX])
+
+
+@worker_process_shutdown.connect
+def flush_pool_process_tracing(**kwargs) -> None:
+    """Pool processes exit without atexit hooks; export their last spans first"""
+    flush_tracing()
+
+
+@celery_app.task(name="tsuite.execute_tests")
+def execute_tests_task(request_data: Dict[str, Any], trace_context: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Run a test execution request on this worker and return its record"""
+    request = TestExecutionRequest(**request_data)
+    logger.info(f"Worker executing test run {request.test_run_id}")
+    with job_span("test run", run_span_attributes(request), trace_context):
+        _run(_execute_test_run(request))
+    return test_results_store[request.test_run_id]
+
+
+async def _execute_test_run(request: TestExecutionRequest) -> None:
+    async with test_results_store.held_claim(request.test_run_id, settings.job_claim_ttl):
+        if not await serve_cached_result(request):
+            await perform_test_run(request)
+
+
+@celery_app.task(name="tsuite.security_scan")
+def security_scan_task(request_data: Dict[str, Any], trace_context: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Run a security scan request on this worker and return its record"""
+    request = SecurityScanRequest(**request_data)
+    logger.info(f"Worker executing security scan {request.scan_id}")
+    with job_span("security scan", scan_span_attributes(request), trace_context):
+        _run(_claimed(request.scan_id, perform_security_scan(request)))
+    return scan_results_store[request.scan_id]
+
+
+@celery_app.task(name="tsuite.security_pipeline")
+def security_pipeline_task(request_data: Dict[str, Any], trace_context: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Run a multi-scanner pipeline request on this worker and return its record"""
+    request = SecurityPipelineRequest(**request_data)
+    logger.info(f"Worker executing security pipeline {request.scan_id}")
+    with job_span("security pipeline", scan_span_attributes(request), trace_context):
+        _run(_claimed(request.scan_id, perform_security_pipeline(request)))
+    return scan_results_store[request.scan_id]
+
+
+async def _claimed(scan_id: str, job) -> None:
+    """Run a scan while renewing its ID's claim"""
+    async with scan_results_store.held_claim(scan_id, settings.job_claim_ttl):
+        await job
+
+
+async def dispatch(
+    task,
+    job_id: str,
+    request_data: Dict[str, Any],
+    priority: str,
+    trace_context: Optional[Dict[str, str]] = None
+) -> None:
+    """Publish a job to the worker pool without blocking the event loop; the worker continues ``trace_context``"""
+    await asyncio.to_thread(
+        task.apply_async,
+        args=[request_data, trace_context],
+        task_id=job_id,
+        priority=PRIORITY_CLASSES.get(priority, PRIORITY_CLASSES["normal"])
+    )
+
+
+def _task_states(job_ids: List[str]) -> Dict[str, Tuple[str, Any]]:
+    """
+    (state, result) of many dispatched jobs. Key-value result backends
+    (Redis, memcached) answer with one MGET; others are asked per job.
+    """
+    backend = celery_app.backend
+    if not isinstance(backend, KeyValueStoreBackend):
+        results = {job_id: celery_app.AsyncResult(job_id) for job_id in job_ids}
+        return {job_id: (result.state, result.result) for job_id, result in results.items()}
+
+    keys = [backend.get_key_for_task(job_id) for job_id in job_ids]
+    values = backend.mget(keys)
+    if hasattr(values, "items"):
+        values = [values.get(key) for key in keys]
+    found = {}
+    for job_id, value in zip(job_ids, values):
+        meta = backend.decode_result(value) if value else {"status": states.PENDING, "result": None}
+        found[job_id] = (meta["status"], meta["result"])
+    return found
+
+
+def refresh_job_records(store: ResultStore, records: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Merge the worker-side state of dispatched jobs into the API's records,
+    looking all of them up in one result backend round-trip. Blocking; the
+    API calls it from a thread.
+
+    Finished records returned by the worker replace the local record.
+    """
+    dispatched = [
+        job_id for job_id, record in records.items()
+        if record.get("backend") == "celery" and record.get("status") not in ["completed", "failed"]
+    ]
+    if not dispatched:
+        return records
+
+    records = dict(records)
+    for job_id, (state, result) in _task_states(dispatched).items():
+        if state == states.STARTED:
+            records[job_id] = {**records[job_id], "status": "running"}
+        elif state == states.SUCCESS:
+            records[job_id] = result
+            store[job_id] = result
+        elif state == states.FAILURE:
+            records[job_id] = {
+                "status": "failed",
+                "error": str(result),
+                "completed_at": datetime.utcnow().isoformat()
+            }
+            store[job_id] = records[job_id]
+    return records
+
+
+def refresh_job_record(store: ResultStore, job_id: str, record: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Merge the worker-side state of one job (``record`` when the caller already loaded it)"""
+    record = store[job_id] if record is None else record
+    return refresh_job_records(store, {job_id: record})[job_id]
@@ -0,0 +1,11 @@
+"""
+End-to-end benchmarks for the test executor.
+
+Run from ``services/test-executor``::
+
+    python -m benchmarks run --scenario all --output results.json
+    python -m benchmarks compare baseline.json results.json
+
+API scenarios generate local fixture repositories and drive ``/execute``
+or ``/scan`` either against a running service (``--url``) or in-process.
+"""
@@ -0,0 +1,120 @@
+"""
+Benchmark command line: ``run`` writes a JSON results file, ``compare``
+diffs two of them and exits non-zero on regressions.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.routers.security import SUPPORTED_SCANNERS
+from benchmarks.fixtures import create_jest_repo, create_pytest_repo
+from benchmarks.results import compare_results, results_document
+from benchmarks.scenarios import bench_api, bench_parsers
+
+SCENARIOS = ["parsers", "execute", "scan"]
+
+
+def _client(url: Optional[str]) -> httpx.AsyncClient:
+    if url:
+        return httpx.AsyncClient(base_url=url, timeout=60)
+    # In-process: the ASGI call returns after its background job, so ``submit`` covers execution too
+    from app.main import app
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark", timeout=None)
+
+
+async def _run_api(args: argparse.Namespace, scenarios) -> Dict[str, Any]:
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="tsuite_bench_repo_") as workdir:
+        create_repo = create_jest_repo if args.framework == "jest" else create_pytest_repo
+        repository_url = create_repo(Path(workdir) / "fixture", args.test_files, args.tests_per_file, args.failing)
+        async with _client(args.url) as client:
+            for scenario in scenarios:
+                print(f"Benchmarking {scenario}: {args.jobs} jobs, concurrency {args.concurrency}", file=sys.stderr)
+                results[f"api.{scenario}"] = await bench_api(
+                    client,
+                    scenario,
+                    repository_url,
+                    jobs=args.jobs,
+                    concurrency=args.concurrency,
+                    framework=args.framework,
+                    scanner=args.scanner,
+                    poll_interval=args.poll_interval,
+                    timeout=args.timeout
+                )
+    return results
+
+
+def run(args: argparse.Namespace) -> int:
+    scenarios = SCENARIOS if args.scenario == "all" else [args.scenario]
+    results = {}
+    if "parsers" in scenarios:
+        print(f"Benchmarking parsers: {args.suites} x {args.tests_per_suite} tests", file=sys.stderr)
+        results.update(bench_parsers(args.suites, args.tests_per_suite, args.repeat))
+    api_scenarios = [scenario for scenario in scenarios if scenario != "parsers"]
+    if api_scenarios:
+        results.update(asyncio.run(_run_api(args, api_scenarios)))
+
+    parameters = {key: value for key, value in vars(args).items() if key not in ["command", "output", "handler"]}
+    document = results_document(results, args.url or "in-process", parameters)
+    output = json.dumps(document, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(output)
+    return 0
+
+
+def compare(args: argparse.Namespace) -> int:
+    baseline = json.loads(Path(args.baseline).read_text())
+    current = json.loads(Path(args.current).read_text())
+    changes = compare_results(baseline, current, args.threshold)
+    if baseline["meta"].get("parameters") != current["meta"].get("parameters"):
+        print("warning: the runs used different parameters", file=sys.stderr)
+    print(f"{baseline['meta'].get('commit') or 'baseline'} -> {current['meta'].get('commit') or 'current'}")
+    for name, change in changes.items():
+        flag = "  REGRESSION" if change["regression"] else ""
+        print(f"{name:50} {change['baseline']:12.4f} {change['current']:12.4f} {change['change']:+8.1%}{flag}")
+    return 1 if any(change["regression"] for change in changes.values()) else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="tSuite test executor benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run benchmarks and write a JSON results file")
+    run_parser.add_argument("--scenario", choices=SCENARIOS + ["all"], default="parsers")
+    run_parser.add_argument("--output", help="results file (default: stdout)")
+    run_parser.add_argument("--suites", type=int, default=500, help="parsers: test files in the synthetic reports")
+    run_parser.add_argument("--tests-per-suite", type=int, default=100, help="parsers: tests per file")
+    run_parser.add_argument("--repeat", type=int, default=5, help="parsers: timed repetitions")
+    run_parser.add_argument("--url", help="API base URL of a running executor (default: in-process)")
+    run_parser.add_argument("--framework", choices=["pytest", "jest"], default="pytest")
+    run_parser.add_argument("--scanner", choices=SUPPORTED_SCANNERS, default="sast")
+    run_parser.add_argument("--test-files", type=int, default=10, help="API: test files in the fixture repository")
+    run_parser.add_argument("--tests-per-file", type=int, default=10, help="API: tests per fixture file")
+    run_parser.add_argument("--failing", type=int, default=0, help="API: failing tests in the fixture repository")
+    run_parser.add_argument("--jobs", type=int, default=20, help="API: runs or scans to submit")
+    run_parser.add_argument("--concurrency", type=int, default=4, help="API: jobs in flight at once")
+    run_parser.add_argument("--poll-interval", type=float, default=0.5)
+    run_parser.add_argument("--timeout", type=float, default=1800, help="API: seconds to wait for each job")
+    run_parser.set_defaults(handler=run)
+
+    compare_parser = commands.add_parser("compare", help="compare two results files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="relative change counted as a regression")
+    compare_parser.set_defaults(handler=compare)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
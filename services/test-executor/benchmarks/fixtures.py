@@ -0,0 +1,171 @@
+"""
+Generated benchmark inputs: local git repositories served over file:// URLs
+and synthetic framework reports of any size.
+"""
+import json
+import subprocess
+from pathlib import Path
+from typing import Any, Dict
+
+# Plugins the pytest runner invokes (--json-report, --cov)
+PYTEST_REQUIREMENTS = "pytest\npytest-json-report\npytest-cov\n"
+
+
+def _git(cwd: Path, *args: str) -> None:
+    subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True)
+
+
+def _commit(path: Path) -> str:
+    _git(path, "init", "-q", "-b", "main")
+    _git(path, "add", "-A")
+    _git(
+        path,
+        "-c", "user.name=tsuite-bench", "-c", "user.email=bench@tsuite.local",
+        "commit", "-q", "-m", "Benchmark fixture"
+    )
+    return path.resolve().as_uri()
+
+
+def create_pytest_repo(path: Path, test_files: int = 10, tests_per_file: int = 10, failing: int = 0) -> str:
+    """
+    Write a pytest project with ``test_files`` modules of ``tests_per_file``
+    tests each (the first ``failing`` of them fail) and commit it on
+    ``main``. Returns the repository's file:// URL.
+    """
+    package = path / "benchpkg"
+    tests = path / "tests"
+    package.mkdir(parents=True)
+    tests.mkdir()
+    (package / "__init__.py").write_text("")
+    (path / "requirements.txt").write_text(PYTEST_REQUIREMENTS)
+    (path / "pytest.ini").write_text("[pytest]\ntestpaths = tests\npythonpath = .\n")
+
+    index = 0
+    for module in range(test_files):
+        (package / f"module_{module}.py").write_text(
+            f"def compute_{module}(value):\n"
+            f"    if value < 0:\n"
+            f"        return -value * {module + 1}\n"
+            f"    return value * {module + 1}\n"
+        )
+        cases = [f"from benchpkg.module_{module} import compute_{module}\n"]
+        for case in range(tests_per_file):
+            expected = case * (module + 1) + (1 if index < failing else 0)
+            cases.append(f"\ndef test_compute_{case}():\n    assert compute_{module}({case}) == {expected}\n")
+            index += 1
+        (tests / f"test_module_{module}.py").write_text("".join(cases))
+    return _commit(path)
+
+
+def create_jest_repo(path: Path, test_files: int = 10, tests_per_file: int = 10, failing: int = 0) -> str:
+    """Jest counterpart of ``create_pytest_repo``; returns the file:// URL"""
+    src = path / "src"
+    tests = path / "__tests__"
+    src.mkdir(parents=True)
+    tests.mkdir()
+    (path / "package.json").write_text(json.dumps({
+        "name": "tsuite-bench-fixture",
+        "version": "1.0.0",
+        "private": True,
+        "scripts": {"test": "jest"},
+        "devDependencies": {"jest": "^29.7.0"}
+    }, indent=2))
+
+    index = 0
+    for module in range(test_files):
+        (src / f"module_{module}.js").write_text(
+            f"function compute(value) {{\n"
+            f"  return Math.abs(value) * {module + 1};\n"
+            f"}}\n\nmodule.exports = {{ compute }};\n"
+        )
+        cases = [f"const {{ compute }} = require('../src/module_{module}');\n"]
+        for case in range(tests_per_file):
+            expected = case * (module + 1) + (1 if index < failing else 0)
+            cases.append(f"\ntest('compute {case}', () => {{\n  expect(compute({case})).toBe({expected});\n}});\n")
+            index += 1
+        (tests / f"module_{module}.test.js").write_text("".join(cases))
+    return _commit(path)
+
+
+def jest_report(suites: int, tests_per_suite: int, root: str = "/work", failing_every: int = 50) -> Dict[str, Any]:
+    """A Jest ``--json --coverage`` report with one covered source file per suite"""
+    results = []
+    coverage = {}
+    total = failed = 0
+    for suite in range(suites):
+        assertions = []
+        for case in range(tests_per_suite):
+            failure = total % failing_every == failing_every - 1
+            assertions.append({
+                "ancestorTitles": [f"module {suite}"],
+                "fullName": f"module {suite} case {case}",
+                "title": f"case {case}",
+                "status": "failed" if failure else "passed",
+                "duration": 3,
+                "failureMessages": [f"Error: expected {case} to be {case + 1}\n    at Object.<anonymous>"] if failure else []
+            })
+            total += 1
+            failed += failure
+        start = 1700000000000 + suite * 10
+        results.append({
+            "name": f"{root}/__tests__/module_{suite}.test.js",
+            "status": "passed",
+            "perfStats": {"start": start, "end": start + 25, "runtime": 25},
+            "assertionResults": assertions
+        })
+        source = f"{root}/src/module_{suite}.js"
+        statements = {str(line): {"start": {"line": line + 1}, "end": {"line": line + 1}} for line in range(40)}
+        coverage[source] = {
+            "path": source,
+            "statementMap": statements,
+            "s": {str(line): line % 4 for line in range(40)},
+            "branchMap": {"0": {"locations": [{}, {}]}},
+            "b": {"0": [1, 0]}
+        }
+    return {
+        "numTotalTests": total,
+        "numPassedTests": total - failed,
+        "numFailedTests": failed,
+        "numPendingTests": 0,
+        "success": failed == 0,
+        "testResults": results,
+        "coverageMap": coverage
+    }
+
+
+def pytest_report(modules: int, tests_per_module: int, failing_every: int = 50) -> Dict[str, Any]:
+    """A pytest-json-report document"""
+    tests = []
+    for module in range(modules):
+        for case in range(tests_per_module):
+            failure = len(tests) % failing_every == failing_every - 1
+            call = {"duration": 0.002, "outcome": "failed" if failure else "passed"}
+            if failure:
+                call["longrepr"] = f"assert compute_{module}({case}) == {case + 1}\nAssertionError"
+            tests.append({
+                "nodeid": f"tests/test_module_{module}.py::test_compute_{case}",
+                "outcome": call["outcome"],
+                "setup": {"duration": 0.0005, "outcome": "passed"},
+                "call": call,
+                "teardown": {"duration": 0.0003, "outcome": "passed"}
+            })
+    failed = sum(test["outcome"] == "failed" for test in tests)
+    return {
+        "duration": len(tests) * 0.003,
+        "summary": {"total": len(tests), "passed": len(tests) - failed, "failed": failed},
+        "tests": tests
+    }
+
+
+def coverage_py_report(modules: int, root: str = "/work", lines: int = 40) -> Dict[str, Any]:
+    """A coverage.py JSON report covering three quarters of each module's lines"""
+    files = {}
+    for module in range(modules):
+        executed = [line for line in range(1, lines + 1) if line % 4]
+        missing = [line for line in range(1, lines + 1) if not line % 4]
+        files[f"{root}/benchpkg/module_{module}.py"] = {
+            "executed_lines": executed,
+            "missing_lines": missing,
+            "summary": {"num_statements": lines, "covered_lines": len(executed)}
+        }
+    return {"files": files}
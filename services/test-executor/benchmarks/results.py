@@ -0,0 +1,65 @@
+"""
+Machine-readable benchmark results and their comparison across commits.
+"""
+import platform
+import subprocess
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+
+def _commit() -> Optional[str]:
+    result = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True)
+    return result.stdout.strip() or None
+
+
+def results_document(results: Dict[str, Any], target: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
+    """Scenario results together with the commit and machine that produced them"""
+    return {
+        "meta": {
+            "commit": _commit(),
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "target": target,
+            "parameters": parameters
+        },
+        "results": results
+    }
+
+
+def _metrics(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    """Flatten results into comparable metrics: every p50 latency and throughput"""
+    metrics = {}
+    for key, value in results.items():
+        if not isinstance(value, dict):
+            continue
+        name = f"{prefix}{key}"
+        if "p50" in value:
+            metrics[f"{name}.p50"] = value["p50"]
+        if "throughput" in value:
+            metrics[f"{name}.throughput"] = value["throughput"]
+        metrics.update(_metrics(value, f"{name}."))
+    return metrics
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.1) -> Dict[str, Dict[str, Any]]:
+    """
+    Relative change of every metric present in both documents; a change is
+    a regression when latency grows, or throughput drops, by more than
+    ``threshold``.
+    """
+    before = _metrics(baseline["results"])
+    after = _metrics(current["results"])
+    changes = {}
+    for name in sorted(before.keys() & after.keys()):
+        if not before[name]:
+            continue
+        change = (after[name] - before[name]) / before[name]
+        worse = -change if name.endswith(".throughput") else change
+        changes[name] = {
+            "baseline": before[name],
+            "current": after[name],
+            "change": change,
+            "regression": worse > threshold
+        }
+    return changes
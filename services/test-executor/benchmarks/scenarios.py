@@ -0,0 +1,180 @@
+"""
+Benchmark scenarios: report parsing and end-to-end load on the API.
+"""
+import asyncio
+import json
+import statistics
+import tempfile
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import httpx
+
+from app.config import settings
+from app.services.test_runner import JestRunner, PytestRunner
+from benchmarks.fixtures import coverage_py_report, jest_report, pytest_report
+
+# Submit path, status path and id field of each API scenario
+API_SCENARIOS = {
+    "execute": ("/tests/execute", "/tests/{job_id}/status", "test_run_id"),
+    "scan": ("/security/scan", "/security/{job_id}/status", "scan_id"),
+}
+
+FINISHED = ["completed", "failed"]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Count, mean and nearest-rank percentiles of timing samples (seconds)"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def percentile(fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    return {
+        "count": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "min": ordered[0],
+        "p50": percentile(0.5),
+        "p95": percentile(0.95),
+        "max": ordered[-1]
+    }
+
+
+def _time(call: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def bench_parsers(suites: int = 500, tests_per_suite: int = 100, repeat: int = 5) -> Dict[str, Dict[str, Any]]:
+    """
+    Time the runners' report and live-output parsers on synthetic outputs of
+    ``suites`` files with ``tests_per_suite`` tests each.
+    """
+    tests = suites * tests_per_suite
+    jest_runner = JestRunner()
+    pytest_runner = PytestRunner()
+    with tempfile.TemporaryDirectory(prefix="tsuite_bench_") as workdir:
+        root = Path(workdir)
+        jest_path = root / "jest-report.json"
+        jest_path.write_text(json.dumps(jest_report(suites, tests_per_suite, root=workdir)))
+        (root / "report.json").write_text(json.dumps(pytest_report(suites, tests_per_suite)))
+        (root / "coverage.json").write_text(json.dumps(coverage_py_report(suites, root=workdir)))
+
+        pytest_lines = [
+            f"tests/test_module_{index // tests_per_suite}.py::test_compute_{index} PASSED [{index * 100 // tests:3d}%]"
+            for index in range(tests)
+        ]
+        jest_lines = [f"    ✓ compute {index} (3 ms)" for index in range(tests)]
+
+        results = {
+            "parse.jest_report": _time(lambda: jest_runner._parse_jest_output("", "", str(jest_path), workdir), repeat),
+            "parse.pytest_report": _time(lambda: pytest_runner._parse_pytest_output(workdir, "", ""), repeat),
+            "parse.jest_output_lines": _time(lambda: [jest_runner._parse_output_line(line) for line in jest_lines], repeat),
+            "parse.pytest_output_lines": _time(
+                lambda: [pytest_runner._parse_output_line(line) for line in pytest_lines], repeat
+            ),
+        }
+        sizes = {
+            "parse.jest_report": jest_path.stat().st_size,
+            "parse.pytest_report": (root / "report.json").stat().st_size + (root / "coverage.json").stat().st_size,
+        }
+    for name, stats in results.items():
+        stats["tests"] = tests
+        if name in sizes:
+            stats["bytes"] = sizes[name]
+    return results
+
+
+def _payload(scenario: str, job_id: str, repository_url: str, framework: str, scanner: str) -> Dict[str, Any]:
+    payload = {
+        "project_id": "benchmark",
+        API_SCENARIOS[scenario][2]: job_id,
+        "repository_url": repository_url,
+        "branch": "main"
+    }
+    if scenario == "execute":
+        # Measure execution, not the result cache
+        payload.update(framework=framework, bypass_cache=True)
+    else:
+        payload["scanner_type"] = scanner
+    return payload
+
+
+async def bench_api(
+    client: httpx.AsyncClient,
+    scenario: str,
+    repository_url: str,
+    jobs: int = 20,
+    concurrency: int = 4,
+    framework: str = "pytest",
+    scanner: str = "sast",
+    poll_interval: float = 0.5,
+    timeout: float = 1800
+) -> Dict[str, Any]:
+    """
+    Submit ``jobs`` runs or scans of ``repository_url``, keeping at most
+    ``concurrency`` in flight, and poll each until it finishes.
+
+    ``submit`` times the POST alone; ``end_to_end`` runs from the POST to the
+    first status poll that reports the job finished.
+    """
+    submit_path, status_path, _ = API_SCENARIOS[scenario]
+    prefix = f"/api/{settings.api_version}"
+    batch = uuid.uuid4().hex[:8]
+    semaphore = asyncio.Semaphore(concurrency)
+    submit: List[float] = []
+    end_to_end: List[float] = []
+    outcomes: Counter = Counter()
+    errors: Counter = Counter()
+
+    async def one(index: int) -> None:
+        job_id = f"bench-{batch}-{index}"
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post(
+                prefix + submit_path,
+                json=_payload(scenario, job_id, repository_url, framework, scanner)
+            )
+            submit.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                outcomes["rejected"] += 1
+                return
+
+            while True:
+                record = (await client.get(prefix + status_path.format(job_id=job_id))).json()
+                status = record.get("status")
+                if status in FINISHED:
+                    error = record.get("error") or (record.get("results") or {}).get("error")
+                    if error:
+                        errors[error[:200]] += 1
+                    break
+                if time.perf_counter() - started > timeout:
+                    status = "timeout"
+                    break
+                await asyncio.sleep(poll_interval)
+            end_to_end.append(time.perf_counter() - started)
+            outcomes[status] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(jobs)))
+    wall = time.perf_counter() - started
+
+    return {
+        "jobs": jobs,
+        "concurrency": concurrency,
+        "outcomes": dict(outcomes),
+        "errors": dict(errors),
+        "wall_seconds": wall,
+        "throughput": sum(outcomes[status] for status in FINISHED) / wall if wall else 0,
+        "submit": summarize(submit),
+        "end_to_end": summarize(end_to_end)
+    }
@@ -0,0 +1,42 @@
+"""
+Shared test fixtures
+"""
+import subprocess
+from pathlib import Path
+
+import pytest
+
+GIT_IDENTITY = ["-c", "user.name=tSuite Tests", "-c", "user.email=tests@tsuite.local"]
+
+
+def git(cwd, *args) -> str:
+    """Run a git command in ``cwd`` and return its stdout"""
+    result = subprocess.run(
+        ["git", *GIT_IDENTITY, *args],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return result.stdout.strip()
+
+
+def commit_files(repo: Path, files: dict, message: str = "update") -> str:
+    """Write ``files`` into ``repo``, commit them and return the new SHA"""
+    for name, content in files.items():
+        path = repo / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    git(repo, "add", "-A")
+    git(repo, "commit", "-q", "-m", message)
+    return git(repo, "rev-parse", "HEAD")
+
+
+@pytest.fixture
+def git_repo(tmp_path):
+    """A local git repository on branch ``main`` with one commit"""
+    repo = tmp_path / "origin"
+    repo.mkdir()
+    git(repo, "init", "-q", "-b", "main")
+    commit_files(repo, {"README.md": "fixture\n"}, "initial")
+    return repo
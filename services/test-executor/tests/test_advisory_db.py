@@ -0,0 +1,204 @@
+"""
+Test the offline advisory database
+"""
+import asyncio
+import json
+import zipfile
+
+import pytest
+
+from app.config import settings
+from app.services import security_scanner
+from app.services.advisory_db import AdvisoryDatabase, installed_packages, version_key
+from app.services.result_store import InMemoryResultStore
+from app.services.scan_cache import DependencyScanCache
+from app.services.security_scanner import DependencyScanner
+
+ADVISORIES = [
+    {
+        "id": "GHSA-lodash",
+        "aliases": ["CVE-2021-23337"],
+        "summary": "Command injection in lodash",
+        "database_specific": {"severity": "HIGH"},
+        "affected": [{
+            "package": {"ecosystem": "npm", "name": "lodash"},
+            "ranges": [{"type": "SEMVER", "events": [{"introduced": "0"}, {"fixed": "4.17.21"}]}],
+        }],
+    },
+    {
+        "id": "GHSA-minimist",
+        "summary": "Prototype pollution in minimist",
+        "database_specific": {"severity": "CRITICAL"},
+        "affected": [{
+            "package": {"ecosystem": "npm", "name": "minimist"},
+            "ranges": [{"type": "SEMVER", "events": [{"introduced": "1.0.0"}, {"last_affected": "1.2.5"}]}],
+            "versions": ["0.0.8"],
+        }],
+    },
+    {
+        "id": "PYSEC-django",
+        "summary": "SQL injection in Django",
+        "database_specific": {"severity": "MODERATE"},
+        "affected": [{
+            "package": {"ecosystem": "PyPI", "name": "Django"},
+            "ranges": [{"type": "ECOSYSTEM", "events": [{"introduced": "3.2"}, {"fixed": "3.2.14"}]}],
+        }],
+    },
+    {
+        "id": "GHSA-withdrawn",
+        "withdrawn": "2023-01-01T00:00:00Z",
+        "affected": [{
+            "package": {"ecosystem": "npm", "name": "left-pad"},
+            "ranges": [{"type": "SEMVER", "events": [{"introduced": "0"}]}],
+        }],
+    },
+]
+
+LOCKFILE = {
+    "lockfileVersion": 3,
+    "packages": {
+        "": {"name": "app", "version": "1.0.0"},
+        "node_modules/lodash": {"version": "4.17.20"},
+        "node_modules/left-pad": {"version": "1.3.0"},
+        "node_modules/minimist": {"version": "1.2.5"},
+        "node_modules/mkdirp/node_modules/minimist": {"version": "0.0.8"},
+        "node_modules/other/node_modules/lodash": {"version": "4.17.21"},
+    },
+}
+
+
+@pytest.fixture
+def dump(tmp_path):
+    path = tmp_path / "advisories"
+    path.mkdir()
+    with zipfile.ZipFile(path / "npm-all.zip", "w") as archive:
+        for record in ADVISORIES[:2] + ADVISORIES[3:]:
+            archive.writestr(f"{record['id']}.json", json.dumps(record))
+    (path / "pypi.json").write_text(json.dumps([ADVISORIES[2]]))
+    return path
+
+
+@pytest.fixture
+def project(tmp_path):
+    path = tmp_path / "project"
+    path.mkdir()
+    (path / "package.json").write_text(json.dumps({"name": "app"}))
+    (path / "package-lock.json").write_text(json.dumps(LOCKFILE))
+    (path / "requirements.txt").write_text("django==3.2.4\nrequests>=2.0\nflask[async]==2.0.1  # web\n")
+    return path
+
+
+def test_version_ordering():
+    """Test semver and PEP 440 versions sort by release, then pre/final/post"""
+    ordered = ["1.0.dev1", "1.0.0-alpha.1", "1.0.0-beta", "1.0", "1.0.post1", "1.0.1", "1.2", "1.10"]
+    assert sorted(ordered, key=version_key) == ordered
+    assert version_key("v2.0.0") == version_key("2.0")
+    assert version_key("latest") is None
+
+
+def test_lockfile_is_matched_in_one_pass(dump, project):
+    """Test a whole lockfile is matched against indexed advisories"""
+    db = AdvisoryDatabase(str(dump))
+    assert db.refresh()
+
+    packages = installed_packages(str(project), "npm")
+    assert ("minimist", "0.0.8") in packages and ("app", "1.0.0") not in packages
+    found = {(v["package"], v["installed_version"]): v for v in db.match("npm", packages)}
+
+    assert set(found) == {("lodash", "4.17.20"), ("minimist", "1.2.5"), ("minimist", "0.0.8")}
+    assert found[("lodash", "4.17.20")]["cve"] == "CVE-2021-23337"
+    assert found[("lodash", "4.17.20")]["severity"] == "high"
+    assert found[("lodash", "4.17.20")]["patched_versions"] == "4.17.21"
+    assert found[("minimist", "1.2.5")]["vulnerable_versions"] == ">=1.0.0 <=1.2.5"
+
+    python = db.match("python", installed_packages(str(project), "python"))
+    assert [(v["package"], v["severity"]) for v in python] == [("django", "medium")]
+    assert db.status()["ecosystems"] == {"npm": 2, "python": 1}
+
+
+def test_database_reloads_when_dumps_change(dump):
+    """Test the index follows the dump files and its version changes with them"""
+    db = AdvisoryDatabase(str(dump))
+    db.refresh()
+    version = db.version
+    assert db.refresh() and db.version == version
+
+    (dump / "pypi.json").unlink()
+    db.refresh()
+    assert db.version != version
+    assert not db.covers("python")
+    assert AdvisoryDatabase(str(dump / "missing")).refresh() is False
+
+
+def test_dependency_scanner_uses_offline_backend(monkeypatch, dump, project):
+    """Test pinned ecosystems are audited offline and the rest falls back to online tools"""
+    db = AdvisoryDatabase(str(dump))
+    monkeypatch.setattr(security_scanner, "advisory_db", db)
+    monkeypatch.setattr(security_scanner, "dependency_scan_cache", DependencyScanCache(InMemoryResultStore("s", 10, None)))
+    monkeypatch.setattr(settings, "dependency_scan_backend", "auto")
+    online = []
+
+    async def fake_online(self, project_dir):
+        online.append(project_dir)
+        return []
+
+    monkeypatch.setattr(DependencyScanner, "_scan_npm", fake_online)
+    monkeypatch.setattr(DependencyScanner, "_scan_python", fake_online)
+
+    (project / "requirements.txt").write_text("django==3.2.4\nflask[async]==2.0.1  # web\n")
+    results = asyncio.run(DependencyScanner().scan_path(str(project)))
+    assert results["backends"] == {"npm": "offline", "python": "offline"}
+    assert results["total_vulnerabilities"] == 4
+    assert results["critical"] == 2
+    assert results["success"] and results["unpinned"] == {}
+    assert online == []
+
+    again = asyncio.run(DependencyScanner().scan_path(str(project)))
+    assert again["cached"] == ["npm", "python"]
+
+    (project / "package-lock.json").unlink()
+    results = asyncio.run(DependencyScanner().scan_path(str(project)))
+    assert results["backends"]["npm"] == "online"
+    assert online == [str(project)]
+
+    monkeypatch.setattr(settings, "dependency_scan_backend", "offline")
+    results = asyncio.run(DependencyScanner().scan_path(str(project)))
+    assert results["backends"]["npm"] == "offline"
+    assert len(online) == 1
+
+
+def test_partially_pinned_requirements_are_not_audited_offline(monkeypatch, dump, project):
+    """Test unpinned requirements fall back online in auto mode and are reported in offline mode"""
+    monkeypatch.setattr(security_scanner, "advisory_db", AdvisoryDatabase(str(dump)))
+    monkeypatch.setattr(security_scanner, "dependency_scan_cache", DependencyScanCache(InMemoryResultStore("s", 10, None)))
+    monkeypatch.setattr(settings, "dependency_scan_backend", "auto")
+    online = []
+
+    async def fake_online(self, project_dir):
+        online.append(project_dir)
+        return []
+
+    monkeypatch.setattr(DependencyScanner, "_scan_python", fake_online)
+
+    results = asyncio.run(DependencyScanner().scan_path(str(project)))
+    assert results["backends"] == {"npm": "offline", "python": "online"}
+    assert online == [str(project)]
+
+    monkeypatch.setattr(settings, "dependency_scan_backend", "offline")
+    results = asyncio.run(DependencyScanner().scan_path(str(project)))
+    assert results["backends"]["python"] == "offline"
+    assert results["unpinned"] == {"python": ["requests>=2.0"]}
+    assert [v["package"] for v in results["vulnerabilities"] if v["package"] == "django"] == ["django"]
+    assert len(online) == 1
+
+
+def test_offline_audit_without_database_is_not_clean(monkeypatch, tmp_path, project):
+    """Test an offline audit with no advisory data fails instead of reporting zero vulnerabilities"""
+    monkeypatch.setattr(security_scanner, "advisory_db", AdvisoryDatabase(str(tmp_path / "missing")))
+    monkeypatch.setattr(security_scanner, "dependency_scan_cache", DependencyScanCache(InMemoryResultStore("s", 10, None)))
+    monkeypatch.setattr(settings, "dependency_scan_backend", "offline")
+
+    results = asyncio.run(DependencyScanner().scan_path(str(project)))
+    assert results["success"] is False
+    assert set(results["unaudited"]) == {"npm", "python"}
+    assert results["total_vulnerabilities"] == 0
@@ -69,3 +69,18 @@ def test_security_scan_invalid_scanner():
         }
     )
     assert response.status_code == 400
+
+
+def test_execute_tests_invalid_priority():
+    """Test test execution with an unknown priority class"""
+    response = client.post(
+        "/api/v1/tests/execute",
+        json={
+            "project_id": "test-project",
+            "test_run_id": "test-run-789",
+            "framework": "pytest",
+            "repository_url": "https://github.com/test/repo.git",
+            "priority": "whenever"
+        }
+    )
+    assert response.status_code == 400
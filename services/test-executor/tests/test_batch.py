@@ -0,0 +1,144 @@
+"""
+Test batch submission and bulk status endpoints
+"""
+import time
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.routers import security, test_execution
+
+client = TestClient(app)
+
+
+def run_request(test_run_id, **overrides):
+    return {
+        "project_id": "batch-project",
+        "test_run_id": test_run_id,
+        "framework": "pytest",
+        "repository_url": "https://github.com/test/repo.git",
+        **overrides
+    }
+
+
+def test_batch_execution_and_status(monkeypatch):
+    """Test many runs are queued at once and their status is read in one request"""
+    started = []
+
+    async def fake_run(request):
+        started.append(request.test_run_id)
+        test_execution.test_results_store[request.test_run_id] = {
+            "status": "completed",
+            "progress": 100,
+            "completed_at": datetime.utcnow().isoformat(),
+            "results": {"success": True, "total_tests": 3, "passed": 3, "failed": 0, "test_results": [{}] * 3}
+        }
+
+    monkeypatch.setattr(test_execution, "run_tests_background", fake_run)
+    response = client.post("/api/v1/tests/execute/batch", json={"runs": [
+        run_request("batch-1"),
+        run_request("batch-2", framework="jest"),
+        run_request("batch-3", framework="rspec"),
+        run_request("batch-1"),
+    ]})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["queued"] == ["batch-1", "batch-2"]
+    assert [r["test_run_id"] for r in data["rejected"]] == ["batch-3", "batch-1"]
+    assert "Unsupported framework" in data["rejected"][0]["error"]
+    assert sorted(started) == ["batch-1", "batch-2"]
+
+    response = client.post("/api/v1/tests/status/batch", json={"test_run_ids": ["batch-1", "batch-2", "nope"]})
+    data = response.json()
+    assert data["missing"] == ["nope"]
+    assert data["runs"]["batch-1"] == {
+        "status": "completed",
+        "progress": 100,
+        "summary": {"success": True, "total_tests": 3, "passed": 3, "failed": 0}
+    }
+
+
+def test_batch_size_is_limited(monkeypatch):
+    """Test oversized batches are refused as a whole"""
+    monkeypatch.setattr(settings, "max_batch_size", 1)
+    response = client.post("/api/v1/tests/execute/batch", json={"runs": [run_request("big-1"), run_request("big-2")]})
+    assert response.status_code == 400
+    assert "big-1" not in test_execution.test_results_store
+
+    response = client.post("/api/v1/security/status/batch", json={"scan_ids": ["a", "b"]})
+    assert response.status_code == 400
+
+
+def test_security_batch_and_status(monkeypatch):
+    """Test scans and pipelines are queued together and reported compactly"""
+    started = []
+
+    async def fake_scan(request):
+        started.append(request.scan_id)
+
+    monkeypatch.setattr(security, "run_security_scan_background", fake_scan)
+    scan = {"project_id": "batch-project", "repository_url": "https://github.com/test/repo.git"}
+    response = client.post("/api/v1/security/batch", json={
+        "scans": [{**scan, "scan_id": "scan-b1", "scanner_type": "sast"}],
+        "pipelines": [
+            {**scan, "scan_id": "scan-b2", "scanners": ["SAST", "dependency"]},
+            {**scan, "scan_id": "scan-b3", "scanners": ["secrets"]},
+        ],
+    })
+
+    data = response.json()
+    assert data["queued"] == ["scan-b1", "scan-b2"]
+    assert data["rejected"][0]["scan_id"] == "scan-b3"
+    assert started == ["scan-b1", "scan-b2"]
+
+    data = client.post("/api/v1/security/status/batch", json={"scan_ids": ["scan-b1", "scan-b2"]}).json()
+    assert data["scans"]["scan-b1"]["status"] == "queued"
+    assert data["scans"]["scan-b2"]["scanner_type"] == "pipeline"
+    assert data["missing"] == []
+
+
+def test_in_flight_ids_cannot_be_resubmitted(monkeypatch):
+    """Test resubmitting a queued run ID is refused singly and in batches"""
+    async def fake_run(request):
+        pass
+
+    monkeypatch.setattr(test_execution, "run_tests_background", fake_run)
+    test_execution.test_results_store["inflight-1"] = {"status": "running", "progress": 10}
+    # The replica running it keeps the ID claimed
+    assert test_execution.test_results_store.claim("inflight-1", 60)
+
+    response = client.post("/api/v1/tests/execute", json=run_request("inflight-1"))
+    assert response.status_code == 409
+
+    response = client.post("/api/v1/tests/execute/batch", json={"runs": [run_request("inflight-1")]})
+    assert response.json()["rejected"] == [{"test_run_id": "inflight-1", "error": "Test run inflight-1 is already running"}]
+    assert test_execution.test_results_store["inflight-1"]["status"] == "running"
+
+
+def test_stale_in_flight_record_does_not_block_resubmission(monkeypatch):
+    """Test a run whose replica stopped renewing its claim can be resubmitted, and claims are atomic"""
+    started = []
+
+    async def fake_run(request):
+        started.append(request.test_run_id)
+
+    monkeypatch.setattr(test_execution, "run_tests_background", fake_run)
+    store = test_execution.test_results_store
+    # Left "running" by a replica that crashed; its claim has lapsed
+    store["orphaned-1"] = {"status": "running", "progress": 40}
+
+    response = client.post("/api/v1/tests/execute", json=run_request("orphaned-1"))
+    assert response.status_code == 200
+    assert started == ["orphaned-1"]
+    assert store["orphaned-1"]["status"] == "queued"
+
+    # The new run now holds the claim, so a second submission is refused
+    assert client.post("/api/v1/tests/execute", json=run_request("orphaned-1")).status_code == 409
+    store.release_claim("orphaned-1")
+    assert store.claim("orphaned-1", 0.01) and not store.claim("orphaned-1", 60)
+    time.sleep(0.02)
+    assert store.claim("orphaned-1", 60)
+    store.release_claim("orphaned-1")
@@ -0,0 +1,91 @@
+"""
+Test the benchmark suite's fixtures, scenarios and result comparison
+"""
+import asyncio
+import io
+import json
+
+import httpx
+import pytest
+
+from app.main import app
+from app.routers import test_execution
+from app.routers.security import SUPPORTED_SCANNERS
+from app.services.result_parser import parse_jest_report
+from benchmarks.__main__ import main
+from benchmarks.fixtures import create_pytest_repo, jest_report
+from benchmarks.results import compare_results
+from benchmarks.scenarios import bench_api, bench_parsers, summarize
+from tests.conftest import git
+
+
+def test_pytest_fixture_repository(tmp_path):
+    """Test generated repositories are committed on main and reachable by file:// URL"""
+    url = create_pytest_repo(tmp_path / "fixture", test_files=3, tests_per_file=4, failing=2)
+    assert url.startswith("file://")
+
+    clone = tmp_path / "clone"
+    git(tmp_path, "clone", "-q", "-b", "main", url, str(clone))
+    tests = sorted(path.name for path in (clone / "tests").iterdir())
+    assert tests == ["test_module_0.py", "test_module_1.py", "test_module_2.py"]
+    assert (clone / "tests" / "test_module_1.py").read_text().count("def test_") == 4
+    # The first two tests fail: compute_0(n) is 0, not 1
+    assert "assert compute_0(0) == 1" in (clone / "tests" / "test_module_0.py").read_text()
+
+
+def test_parser_benchmark_parses_synthetic_reports():
+    """Test synthetic reports are valid parser input and every parser is timed"""
+    report = parse_jest_report(io.StringIO(json.dumps(jest_report(4, 25))))
+    assert (report["total_tests"], report["failed"], len(report["test_results"])) == (100, 2, 100)
+
+    results = bench_parsers(suites=3, tests_per_suite=4, repeat=2)
+    assert set(results) == {
+        "parse.jest_report", "parse.pytest_report", "parse.jest_output_lines", "parse.pytest_output_lines"
+    }
+    assert all(stats["count"] == 2 and stats["tests"] == 12 for stats in results.values())
+    assert results["parse.jest_report"]["bytes"] > 0
+
+
+def test_api_benchmark_counts_outcomes(monkeypatch):
+    """Test jobs are driven through the API and timed until they finish"""
+    async def fake_run(request):
+        status = "failed" if request.test_run_id.endswith("-0") else "completed"
+        test_execution.test_results_store[request.test_run_id] = {"status": status, "progress": 100}
+
+    monkeypatch.setattr(test_execution, "run_tests_background", fake_run)
+
+    async def drive():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            return await bench_api(client, "execute", "file:///fixture", jobs=5, concurrency=2, poll_interval=0.01)
+
+    results = asyncio.run(drive())
+    assert results["outcomes"] == {"completed": 4, "failed": 1}
+    assert results["submit"]["count"] == results["end_to_end"]["count"] == 5
+    assert results["throughput"] > 0
+
+
+def test_compare_flags_regressions():
+    """Test slower latencies and lower throughput beyond the threshold are regressions"""
+    def document(p50, throughput):
+        return {"results": {
+            "parse.jest_report": summarize([p50]),
+            "api.execute": {"throughput": throughput, "end_to_end": summarize([p50 * 10])}
+        }}
+
+    changes = compare_results(document(1.0, 10.0), document(1.05, 8.0), threshold=0.1)
+    assert not changes["parse.jest_report.p50"]["regression"]
+    assert not changes["api.execute.end_to_end.p50"]["regression"]
+    assert changes["api.execute.throughput"]["regression"]
+
+    changes = compare_results(document(1.0, 10.0), document(1.5, 12.0), threshold=0.1)
+    assert changes["parse.jest_report.p50"]["regression"]
+    assert not changes["api.execute.throughput"]["regression"]
+
+
+def test_scanner_choices_follow_the_api(capsys):
+    """Test the CLI only offers scanners the API accepts"""
+    with pytest.raises(SystemExit):
+        main(["run", "--scanner", "secrets"])
+    assert "invalid choice: 'secrets'" in capsys.readouterr().err
+    assert "sast" in SUPPORTED_SCANNERS
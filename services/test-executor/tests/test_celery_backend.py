@@ -0,0 +1,99 @@
+"""
+Test dispatching runs to the Celery worker pool (eager, in-memory transport)
+"""
+import pytest
+from celery import states
+from fastapi.testclient import TestClient
+
+from app import tasks
+from app.celery_app import celery_app
+from app.config import settings
+from app.main import app
+from app.routers import test_execution
+
+client = TestClient(app)
+
+
+class FakeRunner:
+    async def run_tests(self, **kwargs):
+        return {"success": True, "total_tests": 3, "passed": 3, "failed": 0, "skipped": 0}
+
+
+@pytest.fixture
+def celery_backend(monkeypatch):
+    monkeypatch.setattr(settings, "execution_backend", "celery")
+    monkeypatch.setattr(test_execution, "get_test_runner", lambda framework: FakeRunner())
+    previous = dict(celery_app.conf)
+    celery_app.conf.update(
+        broker_url="memory://",
+        result_backend="cache+memory://",
+        task_always_eager=True
+    )
+    yield
+    celery_app.conf.update(
+        broker_url=previous["broker_url"],
+        result_backend=previous["result_backend"],
+        task_always_eager=previous["task_always_eager"]
+    )
+
+
+def test_execute_dispatches_to_worker(celery_backend):
+    """Test a queued run is executed by the Celery task and reported by /status"""
+    response = client.post(
+        "/api/v1/tests/execute",
+        json={
+            "project_id": "test-project",
+            "test_run_id": "celery-run-1",
+            "framework": "pytest",
+            "repository_url": "https://github.com/test/repo.git"
+        }
+    )
+    assert response.status_code == 200
+    assert response.json()["status"] == "queued"
+
+    status = client.get("/api/v1/tests/celery-run-1/status").json()
+    assert status["status"] == "completed"
+    assert status["results"]["passed"] == 3
+    assert celery_app.AsyncResult("celery-run-1").state == "SUCCESS"
+
+
+def test_batch_status_looks_up_workers_in_one_round_trip(celery_backend, monkeypatch):
+    """Test batch status merges worker state for every run from a single result backend MGET"""
+    backend = celery_app.backend
+    for run_id in ["bulk-started", "bulk-done", "bulk-failed", "bulk-queued"]:
+        test_execution.test_results_store[run_id] = {"status": "queued", "backend": "celery"}
+    backend.store_result("bulk-started", None, states.STARTED)
+    backend.store_result("bulk-done", {"status": "completed", "results": {"success": True, "passed": 2}}, states.SUCCESS)
+    backend.store_result("bulk-failed", ValueError("worker lost"), states.FAILURE)
+
+    lookups = []
+    mget = type(backend).mget
+    # The app keeps one backend per thread, and the lookup runs off the event loop
+    monkeypatch.setattr(type(backend), "mget", lambda self, keys: lookups.append(keys) or mget(self, keys))
+    monkeypatch.setattr(celery_app, "AsyncResult", lambda job_id: pytest.fail("per-job result lookup"))
+
+    runs = client.post(
+        "/api/v1/tests/status/batch",
+        json={"test_run_ids": ["bulk-started", "bulk-done", "bulk-failed", "bulk-queued"]}
+    ).json()["runs"]
+
+    assert len(lookups) == 1 and len(lookups[0]) == 4
+    assert {run_id: run["status"] for run_id, run in runs.items()} == {
+        "bulk-started": "running", "bulk-done": "completed", "bulk-failed": "failed", "bulk-queued": "queued"
+    }
+    assert runs["bulk-done"]["summary"]["passed"] == 2
+    assert "worker lost" in runs["bulk-failed"]["error"]
+    assert test_execution.test_results_store["bulk-done"]["status"] == "completed"
+
+
+def test_pool_process_does_not_reuse_parent_loop():
+    """Test a forked pool process starts with a fresh event loop instead of the parent's"""
+    async def noop():
+        pass
+
+    tasks._run(noop())
+    parent_loop = tasks._thread_state.loop
+    tasks.reset_event_loop()
+    tasks._run(noop())
+    assert tasks._thread_state.loop is not parent_loop
+    parent_loop.close()
@@ -0,0 +1,73 @@
+"""
+Test the compact coverage model
+"""
+import json
+
+from app.services.coverage import CoverageReport, FileCoverage
+
+ISTANBUL_FILE = {
+    "path": "/work/src/math.js",
+    "statementMap": {
+        "0": {"start": {"line": 1, "column": 0}, "end": {"line": 1, "column": 10}},
+        "1": {"start": {"line": 2, "column": 0}, "end": {"line": 2, "column": 10}},
+        "2": {"start": {"line": 4, "column": 0}, "end": {"line": 4, "column": 10}},
+        "3": {"start": {"line": 5, "column": 0}, "end": {"line": 5, "column": 10}},
+    },
+    "s": {"0": 3, "1": 1, "2": 0, "3": 2},
+    "branchMap": {},
+    "b": {"0": [1, 0], "1": [4, 2]},
+}
+
+COVERAGE_PY = {
+    "files": {
+        "/work/pkg/util.py": {
+            "executed_lines": [1, 2, 3],
+            "missing_lines": [5],
+            "executed_branches": [[2, 3]],
+            "missing_branches": [[2, 5]],
+        },
+        "/work/pkg/sub/core.py": {"executed_lines": [1], "missing_lines": [], "summary": {"num_branches": 0}},
+    }
+}
+
+
+def test_from_istanbul_counts_lines_and_branches():
+    """Test Istanbul statements and branches map to bitmaps"""
+    coverage = FileCoverage.from_istanbul(ISTANBUL_FILE)
+    assert (coverage.line_total, coverage.line_covered) == (4, 3)
+    assert (coverage.branch_total, coverage.branch_covered) == (4, 3)
+
+
+def test_from_coverage_py_with_rollups():
+    """Test coverage.py data is relativised and rolled up per directory"""
+    report = CoverageReport.from_coverage_py(COVERAGE_PY, root="/work")
+    data = report.to_dict()
+    assert set(data["files"]) == {"pkg/util.py", "pkg/sub/core.py"}
+    assert data["summary"]["lines"] == {"total": 5, "covered": 4, "pct": 80.0}
+    assert data["summary"]["branches"] == {"total": 2, "covered": 1, "pct": 50.0}
+    assert data["directories"]["pkg"]["lines"]["total"] == 5
+    assert data["directories"]["pkg/sub"]["lines"]["pct"] == 100.0
+    assert data["directories"]["pkg/sub"]["branches"]["pct"] is None
+    assert data["files"]["pkg/sub/core.py"]["branch_pct"] is None
+    assert "." in data["directories"]
+
+
+def test_round_trip_merge_and_diff():
+    """Test serialised reports merge as unions and diff by line"""
+    first = CoverageReport({"a.py": FileCoverage(lines=0b11110, covered=0b00110)})
+    second = CoverageReport({"a.py": FileCoverage(lines=0b11110, covered=0b11000)})
+
+    restored = CoverageReport.from_dict(json.loads(json.dumps(first.to_dict())))
+    assert restored.files["a.py"].covered == 0b00110
+
+    assert second.diff(first) == {"a.py": {"newly_covered": 2, "newly_uncovered": 2}}
+    restored.merge(second)
+    assert restored.files["a.py"].line_covered == 4
+
+
+def test_compact_payload_is_smaller_than_istanbul():
+    """Test a large file's compact form is much smaller than raw Istanbul JSON"""
+    statements = {str(i): {"start": {"line": i + 1, "column": 0}, "end": {"line": i + 1, "column": 40}} for i in range(2000)}
+    raw = {"path": "/work/big.js", "statementMap": statements, "s": {str(i): i % 3 for i in range(2000)}, "b": {}}
+    compact = CoverageReport({"big.js": FileCoverage.from_istanbul(raw)}).to_dict()
+    assert len(json.dumps(compact)) * 10 < len(json.dumps(raw))
@@ -0,0 +1,124 @@
+"""
+Test the lockfile-keyed dependency cache
+"""
+import asyncio
+import json
+import os
+
+from app.services.dependency_cache import META_FILE, DependencyCache
+
+
+def make_project(path, lockfile="{}", files=None):
+    path.mkdir(parents=True)
+    (path / "package-lock.json").write_text(lockfile)
+    for name, content in (files or {}).items():
+        target = path / "node_modules" / name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(content)
+    return path
+
+
+def test_lockfile_key_tracks_lockfile_content(tmp_path):
+    """Test identical lockfiles share a key and different ones do not"""
+    cache = DependencyCache(str(tmp_path / "cache"), max_bytes=1 << 30)
+    a = make_project(tmp_path / "a", '{"lockfileVersion": 3}')
+    b = make_project(tmp_path / "b", '{"lockfileVersion": 3}')
+    c = make_project(tmp_path / "c", '{"lockfileVersion": 2}')
+    assert cache.lockfile_key(str(a), "npm") == cache.lockfile_key(str(b), "npm")
+    assert cache.lockfile_key(str(a), "npm") != cache.lockfile_key(str(c), "npm")
+    assert cache.lockfile_key(str(a), "python") is None
+
+
+def test_node_modules_round_trip_uses_hardlinks(tmp_path):
+    """Test a stored node_modules tree is restored by hardlinking"""
+    cache = DependencyCache(str(tmp_path / "cache"), max_bytes=1 << 30)
+    source = make_project(tmp_path / "source", files={"left-pad/index.js": "module.exports = 1\n"})
+    key = cache.lockfile_key(str(source), "npm")
+
+    asyncio.run(cache.store_node_modules(key, str(source)))
+    target = make_project(tmp_path / "target")
+    assert asyncio.run(cache.restore_node_modules(key, str(target)))
+
+    restored = target / "node_modules" / "left-pad" / "index.js"
+    assert restored.read_text() == "module.exports = 1\n"
+    assert os.stat(restored).st_ino == os.stat(source / "node_modules" / "left-pad" / "index.js").st_ino
+
+
+def test_eviction_removes_least_recently_used(tmp_path):
+    """Test entries beyond the disk budget are evicted oldest first"""
+    cache = DependencyCache(str(tmp_path / "cache"), max_bytes=1500)
+    keys = []
+    for i in range(3):
+        project = make_project(tmp_path / f"p{i}", f'{{"v": {i}}}', {"dep/blob": "x" * 1000})
+        key = cache.lockfile_key(str(project), "npm")
+        asyncio.run(cache.store_node_modules(key, str(project)))
+        meta_path = tmp_path / "cache" / key / "meta.json"
+        meta = json.loads(meta_path.read_text())
+        meta["last_used"] = i
+        meta_path.write_text(json.dumps(meta))
+        keys.append(key)
+
+    asyncio.run(cache.evict())
+    remaining = sorted(p.name for p in (tmp_path / "cache").iterdir() if not p.name.startswith("."))
+    assert remaining == [keys[2]]
+
+
+def test_modified_entry_is_discarded_on_restore(tmp_path):
+    """Test a write through a restored hardlink invalidates the cache entry"""
+    cache = DependencyCache(str(tmp_path / "cache"), max_bytes=1 << 30)
+    source = make_project(tmp_path / "source", files={"left-pad/index.js": "module.exports = 1\n"})
+    key = cache.lockfile_key(str(source), "npm")
+    asyncio.run(cache.store_node_modules(key, str(source)))
+
+    target = make_project(tmp_path / "target")
+    assert asyncio.run(cache.restore_node_modules(key, str(target)))
+    restored = target / "node_modules" / "left-pad" / "index.js"
+    assert not os.stat(restored).st_mode & 0o222
+
+    os.chmod(restored, 0o644)
+    restored.write_text("module.exports = 2\n")
+
+    again = make_project(tmp_path / "again")
+    assert not asyncio.run(cache.restore_node_modules(key, str(again)))
+    assert not (again / "node_modules").exists()
+    assert not (tmp_path / "cache" / key).exists()
+
+
+def test_virtualenv_pinned_by_another_process_is_not_evicted(tmp_path, monkeypatch):
+    """Test a cache sharing the directory (another worker process) never evicts a virtualenv in use"""
+    async def fake_build(self, key, project_dir, timeout):
+        entry = self._entry(key)
+        (entry / "venv").mkdir(parents=True)
+        self._write_meta(entry, {"size": 1000, "created": 0, "last_used": 0})
+
+    monkeypatch.setattr(DependencyCache, "_build_virtualenv", fake_build)
+    running = DependencyCache(str(tmp_path / "cache"), max_bytes=1 << 30)
+    other = DependencyCache(str(tmp_path / "cache"), max_bytes=0)
+    project = make_project(tmp_path / "project")
+    (project / "requirements.txt").write_text("requests==2.0.0\n")
+    key = running.lockfile_key(str(project), "python")
+
+    async def scenario():
+        async with running.virtualenv(key, str(project)) as venv:
+            await other.evict()
+            kept = venv.is_dir()
+        await other.evict()
+        return kept, venv.exists()
+
+    kept, exists_after = asyncio.run(scenario())
+    assert kept
+    assert not exists_after
+
+
+def test_metadata_is_replaced_atomically(tmp_path):
+    """Test touching an entry swaps in a complete meta.json and leaves no staging files"""
+    cache = DependencyCache(str(tmp_path / "cache"), max_bytes=1 << 30)
+    entry = tmp_path / "cache" / "npm-key"
+    entry.mkdir(parents=True)
+    cache._write_meta(entry, {"size": 1, "last_used": 0})
+    before = os.stat(entry / META_FILE).st_ino
+
+    assert cache._touch(entry)["last_used"] > 0
+    assert os.stat(entry / META_FILE).st_ino != before
+    assert sorted(os.listdir(entry)) == [META_FILE]
+    assert cache._touch(tmp_path / "cache" / "missing") is None
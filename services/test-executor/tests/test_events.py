@@ -0,0 +1,106 @@
+"""
+Test live event streaming for test runs
+"""
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routers import test_execution
+from app.services.events import RunEventBus
+from app.services.test_runner import JestRunner, PytestRunner
+
+client = TestClient(app)
+
+
+class StreamingFakeRunner:
+    async def run_tests(self, on_event=None, **kwargs):
+        on_event({"type": "phase", "phase": "test", "progress": 30})
+        on_event({"type": "test", "name": "tests/test_a.py::test_ok", "status": "passed"})
+        on_event({"type": "progress", "progress": 60})
+        return {"success": True, "total_tests": 1, "passed": 1, "failed": 0, "skipped": 0}
+
+
+def submit(monkeypatch, test_run_id):
+    monkeypatch.setattr(test_execution, "get_test_runner", lambda framework: StreamingFakeRunner())
+    response = client.post(
+        "/api/v1/tests/execute",
+        json={
+            "project_id": "test-project",
+            "test_run_id": test_run_id,
+            "framework": "pytest",
+            "repository_url": "https://github.com/test/repo.git"
+        }
+    )
+    assert response.status_code == 200
+
+
+def test_sse_stream_replays_run_events(monkeypatch):
+    """Test the SSE endpoint delivers test events and terminates"""
+    submit(monkeypatch, "stream-run-1")
+    response = client.get("/api/v1/tests/stream-run-1/events")
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = [json.loads(line[len("data: "):]) for line in response.text.splitlines() if line.startswith("data: ")]
+    assert [e["type"] for e in events] == ["phase", "test", "progress", "end"]
+    assert events[1]["name"] == "tests/test_a.py::test_ok"
+    assert events[-1]["status"] == "completed"
+
+
+def test_websocket_stream(monkeypatch):
+    """Test the WebSocket endpoint delivers the same events"""
+    submit(monkeypatch, "stream-run-2")
+    with client.websocket_connect("/api/v1/tests/stream-run-2/ws") as websocket:
+        events = []
+        while not events or events[-1]["type"] != "end":
+            events.append(websocket.receive_json())
+    assert events[1]["status"] == "passed"
+
+
+def test_stream_unknown_run():
+    """Test streaming an unknown run returns 404"""
+    assert client.get("/api/v1/tests/missing-run/events").status_code == 404
+
+
+def test_output_line_parsing():
+    """Test per-test and progress events are extracted from runner output"""
+    pytest_events = PytestRunner()._parse_output_line("tests/test_a.py::test_x FAILED      [ 50%]")
+    assert pytest_events == [
+        {"type": "test", "name": "tests/test_a.py::test_x", "status": "failed"},
+        {"type": "progress", "progress": 62},
+    ]
+
+    jest = JestRunner()
+    assert jest._parse_output_line("FAIL src/sum.test.js (1.2 s)") == [
+        {"type": "suite", "name": "src/sum.test.js", "status": "failed"}
+    ]
+    assert jest._parse_output_line("    ✓ adds numbers (3 ms)") == [
+        {"type": "test", "name": "adds numbers", "status": "passed", "duration": 0.003}
+    ]
+
+
+def test_remote_run_channels_are_dropped():
+    """Test subscribing to a run that executes elsewhere leaves no channel behind"""
+    bus = RunEventBus(max_runs=2)
+
+    async def watch(run_id):
+        async for event in bus.subscribe(run_id, heartbeat=0.01):
+            assert event is None
+            return
+
+    asyncio.run(watch("celery-run"))
+    assert not bus.has_run("celery-run")
+
+
+def test_eviction_skips_open_channels():
+    """Test a long-running stream does not block eviction of finished ones"""
+    bus = RunEventBus(max_runs=2)
+    bus.publish("running", {"type": "output", "line": "still going"})
+    for i in range(5):
+        bus.close(f"done-{i}", status="completed")
+
+    assert bus.has_run("running")
+    assert bus.has_run("done-4")
+    assert not bus.has_run("done-0")
+    assert len(bus._channels) == 2
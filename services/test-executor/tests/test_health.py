@@ -16,3 +16,10 @@ def test_health_check():
     assert "timestamp" in data
     assert "service" in data
     assert data["service"] == "test-executor"
+
+
+def test_health_reports_toolchain_readiness():
+    """Test health check includes scanner toolchain readiness"""
+    response = client.get("/health")
+    toolchain = response.json()["toolchain"]
+    assert set(toolchain) == {"ready", "state", "tools"}
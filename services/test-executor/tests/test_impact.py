@@ -0,0 +1,118 @@
+"""
+Test change-based test impact analysis
+"""
+import asyncio
+import os
+
+from app.services.impact import ImpactMapStore, ImportGraph, changed_files, requires_full_suite
+from app.services.result_store import InMemoryResultStore
+from app.services.test_runner import PytestRunner
+from tests.conftest import commit_files, git
+
+PROJECT = {
+    "src/calc/__init__.py": "",
+    "src/calc/ops.py": "def add(a, b):\n    return a + b\n",
+    "src/calc/api.py": "from .ops import add\n\ndef total(xs):\n    return sum(xs)\n",
+    "src/report.py": "import json\n",
+    "tests/test_api.py": "from calc.api import total\n",
+    "tests/test_ops.py": "from calc import ops\n",
+    "tests/test_report.py": "import report\n",
+}
+
+
+def write_project(root, files):
+    for name, content in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+
+
+def test_import_graph_selects_transitive_importers(tmp_path):
+    """Test a change reaches tests through direct, relative and package imports"""
+    write_project(tmp_path, PROJECT)
+    graph = ImportGraph.build(str(tmp_path))
+
+    assert graph.affected_tests(["src/calc/ops.py"]) == {"tests/test_api.py", "tests/test_ops.py"}
+    assert graph.affected_tests(["src/report.py"]) == {"tests/test_report.py"}
+    assert graph.affected_tests(["tests/test_ops.py"]) == {"tests/test_ops.py"}
+    assert graph.affected_tests(["src/unused.py"]) == set()
+
+
+def test_full_suite_triggers():
+    """Test shared configuration and unmapped files force the full suite"""
+    assert requires_full_suite("pytest", ["tests/conftest.py"])
+    assert requires_full_suite("pytest", ["requirements-test.txt"])
+    assert requires_full_suite("pytest", ["data/fixture.json"])
+    assert requires_full_suite("pytest", ["src/app.py", "README.md"]) is None
+    assert requires_full_suite("jest", ["jest.config.js"])
+    assert requires_full_suite("jest", ["src/app.js", "styles/app.css"]) is None
+
+
+def test_impact_map_refreshes_incrementally_and_detects_stale_maps(git_repo, monkeypatch):
+    """Test the stored map follows new commits and is unusable for unknown commits"""
+    maps = ImpactMapStore(InMemoryResultStore("impact", max_entries=10, ttl=None))
+    first = commit_files(git_repo, PROJECT)
+    asyncio.run(maps.update("repo", str(git_repo), first))
+
+    second = commit_files(git_repo, {"tests/test_report.py": "import json\n"})
+    calls = []
+    original_refresh = ImportGraph.refresh
+
+    def refresh(self, root, paths):
+        calls.append(list(paths))
+        original_refresh(self, root, paths)
+
+    monkeypatch.setattr(ImportGraph, "refresh", refresh)
+    graph = asyncio.run(maps.current("repo", str(git_repo), second))
+
+    assert calls == [["tests/test_report.py"]]
+    assert graph.affected_tests(["src/report.py"]) == set()
+    assert asyncio.run(changed_files(str(git_repo), first, second)) == ["tests/test_report.py"]
+
+    maps.store["pytest:repo"] = {"commit": "0" * 40, "imports": {}}
+    assert asyncio.run(maps.current("repo", str(git_repo), second)) is None
+
+
+def test_pytest_runner_selects_impacted_tests(git_repo, monkeypatch):
+    """Test a pytest run diffs against the base and selects only affected test files"""
+    maps = ImpactMapStore(InMemoryResultStore("impact", max_entries=10, ttl=None))
+    monkeypatch.setattr("app.services.test_runner.impact_maps", maps)
+    runner = PytestRunner()
+    base = commit_files(git_repo, PROJECT)
+
+    # Without a recorded map the full suite runs
+    selection, info = asyncio.run(runner._select_impacted("repo", str(git_repo), {}, base, f"{base}~1"))
+    assert selection is None
+    assert info["mode"] == "full"
+
+    asyncio.run(runner._record_run("repo", str(git_repo), base))
+    head = commit_files(git_repo, {"src/calc/api.py": "from .ops import add\n\ndef total(xs):\n    return 0\n"})
+    selection, info = asyncio.run(runner._select_impacted("repo", str(git_repo), {}, head, None))
+    assert selection == ["tests/test_api.py"]
+    assert info == {
+        "mode": "impacted", "commit": head, "base_commit": f"{head}~1",
+        "changed_files": 1, "selected_tests": 1,
+    }
+
+    head = commit_files(git_repo, {"tests/conftest.py": "\n"})
+    selection, info = asyncio.run(runner._select_impacted("repo", str(git_repo), {}, head, base))
+    assert selection is None
+    assert "conftest.py" in info["reason"]
+
+
+def test_deleted_module_runs_the_full_suite(git_repo, monkeypatch):
+    """Test deleting a module falls back to the full suite instead of selecting no tests"""
+    maps = ImpactMapStore(InMemoryResultStore("impact", max_entries=10, ttl=None))
+    monkeypatch.setattr("app.services.test_runner.impact_maps", maps)
+    runner = PytestRunner()
+    base = commit_files(git_repo, PROJECT)
+    asyncio.run(runner._record_run("repo", str(git_repo), base))
+
+    os.remove(git_repo / "src/report.py")
+    git(git_repo, "commit", "-q", "-am", "delete report")
+    head = git(git_repo, "rev-parse", "HEAD")
+    selection, info = asyncio.run(runner._select_impacted("repo", str(git_repo), {}, head, base))
+
+    assert selection is None
+    assert info["mode"] == "full"
+    assert info["reason"] == "files were deleted"
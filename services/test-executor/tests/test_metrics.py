@@ -0,0 +1,66 @@
+"""
+Test Prometheus metrics
+"""
+import asyncio
+import subprocess
+
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app.main import app
+from app.services.metrics import record_test_run, run_phase
+from app.services.process import run_process
+from app.services.security_scanner import SASTScanner
+
+client = TestClient(app)
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_metrics_endpoint_exposes_gauges():
+    """Test /metrics serves the scrape-time gauges in Prometheus text format"""
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "tsuite_queue_depth 0.0" in response.text
+    assert 'tsuite_result_store_records{namespace="test_runs"}' in response.text
+
+
+def test_phases_and_outcomes_are_recorded():
+    """Test phase timers and outcome counters, labeled by framework"""
+    before = sample("tsuite_test_phase_seconds_count", framework="metrics-fw", phase="clone")
+    with pytest.raises(RuntimeError):
+        with run_phase("metrics-fw", "clone"):
+            raise RuntimeError("clone failed")
+    assert sample("tsuite_test_phase_seconds_count", framework="metrics-fw", phase="clone") == before + 1
+
+    record_test_run("metrics-fw", {"results": {"success": False, "timed_out": True}})
+    record_test_run("metrics-fw", {"cached": True, "results": {"success": True}})
+    record_test_run("metrics-fw", {"results": {"success": False}})
+    for outcome in ["timeout", "cached", "failed"]:
+        assert sample("tsuite_test_runs_total", framework="metrics-fw", outcome=outcome) == 1
+
+
+def test_command_timeouts_are_counted():
+    """Test killed child processes are counted by command"""
+    before = sample("tsuite_command_timeouts_total", command="sleep")
+    with pytest.raises(subprocess.TimeoutExpired):
+        asyncio.run(run_process(["sleep", "5"], timeout=0.1))
+    assert sample("tsuite_command_timeouts_total", command="sleep") == before + 1
+
+
+def test_failed_scans_are_counted(monkeypatch, tmp_path):
+    """Test scanner failures are timed and counted per scanner type"""
+    async def crash(self, project_dir, repository_url=None, baseline_commit=None):
+        raise Exception("semgrep crashed")
+
+    monkeypatch.setattr(SASTScanner, "scan_path", crash)
+    before = sample("tsuite_scans_total", scanner="sast", outcome="failed")
+    results = asyncio.run(SASTScanner().scan_checkout(str(tmp_path)))
+
+    assert results["error"] == "semgrep crashed"
+    assert sample("tsuite_scans_total", scanner="sast", outcome="failed") == before + 1
+    assert sample("tsuite_active_scans", scanner="sast") == 0
@@ -0,0 +1,114 @@
+"""
+Test the pre-warmed workspace and interpreter pools
+"""
+import asyncio
+import os
+import subprocess
+import sys
+
+from prometheus_client import REGISTRY
+
+from app.services.dependency_cache import virtualenv_environment
+from app.services.interpreter_pool import InterpreterPool
+from app.services.scheduler import execution_scheduler
+from app.services.workspace_pool import WorkspacePool
+
+
+def checkouts(pool, result):
+    return REGISTRY.get_sample_value("tsuite_pool_checkouts_total", {"pool": pool, "result": result}) or 0
+
+
+def test_workspaces_are_handed_out_and_refilled(tmp_path, monkeypatch):
+    """Test runs get ready workspaces and the pool refills to match the queue"""
+    pool = WorkspacePool(str(tmp_path / "workspaces"), min_idle=2, max_idle=4)
+
+    async def scenario():
+        first = await pool.acquire("tsuite_test_")
+        await asyncio.gather(*pool._tasks)
+        idle_after_miss = pool.stats()["idle"]["tsuite_test_"]
+
+        monkeypatch.setattr(execution_scheduler, "stats", lambda: {"queued": 10, "running": 0, "max_concurrent": 1})
+        second = await pool.acquire("tsuite_test_")
+        await asyncio.gather(*pool._tasks)
+        return first, second, idle_after_miss
+
+    hits = checkouts("workspace", "hit")
+    first, second, idle_after_miss = asyncio.run(scenario())
+
+    assert os.path.basename(first).startswith("tsuite_test_")
+    assert os.path.dirname(first) == str(tmp_path / "workspaces")
+    assert idle_after_miss == 2
+    # A queue of 10 asks for more spares, capped at max_idle
+    assert pool.stats()["idle"]["tsuite_test_"] == 4
+    assert checkouts("workspace", "hit") == hits + 1
+
+    pool.release(second)
+    assert not os.path.exists(second)
+    pool.close()
+    remaining = [name for name in os.listdir(tmp_path / "workspaces") if not name.startswith(".")]
+    assert remaining == [first.rsplit("/", 1)[1]]
+
+
+def test_forked_processes_do_not_share_idle_workspaces(tmp_path):
+    """Test workspaces pre-created before a fork are never handed out by the forked children"""
+    pool = WorkspacePool(str(tmp_path / "workspaces"), min_idle=2, max_idle=2)
+    pool.warm(["tsuite_test_"])
+    inherited = {path for paths in pool._idle.values() for path in paths}
+
+    children = []
+    for _ in range(2):
+        read_end, write_end = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_end)
+            path = asyncio.run(pool.acquire("tsuite_test_"))
+            os.write(write_end, path.encode())
+            os._exit(0)
+        os.close(write_end)
+        children.append((pid, read_end))
+
+    acquired = []
+    for pid, read_end in children:
+        with os.fdopen(read_end) as f:
+            acquired.append(f.read())
+        os.waitpid(pid, 0)
+
+    assert len(set(acquired)) == 2
+    assert not inherited.intersection(acquired)
+    for (pid, _), path in zip(children, acquired):
+        assert f"-{pid}_" in os.path.basename(path)
+    pool.close()
+
+
+def test_pytest_runs_in_prestarted_interpreter(tmp_path):
+    """Test a waiting interpreter runs pytest with the run's directory and environment"""
+    venv = tmp_path / "venv"
+    subprocess.run([sys.executable, "-m", "venv", "--without-pip", "--system-site-packages", str(venv)], check=True)
+    project = tmp_path / "project"
+    project.mkdir()
+    (project / "test_env.py").write_text(
+        "import os\n\ndef test_env():\n    assert os.environ['TSUITE_MARK'] == 'warm'\n"
+    )
+    env = {**os.environ, **virtualenv_environment(venv), "TSUITE_MARK": "warm"}
+    args = ["pytest", "-q", "-p", "no:cacheprovider"]
+    pool = InterpreterPool(enabled=True, max_idle=2, idle_ttl=60)
+
+    async def scenario():
+        await pool.fill(venv)
+        warm = await pool.run(venv, args, str(project), env, timeout=60)
+        # Start-up variables differ from the waiting interpreter's: falls back to a fresh process
+        cold = await pool.run(venv, args, str(project), {**env, "PYTHONHASHSEED": "7"}, timeout=60)
+        await asyncio.gather(*pool._tasks)
+        idle = pool.idle_count()
+        await pool.close()
+        return warm, cold, idle
+
+    hits, misses = checkouts("interpreter", "hit"), checkouts("interpreter", "miss")
+    warm, cold, idle = asyncio.run(scenario())
+
+    assert warm.returncode == 0, warm.stdout + warm.stderr
+    assert "1 passed" in warm.stdout
+    assert cold.returncode == 0 and "1 passed" in cold.stdout
+    assert checkouts("interpreter", "hit") == hits + 1
+    assert checkouts("interpreter", "miss") == misses + 1
+    assert idle == 1
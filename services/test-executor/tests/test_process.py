@@ -0,0 +1,52 @@
+"""
+Test async process execution
+"""
+import asyncio
+import subprocess
+import sys
+import time
+
+import pytest
+
+from app.services.process import run_process
+
+
+def test_run_process_captures_output():
+    """Test stdout, stderr and exit code are captured"""
+    result = asyncio.run(run_process(
+        [sys.executable, "-c", "import sys; print('out'); print('err', file=sys.stderr); sys.exit(3)"]
+    ))
+    assert result.returncode == 3
+    assert result.stdout.strip() == "out"
+    assert result.stderr.strip() == "err"
+
+
+def test_run_process_timeout():
+    """Test timed out commands raise TimeoutExpired"""
+    with pytest.raises(subprocess.TimeoutExpired):
+        asyncio.run(run_process([sys.executable, "-c", "import time; time.sleep(10)"], timeout=0.5))
+
+
+def test_run_process_does_not_block_event_loop():
+    """Test concurrent commands overlap instead of running serially"""
+    async def run_many():
+        cmd = [sys.executable, "-c", "import time; time.sleep(0.5)"]
+        return await asyncio.gather(*(run_process(cmd) for _ in range(4)))
+
+    started = time.monotonic()
+    results = asyncio.run(run_many())
+    assert all(r.returncode == 0 for r in results)
+    assert time.monotonic() - started < 1.5
+
+
+def test_run_process_streams_lines():
+    """Test lines are delivered to on_output as they are written"""
+    lines = []
+    script = "import sys, time\nfor i in range(3):\n    print(i, flush=True)\n    time.sleep(0.05)\nprint('x' * 200000, end='')"
+    result = asyncio.run(run_process(
+        [sys.executable, "-c", script],
+        on_output=lambda stream, line: lines.append((stream, line))
+    ))
+    assert lines[:3] == [("stdout", "0"), ("stdout", "1"), ("stdout", "2")]
+    assert lines[3] == ("stdout", "x" * 200000)
+    assert result.stdout.startswith("0\n1\n2\n")
@@ -0,0 +1,68 @@
+"""
+Test the bare-mirror repository cache
+"""
+import asyncio
+
+import pytest
+
+from app.services.repo_cache import RepositoryCache
+from tests.conftest import commit_files
+
+
+def test_checkout_reuses_mirror_and_fetches_new_commits(git_repo, tmp_path):
+    """Test a second checkout sees new commits through the same mirror"""
+    cache = RepositoryCache(str(tmp_path / "cache"))
+    url = git_repo.as_uri()
+
+    first = tmp_path / "run1"
+    asyncio.run(cache.checkout(url, "main", str(first)))
+    assert (first / "README.md").read_text() == "fixture\n"
+    mirror = cache.mirror_path(url)
+    assert mirror.is_dir()
+
+    commit_files(git_repo, {"src/app.py": "print('hi')\n"})
+    second = tmp_path / "run2"
+    asyncio.run(cache.checkout(url, "main", str(second)))
+    assert (second / "src" / "app.py").exists()
+    assert list((tmp_path / "cache").iterdir()) == [mirror]
+
+
+def test_checkout_unknown_branch_fails(git_repo, tmp_path):
+    """Test checking out a missing branch raises a clone error"""
+    cache = RepositoryCache(str(tmp_path / "cache"))
+    with pytest.raises(Exception, match="Git clone failed"):
+        asyncio.run(cache.checkout(git_repo.as_uri(), "missing", str(tmp_path / "run")))
+
+
+def test_checkout_specific_commit(git_repo, tmp_path):
+    """Test a checkout can be pinned to an earlier commit of the branch"""
+    cache = RepositoryCache(str(tmp_path / "cache"), fetch_interval=3600)
+    url = git_repo.as_uri()
+    first = commit_files(git_repo, {"src/app.py": "v1\n"})
+    asyncio.run(cache.checkout(url, "main", str(tmp_path / "run1")))
+
+    # Pushed after the last fetch: the mirror is refreshed despite the interval
+    second = commit_files(git_repo, {"src/app.py": "v2\n"})
+    commit_files(git_repo, {"src/app.py": "v3\n"})
+    asyncio.run(cache.checkout(url, "main", str(tmp_path / "run2"), commit=second))
+    assert (tmp_path / "run2" / "src" / "app.py").read_text() == "v2\n"
+
+    asyncio.run(cache.checkout(url, "main", str(tmp_path / "run3"), commit=first))
+    assert (tmp_path / "run3" / "src" / "app.py").read_text() == "v1\n"
+
+
+def test_concurrent_mirror_creation_across_processes(git_repo, tmp_path):
+    """Test caches that share a directory but not locks (worker processes) can create one mirror at once"""
+    caches = [RepositoryCache(str(tmp_path / "cache")) for _ in range(3)]
+    url = git_repo.as_uri()
+
+    async def scenario():
+        return await asyncio.gather(*(cache.update(url) for cache in caches))
+
+    mirrors = asyncio.run(scenario())
+    assert len(set(mirrors)) == 1
+    assert list((tmp_path / "cache").iterdir()) == [mirrors[0]]
+
+    run = tmp_path / "run"
+    asyncio.run(caches[1].checkout(url, "main", str(run)))
+    assert (run / "README.md").read_text() == "fixture\n"
@@ -0,0 +1,132 @@
+"""
+Test per-command resource limits and per-phase usage accounting
+"""
+import asyncio
+import os
+import resource
+import subprocess
+import sys
+import threading
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app.services import process, resources
+from app.services.metrics import run_phase
+from app.services.process import run_process
+from app.services.resources import ProcessAccount, ResourceAccounting, accounted_run, usage_report
+
+# Allocates and touches 96 MiB, then burns CPU for half a second
+WORKLOAD = (
+    "import time\n"
+    "block = bytearray(96 * 2 ** 20)\n"
+    "started = time.process_time()\n"
+    "while time.process_time() - started < 0.5:\n"
+    "    pass\n"
+)
+
+
+def rlimit_accounting(memory_limit_mb=0):
+    """Accounting without cgroups, as on hosts with no delegated cgroup v2 tree"""
+    return ResourceAccounting(
+        None, memory_limit_mb=memory_limit_mb, cpu_limit=0, max_processes=0, cpu_time_limit=0, sample_interval=0.2
+    )
+
+
+def test_phase_usage_reaches_result_and_metrics(monkeypatch):
+    """Test CPU time and peak memory of a phase's commands are reported per phase and exported"""
+    monkeypatch.setattr(process, "resource_accounting", rlimit_accounting())
+    labels = {"framework": "resources", "phase": "run"}
+    observed = REGISTRY.get_sample_value("tsuite_test_phase_cpu_seconds_count", labels) or 0
+
+    async def scenario():
+        with accounted_run() as resources:
+            with run_phase("resources", "run"):
+                result = await run_process([sys.executable, "-c", WORKLOAD])
+            with run_phase("resources", "parse"):
+                pass
+        return result, usage_report(resources)
+
+    result, report = asyncio.run(scenario())
+
+    assert result.returncode == 0, result.stderr
+    assert list(report) == ["run"]
+    assert report["run"]["processes"] == 1
+    assert report["run"]["cpu_seconds"] >= 0.3
+    assert report["run"]["peak_rss_bytes"] >= 64 * 2 ** 20
+    assert result.resources.cpu_seconds == report["run"]["cpu_seconds"]
+    assert REGISTRY.get_sample_value("tsuite_test_phase_cpu_seconds_count", labels) == observed + 1
+    assert REGISTRY.get_sample_value(
+        "tsuite_test_phase_io_bytes_count", {**labels, "direction": "write"}
+    ) is not None
+
+
+def test_proc_sampling_stays_off_the_event_loop(monkeypatch):
+    """Test /proc walks for rlimit-mode accounting run in worker threads, not on the loop"""
+    monkeypatch.setattr(process, "resource_accounting", rlimit_accounting())
+    threads = []
+    session_usage = resources._session_usage
+
+    def recording(session):
+        threads.append(threading.current_thread())
+        return session_usage(session)
+
+    monkeypatch.setattr(resources, "_session_usage", recording)
+    result = asyncio.run(run_process([sys.executable, "-c", "import time; time.sleep(0.3)"]))
+
+    assert result.returncode == 0
+    assert len(threads) >= 2
+    assert threading.main_thread() not in threads
+
+
+def test_memory_limit_without_cgroups(monkeypatch):
+    """Test commands cannot allocate past the memory limit when only rlimits are available"""
+    monkeypatch.setattr(process, "resource_accounting", rlimit_accounting(memory_limit_mb=64))
+
+    result = asyncio.run(run_process([sys.executable, "-c", WORKLOAD]))
+
+    assert result.returncode != 0
+    assert "MemoryError" in result.stderr
+
+
+def test_limits_are_applied_by_an_exec_trampoline(tmp_path):
+    """Test the command joins its cgroup and gets its rlimits without Python running before exec"""
+    cgroup = tmp_path / "cmd"
+    cgroup.mkdir()
+    (cgroup / "cgroup.procs").write_text("")
+    account = ProcessAccount(cgroup, [(resource.RLIMIT_CPU, 30)], sample_interval=0)
+    probe = "import os, resource; print(os.getpid(), resource.getrlimit(resource.RLIMIT_CPU)[0])"
+
+    result = subprocess.run(account.command([sys.executable, "-c", probe]), capture_output=True, text=True)
+
+    pid, cpu_limit = result.stdout.split()
+    # The shell execs the command in its place, so the PID it wrote is the command's
+    assert (cgroup / "cgroup.procs").read_text().strip() == pid
+    assert cpu_limit == "30"
+    assert ProcessAccount(None, [], sample_interval=0).command(["true"]) == ["true"]
+
+
+def test_missing_command_still_raises_when_limited(monkeypatch):
+    """Test a command that does not exist fails to spawn instead of running the trampoline"""
+    monkeypatch.setattr(process, "resource_accounting", rlimit_accounting(memory_limit_mb=64))
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(run_process(["tsuite-no-such-command"], env={"PATH": os.defpath}))
+
+
+def test_cgroup_usage_is_read_from_controller_files(tmp_path):
+    """Test a command's cgroup counters become its usage, net of what it used before the run began"""
+    (tmp_path / "cpu.stat").write_text("usage_usec 1500000\nuser_usec 1000000\nsystem_usec 500000\n")
+    (tmp_path / "memory.peak").write_text(str(300 * 2 ** 20))
+    (tmp_path / "io.stat").write_text("8:0 rbytes=4096 wbytes=1024 rios=1 wios=1\n8:16 rbytes=4096 wbytes=0\n")
+    account = ProcessAccount(tmp_path, [], sample_interval=0)
+    account.pid = 1
+
+    asyncio.run(account.begin())
+    (tmp_path / "cpu.stat").write_text("usage_usec 4000000\n")
+    (tmp_path / "io.stat").write_text("8:0 rbytes=12288 wbytes=5120\n8:16 rbytes=4096 wbytes=0\n")
+    account.sample()
+    usage = account.usage()
+
+    assert usage.cpu_seconds == 2.5
+    assert usage.peak_rss_bytes == 300 * 2 ** 20
+    assert (usage.read_bytes, usage.write_bytes) == (8192, 4096)
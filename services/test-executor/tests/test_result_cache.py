@@ -0,0 +1,80 @@
+"""
+Test memoization of test run results
+"""
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routers import test_execution
+from app.services.repo_cache import RepositoryCache
+from app.services.result_cache import RunResultCache, run_key
+from app.services.result_store import InMemoryResultStore
+from tests.conftest import commit_files
+
+client = TestClient(app)
+
+
+def test_run_key_covers_run_identity():
+    """Test keys change with the environment but not its ordering"""
+    key = run_key("repo", "a" * 40, "pytest", None, {"A": "1", "B": "2"})
+
+    assert key == run_key("repo", "a" * 40, "PyTest", None, {"B": "2", "A": "1"})
+    assert key != run_key("repo", "a" * 40, "pytest", None, {"A": "1", "B": "3"})
+    assert key != run_key("repo", "b" * 40, "pytest", None, {"A": "1", "B": "2"})
+    assert key != run_key("repo", "a" * 40, "pytest", "pytest -x", {"A": "1", "B": "2"})
+
+
+def test_only_successful_runs_are_memoized():
+    """Test failures are never served from the cache"""
+    cache = RunResultCache(InMemoryResultStore("runs", max_entries=10, ttl=None))
+
+    assert not cache.put("failed", "run-1", {"success": False})
+    assert not cache.put("errored", "run-2", {"success": True, "error": "timed out"})
+    assert cache.put("passed", "run-3", {"success": True})
+    assert cache.get("failed") is None
+    assert cache.get("passed")["test_run_id"] == "run-3"
+
+
+class CountingRunner:
+    def __init__(self):
+        self.commits = []
+
+    async def run_tests(self, commit=None, **kwargs):
+        self.commits.append(commit)
+        return {"success": True, "total_tests": 1, "passed": 1, "failed": 0, "skipped": 0}
+
+
+def test_repeated_run_on_same_commit_is_served_from_cache(monkeypatch, git_repo, tmp_path):
+    """Test a second run on the same SHA is answered without running, unless bypassed"""
+    runner = CountingRunner()
+    monkeypatch.setattr(test_execution, "get_test_runner", lambda framework: runner)
+    monkeypatch.setattr(test_execution, "repository_cache", RepositoryCache(str(tmp_path / "cache")))
+    monkeypatch.setattr(
+        test_execution, "run_result_cache", RunResultCache(InMemoryResultStore("runs", max_entries=10, ttl=None))
+    )
+    head = commit_files(git_repo, {"src/app.py": "print('v1')\n"})
+
+    def execute(test_run_id, **fields):
+        response = client.post("/api/v1/tests/execute", json={
+            "project_id": "test-project",
+            "test_run_id": test_run_id,
+            "framework": "pytest",
+            "repository_url": git_repo.as_uri(),
+            **fields
+        })
+        assert response.status_code == 200
+        return client.get(f"/api/v1/tests/{test_run_id}/status").json()
+
+    first = execute("memo-run-1")
+    second = execute("memo-run-2", commit=head)
+    bypassed = execute("memo-run-3", bypass_cache=True)
+    other_env = execute("memo-run-4", environment_vars={"DEBUG": "1"})
+
+    # The first run is pinned to the SHA the branch resolved to
+    assert runner.commits == [head, head, head]
+    assert first["status"] == "completed"
+    assert second["status"] == "completed"
+    assert second["cached"] is True
+    assert second["cached_from"] == "memo-run-1"
+    assert second["results"]["passed"] == 1
+    assert "cached" not in bypassed
+    assert "cached" not in other_env
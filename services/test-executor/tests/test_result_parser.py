@@ -0,0 +1,88 @@
+"""
+Test streaming report parsers
+"""
+import io
+import json
+
+from app.services.result_parser import JsonStreamReader, parse_jest_report
+from app.services.test_runner import JestRunner
+
+
+def jest_report(suites=3, tests_per_suite=4):
+    results = []
+    for s in range(suites):
+        results.append({
+            "name": f"/repo/src/suite{s}.test.js",
+            "perfStats": {"start": 1000 + s * 100, "end": 1500 + s * 100, "runtime": 500},
+            "assertionResults": [
+                {
+                    "fullName": f"suite{s} test{t}",
+                    "status": "failed" if t == 0 else "passed",
+                    "duration": 7,
+                    "failureMessages": ["Error: expected 1 to be 2\n    at stack"] if t == 0 else []
+                }
+                for t in range(tests_per_suite)
+            ],
+        })
+    return {
+        "numFailedTests": suites,
+        "numPassedTests": suites * (tests_per_suite - 1),
+        "numPendingTests": 0,
+        "numTotalTests": suites * tests_per_suite,
+        "testResults": results,
+        "coverageMap": {"/repo/src/a.js": {"path": "/repo/src/a.js", "s": {"0": 1}}},
+    }
+
+
+def test_stream_reader_handles_tiny_chunks():
+    """Test values split across many small reads decode correctly"""
+    document = {"a": 12345678, "b": [1, {"c": "x" * 50}, [2.5e10]], "d": None}
+    reader = JsonStreamReader(io.StringIO(json.dumps(document)), chunk_size=3)
+    parsed = {}
+    for key in reader.iter_object():
+        if key == "b":
+            parsed[key] = [reader.read_value() for _ in reader.iter_array()]
+        else:
+            parsed[key] = reader.read_value()
+    assert parsed == document
+
+
+def test_parse_jest_report_compacts_tests():
+    """Test per-test records, counts and coverage are extracted"""
+    records = []
+    report = json.dumps(jest_report())
+    result = parse_jest_report(io.StringIO(report), on_test=records.append)
+
+    assert result["total_tests"] == 12
+    assert result["failed"] == 3
+    assert result["passed"] == 9
+    assert len(result["test_results"]) == 12 == len(records)
+    assert records[0] == {
+        "suite": "/repo/src/suite0.test.js",
+        "name": "suite0 test0",
+        "status": "failed",
+        "duration": 0.007,
+        "failure": "Error: expected 1 to be 2\n    at stack",
+    }
+    assert "/repo/src/a.js" in result["coverage"]
+
+
+def test_parse_jest_report_duration_spans_all_suites():
+    """Test duration covers every suite, not just the first"""
+    result = parse_jest_report(io.StringIO(json.dumps(jest_report(suites=3))))
+    # suites run 1000-1500, 1100-1600, 1200-1700 ms
+    assert result["duration"] == 0.7
+
+
+def test_jest_runner_prefers_report_file(tmp_path):
+    """Test the runner parses the report file written via --outputFile"""
+    report = tmp_path / "report.json"
+    report.write_text(json.dumps(jest_report(suites=2, tests_per_suite=2)))
+    result = JestRunner()._parse_jest_output("", "", str(report))
+    assert result["total_tests"] == 4
+
+
+def test_jest_runner_text_fallback():
+    """Test the summary line is parsed when no JSON is available"""
+    result = JestRunner()._parse_jest_output("", "Tests:       1 failed, 4 passed, 5 total\n")
+    assert (result["total_tests"], result["passed"], result["failed"]) == (5, 4, 1)
@@ -0,0 +1,121 @@
+"""
+Test result store implementations
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+import redis
+
+from app.services.result_store import InMemoryResultStore, RedisResultStore
+
+
+def test_in_memory_store_evicts_least_recently_used():
+    """Test the oldest untouched record is evicted past max_entries"""
+    store = InMemoryResultStore("test", max_entries=2, ttl=None)
+    store["a"] = {"status": "completed"}
+    store["b"] = {"status": "completed"}
+    assert store["a"]["status"] == "completed"  # touch a
+    store["c"] = {"status": "queued"}
+
+    assert "a" in store
+    assert "b" not in store
+    assert len(store) == 2
+
+
+def test_in_memory_store_never_evicts_active_records():
+    """Test records of queued or running jobs survive LRU eviction"""
+    store = InMemoryResultStore("test", max_entries=2, ttl=None)
+    store["queued"] = {"status": "queued"}
+    store["running"] = {"status": "running"}
+    store["done"] = {"status": "completed"}
+    store["new"] = {"status": "queued"}
+
+    assert "queued" in store
+    assert "running" in store
+    assert "done" not in store
+    assert len(store) == 3
+
+    store["running"] = {"status": "completed"}
+    store["newer"] = {"status": "completed"}
+    assert "running" not in store
+    assert "newer" in store
+    assert len(store) == 3
+
+
+def test_blocking_store_calls_leave_the_event_loop():
+    """Test async accessors of a blocking store run its I/O in a worker thread"""
+    loop_thread = threading.get_ident()
+    seen = []
+
+    class SlowStore(InMemoryResultStore):
+        blocking = True
+
+        def _load(self, key):
+            seen.append(threading.get_ident())
+            return super()._load(key)
+
+    store = SlowStore("test", max_entries=10, ttl=None)
+
+    async def main():
+        await store.aset("run", {"status": "queued"})
+        return await store.aget("run")
+
+    assert asyncio.run(main()) == {"status": "queued"}
+    assert seen and loop_thread not in seen
+
+
+def test_in_memory_store_expires_records():
+    """Test records disappear after their TTL"""
+    store = InMemoryResultStore("test", max_entries=10, ttl=None)
+    store.set("short", {"status": "completed"}, ttl=0.05)
+    store["long"] = {"status": "completed"}
+    time.sleep(0.1)
+
+    assert store.get("short") is None
+    with pytest.raises(KeyError):
+        store["short"]
+    assert store["long"] == {"status": "completed"}
+
+
+def test_held_claim_is_renewed_until_released():
+    """Test a job's heartbeat keeps its ID claimed past the claim TTL and frees it when the job ends"""
+    store = InMemoryResultStore("claims", max_entries=10, ttl=None)
+
+    async def job():
+        async with store.held_claim("run-1", 0.1):
+            await asyncio.sleep(0.3)
+            return store.claim("run-1", 60)
+
+    assert store.claim("run-1", 0.1)
+    assert asyncio.run(job()) is False
+    assert store.claim("run-1", 60)
+
+
+def test_redis_store_round_trip():
+    """Test records are shared through Redis (requires a local server)"""
+    client = redis.Redis.from_url("redis://localhost:6379/15")
+    try:
+        client.ping()
+    except redis.ConnectionError:
+        pytest.skip("Redis is not available")
+
+    writer = RedisResultStore("test", client, ttl=60)
+    reader = RedisResultStore("test", client, ttl=60)
+    client.delete("tsuite:test:__index__")
+    writer["run-1"] = {"status": "completed", "results": {"passed": 1}}
+    assert reader["run-1"]["results"]["passed"] == 1
+    assert len(reader) == 1
+    assert client.ttl("tsuite:test:run-1") > 0
+    assert list(reader.get_many(["run-1", "run-2"])) == ["run-1"]
+    del writer["run-1"]
+    assert "run-1" not in reader
+    assert len(reader) == 0
+
+    reader.release_claim("run-1")
+    assert writer.claim("run-1", 60)
+    assert not reader.claim("run-1", 60)
+    writer.release_claim("run-1")
+    assert reader.claim("run-1", 60)
+    reader.release_claim("run-1")
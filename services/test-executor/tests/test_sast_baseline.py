@@ -0,0 +1,111 @@
+"""
+Test incremental SAST scanning against stored baselines
+"""
+import asyncio
+import json
+from pathlib import Path
+
+from app.config import settings
+from app.services import security_scanner
+from app.services.process import ProcessResult
+from app.services.result_store import InMemoryResultStore
+from app.services.sast_baseline import SASTBaselineStore, assign_fingerprints, diff_findings, sast_baselines
+from app.services.security_scanner import SASTScanner
+from tests.conftest import commit_files
+
+
+def test_fingerprints_survive_line_shifts():
+    """Test the same match keeps its fingerprint when it moves, and repeats stay distinct"""
+    before = [{"rule_id": "eval", "file": "a.py", "line": 3}]
+    after = [{"rule_id": "eval", "file": "a.py", "line": 9}, {"rule_id": "eval", "file": "a.py", "line": 12}]
+    assign_fingerprints(before, {0: "eval(x)"})
+    assign_fingerprints(after, {0: "  eval(x)", 1: "eval(x)"})
+
+    assert before[0]["fingerprint"] == after[0]["fingerprint"]
+    assert after[0]["fingerprint"] != after[1]["fingerprint"]
+    assert diff_findings(before, after) == {"new": [after[1]], "fixed": []}
+
+
+def test_fingerprints_use_source_when_semgrep_hides_lines(monkeypatch, tmp_path):
+    """Test fingerprints come from the scanned file when semgrep hides the matched lines behind a login"""
+    monkeypatch.setattr(security_scanner.toolchain, "binary", lambda name: name)
+    monkeypatch.setattr(security_scanner.toolchain, "semgrep_config", lambda: "rules.yml")
+
+    def semgrep_output(source):
+        results = []
+        for call in ["eval(a)", "eval(b)", "eval(c)"]:
+            offset = source.find(call)
+            if offset >= 0:
+                results.append({
+                    "check_id": "eval", "path": "app.py",
+                    "start": {"line": source[:offset].count("\n") + 1, "offset": offset},
+                    "end": {"offset": offset + len(call)},
+                    "extra": {"lines": "requires login", "severity": "ERROR", "message": "eval"},
+                })
+        return json.dumps({"results": results})
+
+    async def scan(source):
+        (tmp_path / "app.py").write_text(source)
+
+        async def fake_run(args, **kwargs):
+            return ProcessResult(args=args, returncode=1, stdout=semgrep_output(source), stderr="", duration=0)
+
+        monkeypatch.setattr(security_scanner, "run_process", fake_run)
+        return await SASTScanner()._semgrep_run(str(tmp_path), ["app.py"])
+
+    before = asyncio.run(scan("eval(b)\neval(c)\n"))
+    after = asyncio.run(scan("eval(a)\neval(b)\neval(c)\n"))
+
+    assert [f["line"] for f in after] == [1, 2, 3]
+    diff = diff_findings(before, after)
+    assert [f["line"] for f in diff["new"]] == [1]
+    assert diff["fixed"] == []
+
+
+async def fake_semgrep(self, project_dir, targets=None):
+    """Report every line containing eval( in the targets (default: all Python files)"""
+    root = Path(project_dir)
+    paths = targets or sorted(p.relative_to(root).as_posix() for p in root.rglob("*.py") if ".git" not in p.parts)
+    findings, code = [], {}
+    for path in paths:
+        for number, line in enumerate((root / path).read_text().splitlines(), 1):
+            if "eval(" in line:
+                code[len(findings)] = line
+                findings.append({"rule_id": "eval", "severity": "ERROR", "file": path, "line": number, "source": "semgrep"})
+    assign_fingerprints(findings, code)
+    self.scanned.append(paths)
+    return findings
+
+
+def test_incremental_scan_reports_new_and_fixed(monkeypatch, git_repo):
+    """Test only changed files are rescanned and the rest is carried from the baseline"""
+    monkeypatch.setattr(security_scanner, "sast_baselines", SASTBaselineStore(InMemoryResultStore("b", 10, None)))
+    monkeypatch.setattr(security_scanner.toolchain, "rules_version", lambda: "rules-v1")
+    monkeypatch.setattr(SASTScanner, "_semgrep", fake_semgrep)
+    scanner = SASTScanner()
+    scanner.scanned = []
+    repo = str(git_repo)
+
+    base = commit_files(git_repo, {"a.py": "eval(a)\n", "b.py": "eval(b)\n", "d.py": "x = 1\n"})
+    full = asyncio.run(scanner.scan_path(repo, "repo", baseline_commit="0" * 40))
+    assert full["mode"] == "full"
+    assert full["total_findings"] == 2
+
+    commit_files(git_repo, {"b.py": "b = 1\n", "c.py": "x = 1\neval(c)\n", "d.py": "x = 2\n"})
+    result = asyncio.run(scanner.scan_path(repo, "repo", baseline_commit=base))
+
+    assert scanner.scanned[-1] == ["b.py", "c.py", "d.py"]
+    assert result["mode"] == "incremental"
+    assert result["baseline_commit"] == base
+    assert result["scanned_files"] == 3
+    assert sorted(f["file"] for f in result["findings"]) == ["a.py", "c.py"]
+    assert [f["file"] for f in result["new_findings"]] == ["c.py"]
+    assert [f["file"] for f in result["fixed_findings"]] == ["b.py"]
+    assert result["critical"] == 2
+
+
+def test_baselines_outlive_run_records():
+    """Test baselines keep their own size bound and TTL instead of the run-record defaults"""
+    store = sast_baselines.store
+    assert store.ttl == settings.sast_baseline_ttl > settings.result_store_ttl
+    assert store.max_entries == settings.sast_baseline_max_entries
@@ -0,0 +1,99 @@
+"""
+Test partitioned SAST scans
+"""
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.services import security_scanner
+from app.services.sast_baseline import assign_fingerprints
+from app.services.security_scanner import SASTScanner, _argument_batches
+from tests.conftest import commit_files
+
+
+@pytest.fixture
+def chunked(monkeypatch):
+    monkeypatch.setattr(settings, "sast_parallelism", 3)
+    monkeypatch.setattr(settings, "sast_min_chunk_files", 2)
+
+
+def test_tree_is_scanned_in_balanced_chunks(monkeypatch, git_repo, chunked):
+    """Test every tracked file is scanned once, in size-balanced chunks, with findings merged"""
+    sizes = {"a.py": 900, "b.py": 500, "c.py": 400, "d.py": 300, "e.py": 200, "f.py": 100}
+    commit_files(git_repo, {path: "x" * size for path, size in sizes.items()})
+    chunks = []
+
+    async def fake_semgrep(self, project_dir, targets=None):
+        chunks.append(targets)
+        # Every chunk also reports the same finding, which must only be kept once
+        findings = [{"rule_id": "r", "severity": "ERROR", "file": path, "line": 1} for path in targets]
+        findings.append({"rule_id": "r", "severity": "INFO", "file": "shared.py", "line": 1})
+        assign_fingerprints(findings, {})
+        return findings
+
+    monkeypatch.setattr(SASTScanner, "_semgrep", fake_semgrep)
+    findings, timings = asyncio.run(SASTScanner()._scan_tree(str(git_repo)))
+
+    assert len(chunks) == 3
+    scanned = [path for chunk in chunks for path in chunk]
+    assert sorted(scanned) == ["README.md", *sorted(sizes)]
+    loads = sorted(timing["bytes"] for timing in timings)
+    assert loads == [708, 800, 900]
+    assert [timing["chunk"] for timing in timings] == [0, 1, 2]
+    assert all("duration" in timing for timing in timings)
+    assert [f["file"] for f in findings] == [*sorted(scanned), "shared.py"]
+
+
+def test_failed_chunk_fails_the_scan(monkeypatch, git_repo, chunked):
+    """Test a crashed chunk is never reported as a clean scan"""
+    commit_files(git_repo, {f"m{i}.py": "x" * (i + 1) for i in range(6)})
+
+    async def fake_semgrep(self, project_dir, targets=None):
+        if "m5.py" in targets:
+            raise Exception("semgrep failed: out of memory")
+        await asyncio.sleep(0)
+        return []
+
+    monkeypatch.setattr(SASTScanner, "_semgrep", fake_semgrep)
+    with pytest.raises(Exception, match="out of memory"):
+        asyncio.run(SASTScanner()._scan_tree(str(git_repo)))
+
+
+def test_small_trees_run_in_one_process(monkeypatch, git_repo):
+    """Test trees below the chunk threshold keep a single whole-tree semgrep run"""
+    commit_files(git_repo, {"a.py": "x"})
+    calls = []
+
+    async def fake_semgrep(self, project_dir, targets=None):
+        calls.append(targets)
+        return []
+
+    monkeypatch.setattr(SASTScanner, "_semgrep", fake_semgrep)
+    findings, timings = asyncio.run(SASTScanner()._scan_tree(str(git_repo)))
+
+    assert calls == [None]
+    assert findings == []
+    assert timings[0]["chunk"] == 0
+
+
+def test_long_target_lists_are_split_across_semgrep_runs(monkeypatch):
+    """Test a chunk's target paths never exceed the per-command argument budget"""
+    monkeypatch.setattr(security_scanner, "SEMGREP_ARGUMENT_BUDGET", 200)
+    targets = [f"src/module_{i:04d}.py" for i in range(40)]
+    runs = []
+
+    async def fake_run(self, project_dir, batch):
+        runs.append(batch)
+        return [{"rule_id": "r", "file": path, "line": 1} for path in batch]
+
+    monkeypatch.setattr(SASTScanner, "_semgrep_run", fake_run)
+    findings = asyncio.run(SASTScanner()._semgrep("/work", targets))
+
+    assert len(runs) > 1
+    assert [path for batch in runs for path in batch] == targets
+    assert all(sum(len(path) + 9 for path in batch) <= 200 for batch in runs)
+    assert [f["file"] for f in findings] == targets
+
+    assert _argument_batches(["a" * 500], 200) == [["a" * 500]]
+    assert _argument_batches([], 200) == []
@@ -0,0 +1,67 @@
+"""
+Test the dependency scan result cache
+"""
+import asyncio
+
+from app.config import settings
+from app.services.result_store import InMemoryResultStore
+from app.services.scan_cache import DependencyScanCache, manifest_digest
+from app.services.security_scanner import DependencyScanner
+
+LOCKFILE = '{"name": "app", "lockfileVersion": 3, "packages": {}}'
+
+
+def make_project(path, files):
+    path.mkdir()
+    for name, content in files.items():
+        (path / name).write_text(content)
+    return str(path)
+
+
+def test_manifest_digest_prefers_lockfile(tmp_path):
+    """Test the lockfile identifies npm projects and requirements.txt Python ones"""
+    with_lock = make_project(tmp_path / "a", {"package.json": "{}", "package-lock.json": LOCKFILE})
+    same_lock = make_project(tmp_path / "b", {"package.json": '{"name": "other"}', "package-lock.json": LOCKFILE})
+    no_lock = make_project(tmp_path / "c", {"package.json": "{}"})
+
+    assert manifest_digest(with_lock, "npm") == manifest_digest(same_lock, "npm")
+    assert manifest_digest(no_lock, "npm") != manifest_digest(with_lock, "npm")
+    assert manifest_digest(no_lock, "python") is None
+
+
+def test_audits_are_shared_across_projects_and_advisory_versions(monkeypatch, tmp_path):
+    """Test identical lockfiles reuse one audit until the advisory data changes"""
+    cache = DependencyScanCache(InMemoryResultStore("scans", max_entries=10, ttl=None))
+    monkeypatch.setattr("app.services.security_scanner.dependency_scan_cache", cache)
+    monkeypatch.setattr(settings, "advisory_db_version", "v1")
+    scanner = DependencyScanner()
+    audits = []
+
+    async def audit(project_dir):
+        audits.append(project_dir)
+        return [{"package": "lodash", "severity": "high"}]
+
+    first = make_project(tmp_path / "first", {"package-lock.json": LOCKFILE})
+    second = make_project(tmp_path / "second", {"package-lock.json": LOCKFILE})
+
+    assert asyncio.run(scanner._cached_scan(first, "npm", audit)) == ([{"package": "lodash", "severity": "high"}], False)
+    assert asyncio.run(scanner._cached_scan(second, "npm", audit)) == ([{"package": "lodash", "severity": "high"}], True)
+    assert audits == [first]
+
+    monkeypatch.setattr(settings, "advisory_db_version", "v2")
+    assert asyncio.run(scanner._cached_scan(second, "npm", audit))[1] is False
+    assert audits == [first, second]
+
+
+def test_failed_audits_are_not_cached(monkeypatch, tmp_path):
+    """Test an audit that could not run is retried on the next scan"""
+    cache = DependencyScanCache(InMemoryResultStore("scans", max_entries=10, ttl=None))
+    monkeypatch.setattr("app.services.security_scanner.dependency_scan_cache", cache)
+    scanner = DependencyScanner()
+    project = make_project(tmp_path / "project", {"requirements.txt": "requests==2.0.0\n"})
+
+    async def failing_audit(project_dir):
+        return None
+
+    assert asyncio.run(scanner._cached_scan(project, "python", failing_audit)) == (None, False)
+    assert len(cache.store) == 0
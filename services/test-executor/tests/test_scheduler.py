@@ -0,0 +1,111 @@
+"""
+Test the bounded priority scheduler
+"""
+import asyncio
+
+from app.services.scheduler import JobScheduler
+
+
+def run_jobs(scheduler, jobs, hold=0.01):
+    """Submit (job_id, project_id, priority) jobs while slots are busy and record start order"""
+    started = []
+
+    async def job(job_id, project_id, priority):
+        async with scheduler.slot(job_id, project_id, priority):
+            started.append(job_id)
+            await asyncio.sleep(hold)
+
+    async def main():
+        gate = asyncio.Event()
+
+        async def blocker():
+            async with scheduler.slot("blocker", "other", "normal"):
+                await gate.wait()
+
+        blocking = asyncio.create_task(blocker())
+        await asyncio.sleep(0)
+        tasks = [asyncio.create_task(job(*spec)) for spec in jobs]
+        await asyncio.sleep(0)
+        positions = {job_id: scheduler.queue_position(job_id) for job_id, _, _ in jobs}
+        assert scheduler.queue_positions() == positions
+        gate.set()
+        await asyncio.gather(blocking, *tasks)
+        return positions
+
+    positions = asyncio.run(main())
+    return started, positions
+
+
+def test_concurrency_is_bounded():
+    """Test no more than max_concurrent jobs run at once"""
+    scheduler = JobScheduler(max_concurrent=2)
+    peak = 0
+
+    async def job(i):
+        nonlocal peak
+        async with scheduler.slot(f"job-{i}", "project", "normal"):
+            peak = max(peak, scheduler.stats()["running"])
+            await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(*(job(i) for i in range(10)))
+
+    asyncio.run(main())
+    assert peak == 2
+    assert scheduler.stats() == {"running": 0, "queued": 0, "max_concurrent": 2}
+
+
+def test_higher_priority_runs_first():
+    """Test PR checks overtake queued nightly runs"""
+    scheduler = JobScheduler(max_concurrent=1)
+    started, positions = run_jobs(scheduler, [
+        ("nightly-1", "a", "nightly"),
+        ("nightly-2", "a", "nightly"),
+        ("pr-1", "a", "pr"),
+    ])
+    assert started == ["pr-1", "nightly-1", "nightly-2"]
+    assert positions == {"pr-1": 1, "nightly-1": 2, "nightly-2": 3}
+
+
+def test_projects_are_served_round_robin():
+    """Test a project with many queued jobs does not starve another"""
+    scheduler = JobScheduler(max_concurrent=1)
+    started, _ = run_jobs(scheduler, [
+        ("a-1", "a", "normal"),
+        ("a-2", "a", "normal"),
+        ("a-3", "a", "normal"),
+        ("b-1", "b", "normal"),
+    ])
+    assert started == ["a-1", "b-1", "a-2", "a-3"]
+
+
+def test_duplicate_job_id_is_rejected():
+    """Test a second slot request under a waiting job's ID fails instead of orphaning it"""
+    scheduler = JobScheduler(max_concurrent=1)
+
+    async def main():
+        gate = asyncio.Event()
+
+        async def hold(job_id):
+            async with scheduler.slot(job_id, "project"):
+                await gate.wait()
+
+        running = asyncio.create_task(hold("running"))
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(hold("waiting"))
+        await asyncio.sleep(0)
+
+        for job_id in ["running", "waiting"]:
+            try:
+                async with scheduler.slot(job_id, "project"):
+                    pass
+            except ValueError:
+                pass
+            else:
+                raise AssertionError(f"duplicate {job_id} was accepted")
+
+        gate.set()
+        await asyncio.wait_for(asyncio.gather(running, waiting), timeout=1)
+
+    asyncio.run(main())
+    assert scheduler.stats()["running"] == 0
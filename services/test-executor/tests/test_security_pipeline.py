@@ -0,0 +1,109 @@
+"""
+Test the multi-scanner security pipeline
+"""
+import asyncio
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import security_pipeline
+from app.services.repo_cache import RepositoryCache
+from app.services.security_pipeline import combine_results, run_security_pipeline
+from app.services.security_scanner import DependencyScanner, SASTScanner, normalize_severity
+from tests.conftest import commit_files
+
+client = TestClient(app)
+
+
+def test_normalize_severity():
+    """Test scanner-native severities map onto one scale"""
+    assert normalize_severity("ERROR", "semgrep") == "critical"
+    assert normalize_severity("WARNING", "semgrep") == "high"
+    assert normalize_severity("moderate", "npm") == "medium"
+    assert normalize_severity("info", "npm") == "low"
+    assert normalize_severity("HIGH", "safety") == "high"
+    assert normalize_severity(None) == "medium"
+
+
+def test_combine_results_normalizes_and_counts():
+    """Test findings of all scanners are merged, tagged and counted"""
+    report = combine_results({
+        "dependency": {
+            "success": True,
+            "total_vulnerabilities": 2,
+            "vulnerabilities": [
+                {"package": "a", "severity": "moderate", "source": "npm"},
+                {"package": "b", "severity": "critical", "source": "npm"},
+            ],
+        },
+        "sast": {
+            "success": False,
+            "error": "semgrep crashed",
+            "total_findings": 1,
+            "findings": [{"rule_id": "r", "severity": "WARNING", "source": "semgrep"}],
+        },
+    })
+
+    assert report["total_findings"] == 3
+    assert (report["critical"], report["high"], report["medium"], report["low"]) == (1, 1, 1, 0)
+    assert [f["severity"] for f in report["findings"]] == ["critical", "high", "medium"]
+    assert report["findings"][1]["scanner"] == "sast"
+    assert report["findings"][1]["native_severity"] == "WARNING"
+    assert "vulnerabilities" not in report["scanner_results"]["dependency"]
+    assert report["success"] is False
+    assert "sast" in report["error"]
+
+
+def test_pipeline_shares_one_checkout(monkeypatch, git_repo, tmp_path):
+    """Test every scanner runs against the same single checkout"""
+    commit_files(git_repo, {"requirements.txt": "requests==2.0.0\n"})
+    cache = RepositoryCache(str(tmp_path / "cache"))
+    checkouts = []
+    original_checkout = cache.checkout
+
+    async def checkout(*args, **kwargs):
+        checkouts.append(args)
+        await original_checkout(*args, **kwargs)
+
+    monkeypatch.setattr(cache, "checkout", checkout)
+    monkeypatch.setattr(security_pipeline, "repository_cache", cache)
+
+    seen = {}
+
+    async def fake_dependency_scan(self, project_dir, repository_url=None, baseline_commit=None):
+        seen["dependency"] = project_dir
+        assert Path(project_dir, "requirements.txt").exists()
+        return {"scanner": "dependency", "success": True, "total_vulnerabilities": 0, "vulnerabilities": []}
+
+    async def fake_sast_scan(self, project_dir, repository_url=None, baseline_commit=None):
+        seen["sast"] = project_dir
+        raise Exception("semgrep is not installed")
+
+    monkeypatch.setattr(DependencyScanner, "scan_path", fake_dependency_scan)
+    monkeypatch.setattr(SASTScanner, "scan_path", fake_sast_scan)
+
+    report = asyncio.run(run_security_pipeline(git_repo.as_uri(), ["dependency", "sast"]))
+
+    assert len(checkouts) == 1
+    assert seen["dependency"] == seen["sast"]
+    assert report["scanners"] == ["dependency", "sast"]
+    assert report["scanner_results"]["dependency"]["success"] is True
+    assert report["scanner_results"]["sast"]["error"] == "semgrep is not installed"
+    assert report["success"] is False
+    assert "checkout_duration" in report
+
+
+def test_pipeline_rejects_unknown_scanners():
+    """Test the pipeline endpoint validates the scanner list"""
+    response = client.post(
+        "/api/v1/security/pipeline",
+        json={
+            "project_id": "test-project",
+            "scan_id": "pipeline-invalid",
+            "scanners": ["dependency", "secrets"],
+            "repository_url": "https://github.com/test/repo.git"
+        }
+    )
+    assert response.status_code == 400
+    assert "secrets" in response.json()["detail"]
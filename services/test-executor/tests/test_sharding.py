@@ -0,0 +1,142 @@
+"""
+Test shard partitioning, duration history and shard result merging
+"""
+import asyncio
+import subprocess
+import time
+
+import pytest
+
+from app.services.coverage import CoverageReport, FileCoverage
+from app.services.result_store import InMemoryResultStore
+from app.services.sharding import DurationHistory, merge_shard_results, partition_by_duration
+from app.services.process import run_process
+from app.services.test_runner import PytestRunner
+
+
+def test_partition_balances_known_durations():
+    """Test longest tests are spread so shard totals stay close"""
+    durations = {"a": 8.0, "b": 7.0, "c": 3.0, "d": 2.0, "e": 2.0, "f": 1.0}
+    shards = partition_by_duration(list(durations), durations, 2)
+
+    totals = sorted(sum(durations[t] for t in shard) for shard in shards)
+    assert totals == [11.0, 12.0]
+    assert sorted(t for shard in shards for t in shard) == sorted(durations)
+
+
+def test_partition_keeps_order_and_drops_empty_shards():
+    """Test each shard keeps collection order and no shard is empty"""
+    shards = partition_by_duration(["t1", "t2", "t3"], {"t3": 5.0}, 8)
+
+    assert len(shards) == 3
+    assert all(len(shard) == 1 for shard in shards)
+
+    shards = partition_by_duration(["t1", "t2", "t3", "t4"], {}, 2)
+    assert all(shard == sorted(shard) for shard in shards)
+
+
+def test_duration_history_records_per_unit():
+    """Test per-test durations are summed per suite and merged with earlier runs"""
+    history = DurationHistory(InMemoryResultStore("durations", max_entries=10, ttl=None))
+    history.record("jest", "repo", [
+        {"suite": "a.test.js", "name": "one", "duration": 0.5},
+        {"suite": "a.test.js", "name": "two", "duration": 1.5},
+        {"suite": "b.test.js", "name": "three", "duration": 1.0},
+    ], "suite")
+    history.record("jest", "repo", [{"suite": "b.test.js", "name": "three", "duration": 3.0}], "suite")
+
+    assert history.get("jest", "repo") == {"a.test.js": 2.0, "b.test.js": 3.0}
+    assert history.get("pytest", "repo") == {}
+
+
+def test_merge_shard_results():
+    """Test counts add up, duration is the slowest shard and coverage is unioned"""
+    first = CoverageReport({"src/app.py": FileCoverage(lines=0b1110, covered=0b0010)})
+    second = CoverageReport({"src/app.py": FileCoverage(lines=0b1110, covered=0b1100)})
+    merged = merge_shard_results([
+        {"total_tests": 2, "passed": 2, "failed": 0, "skipped": 0, "duration": 4.0,
+         "test_results": [{"name": "a"}, {"name": "b"}], "coverage": first.to_dict(), "exit_code": 0},
+        {"total_tests": 1, "passed": 0, "failed": 1, "skipped": 0, "duration": 6.0,
+         "test_results": [{"name": "c"}], "coverage": second.to_dict(), "exit_code": 1},
+    ])
+
+    assert merged["total_tests"] == 3
+    assert merged["failed"] == 1
+    assert merged["duration"] == 6.0
+    assert [t["name"] for t in merged["test_results"]] == ["a", "b", "c"]
+    assert merged["coverage"]["summary"]["lines"] == {"total": 3, "covered": 3, "pct": 100.0}
+    assert merged["exit_code"] == 1
+    assert merged["success"] is False
+    assert [s["tests"] for s in merged["shards"]] == [2, 1]
+
+
+class FakeShardRunner(PytestRunner):
+    """Runner whose test processes are simulated"""
+
+    def __init__(self, test_ids):
+        super().__init__()
+        self.test_ids = test_ids
+        self.selections = []
+
+    async def _list_tests(self, temp_dir, env, selection=None):
+        return self.test_ids
+
+    async def _run_selection(self, temp_dir, env, on_event, test_command=None, selection=None, shard=None):
+        self.selections.append((selection, shard))
+        tests = [{"suite": t.split("::")[0], "name": t, "status": "passed", "duration": 1.0} for t in selection or []]
+        return {"total_tests": len(tests), "passed": len(tests), "failed": 0, "skipped": 0,
+                "duration": float(len(tests)), "test_results": tests, "coverage": {}, "exit_code": 0,
+                "success": True}
+
+
+def test_run_suite_splits_into_shards(monkeypatch, tmp_path):
+    """Test a sharded run executes every test once across concurrent shards"""
+    history = DurationHistory(InMemoryResultStore("durations", max_entries=10, ttl=None))
+    monkeypatch.setattr("app.services.test_runner.duration_history", history)
+    runner = FakeShardRunner([f"tests/test_a.py::test_{i}" for i in range(5)])
+
+    results = asyncio.run(runner._run_suite("repo", str(tmp_path), {}, None, shards=2))
+
+    assert results["total_tests"] == 5
+    assert results["success"] is True
+    assert len(results["shards"]) == 2
+    assert sorted(t for selection, _ in runner.selections for t in selection) == runner.test_ids
+    assert {shard for _, shard in runner.selections} == {(0, 2), (1, 2)}
+    assert len(history.get("pytest", "repo")) == 5
+
+
+def test_run_suite_custom_command_is_not_sharded(monkeypatch, tmp_path):
+    """Test custom test commands run as a single process"""
+    history = DurationHistory(InMemoryResultStore("durations", max_entries=10, ttl=None))
+    monkeypatch.setattr("app.services.test_runner.duration_history", history)
+    runner = FakeShardRunner(["tests/test_a.py::test_1", "tests/test_a.py::test_2"])
+
+    asyncio.run(runner._run_suite("repo", str(tmp_path), {}, None, test_command="pytest -x", shards=4))
+
+    assert runner.selections == [(None, None)]
+    assert history.get("pytest", "repo") == {}
+
+
+class TimeoutShardRunner(FakeShardRunner):
+    """Runner whose first shard times out while the others are still running"""
+
+    async def _run_selection(self, temp_dir, env, on_event, test_command=None, selection=None, shard=None):
+        if shard[0] == 0:
+            await run_process(["sleep", "5"], timeout=0.2)
+        await run_process(["sh", "-c", f"sleep 1 && touch survivor-{shard[0]}"], cwd=temp_dir)
+        return await super()._run_selection(temp_dir, env, on_event, test_command, selection, shard)
+
+
+def test_shard_timeout_kills_sibling_shards(monkeypatch, tmp_path):
+    """Test a timed-out shard fails the run and stops the other shards' processes"""
+    history = DurationHistory(InMemoryResultStore("durations", max_entries=10, ttl=None))
+    monkeypatch.setattr("app.services.test_runner.duration_history", history)
+    runner = TimeoutShardRunner([f"tests/test_a.py::test_{i}" for i in range(4)])
+
+    started = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired):
+        asyncio.run(runner._run_suite("repo", str(tmp_path), {}, None, shards=3))
+    assert time.monotonic() - started < 1
+
+    time.sleep(1.5)
+    assert not list(tmp_path.glob("survivor-*"))
@@ -0,0 +1,62 @@
+"""
+Test the scanner toolchain manager
+"""
+import asyncio
+import os
+
+import pytest
+
+from app.services.toolchain import Toolchain
+
+
+def fake_tool(directory, name, output):
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / name
+    path.write_text(f"#!/bin/sh\necho '{output}'\n")
+    path.chmod(0o755)
+    return path
+
+
+def test_warm_reports_tool_readiness(monkeypatch, tmp_path):
+    """Test pinned tools are versioned and missing ones leave the toolchain degraded"""
+    bin_dir = tmp_path / "bin"
+    fake_tool(bin_dir, "safety", "safety, version 2.3.5")
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    toolchain = Toolchain(str(tmp_path / "toolchain"), {"safety": "2.3.5", "semgrep": "1.45.0"})
+
+    readiness = asyncio.run(toolchain.warm(install=False))
+
+    assert readiness["ready"] is False
+    assert readiness["state"] == "degraded"
+    assert readiness["tools"]["safety"] == {"ready": True, "version": "2.3.5", "pinned": "2.3.5"}
+    assert readiness["tools"]["semgrep"]["ready"] is False
+    assert readiness["tools"]["semgrep_rules"]["ready"] is False
+
+
+def test_provisioned_binaries_and_rules_take_precedence(monkeypatch, tmp_path):
+    """Test scans use the toolchain virtualenv and the local ruleset"""
+    bin_dir = tmp_path / "bin"
+    fake_tool(bin_dir, "semgrep", "1.0.0")
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    rules = tmp_path / "rules.yml"
+    toolchain = Toolchain(str(tmp_path / "toolchain"), {"semgrep": "1.45.0"}, rules_path=str(rules))
+
+    assert toolchain.binary("semgrep") == str(bin_dir / "semgrep")
+    provisioned = fake_tool(toolchain.venv / "bin", "semgrep", "1.45.0")
+    assert toolchain.binary("semgrep") == str(provisioned)
+
+    with pytest.raises(Exception, match="semgrep ruleset not found"):
+        toolchain.semgrep_config()
+    rules.write_text("rules: []\n")
+    assert toolchain.semgrep_config() == str(rules)
+
+    readiness = asyncio.run(toolchain.warm(install=False))
+    assert readiness["tools"]["semgrep"]["version"] == "1.45.0"
+    assert readiness["tools"]["semgrep_rules"]["ready"] is True
+
+
+def test_missing_tool_raises(tmp_path):
+    """Test a scan fails clearly when its tool was never provisioned"""
+    toolchain = Toolchain(str(tmp_path / "toolchain"), {})
+    with pytest.raises(Exception, match="not installed"):
+        toolchain.binary("tsuite-missing-tool")
@@ -0,0 +1,126 @@
+"""
+Test OpenTelemetry tracing
+"""
+import asyncio
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from app.main import app
+from app.routers import test_execution
+from app.services.process import run_process
+from app.services.tracing import configure_tracing, inject_context, job_span, tracer
+
+exporter = InMemorySpanExporter()
+configure_tracing(exporter=exporter)
+
+client = TestClient(app)
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+TRACEPARENT = f"00-{TRACE_ID}-00f067aa0ba902b7-01"
+
+
+def spans_by_name():
+    return {span.name: span for span in exporter.get_finished_spans()}
+
+
+def test_request_trace_continues_into_background_run(monkeypatch):
+    """Test a run queued by a traced request executes in child spans of the same trace"""
+    async def no_cache(request):
+        return False
+
+    async def fake_perform(request):
+        await run_process(["true"])
+        test_execution.test_results_store[request.test_run_id] = {"status": "completed", "progress": 100}
+
+    monkeypatch.setattr(test_execution, "serve_cached_result", no_cache)
+    monkeypatch.setattr(test_execution, "perform_test_run", fake_perform)
+    exporter.clear()
+
+    response = client.post(
+        "/api/v1/tests/execute",
+        json={
+            "project_id": "trace-project",
+            "test_run_id": "trace-run",
+            "framework": "pytest",
+            "repository_url": "https://github.com/test/repo.git"
+        },
+        headers={"traceparent": TRACEPARENT}
+    )
+    assert response.status_code == 200
+
+    spans = spans_by_name()
+    server = spans["POST /api/v1/tests/execute"]
+    run = spans["test run"]
+    process = spans["process true"]
+    assert {format(span.context.trace_id, "032x") for span in [server, run, process]} == {TRACE_ID}
+    assert run.parent.span_id == server.context.span_id
+    assert process.parent.span_id == run.context.span_id
+    assert run.attributes["test_run.id"] == "trace-run"
+    assert server.attributes["http.status_code"] == 200
+    assert process.attributes["process.exit_code"] == 0
+
+
+def test_job_span_continues_propagated_context():
+    """Test a worker-side job span joins the trace handed over with the task"""
+    exporter.clear()
+    with tracer.start_as_current_span("dispatch") as parent:
+        carrier = inject_context()
+
+    # The worker has no current span; the carrier alone links it to the trace
+    with job_span("test run", {"test_run.id": "remote-run"}, carrier):
+        asyncio.run(run_process(["true"]))
+
+    spans = spans_by_name()
+    assert spans["test run"].context.trace_id == parent.context.trace_id
+    assert spans["test run"].parent.span_id == parent.context.span_id
+    assert spans["process true"].parent.span_id == spans["test run"].context.span_id
+
+
+def test_forked_pool_process_exports_spans(tmp_path):
+    """Test spans ended in a forked pool process reach the batch exporter before it exits"""
+    output = tmp_path / "spans.txt"
+    script = textwrap.dedent(f"""
+        import os
+        from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+
+        from app import tasks
+        from app.config import settings
+        from app.services import tracing
+
+        class FileExporter(SpanExporter):
+            def export(self, spans):
+                with open({str(output)!r}, "a") as f:
+                    f.writelines(span.name + "\\n" for span in spans)
+                return SpanExportResult.SUCCESS
+
+        settings.tracing_enabled = True
+        tracing._otlp_exporter = FileExporter
+
+        class PreforkWorker:
+            pool_cls = "prefork"
+
+        tasks._forks_pool_processes(PreforkWorker()) or exit("prefork pool not detected")
+        pid = os.fork()
+        if pid == 0:
+            tasks.start_pool_process_tracing()
+            with tracing.tracer.start_as_current_span("pool process job"):
+                pass
+            tasks.flush_pool_process_tracing()
+            os._exit(0)
+        _, status = os.waitpid(pid, 0)
+        exit(os.waitstatus_to_exitcode(status))
+    """)
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=Path(__file__).resolve().parents[1],
+        capture_output=True,
+        text=True,
+        timeout=60
+    )
+    assert result.returncode == 0, result.stderr
+    assert output.read_text().splitlines() == ["pool process job"]
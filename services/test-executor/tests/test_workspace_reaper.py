@@ -0,0 +1,98 @@
+"""
+Test background workspace deletion, orphan sweeping and the disk quota
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from app.services.workspace_reaper import NAMESPACE_TAG, TRASH_DIR, WorkspaceReaper, owner_prefix
+
+
+def workspace(root, name, size=0):
+    path = root / name
+    path.mkdir()
+    (path / "data.bin").write_bytes(os.urandom(size))
+    return path
+
+
+def test_discard_moves_workspace_aside_and_deletes_in_background(tmp_path):
+    """Test a released workspace disappears at once and is deleted after the job moves on"""
+    reaper = WorkspaceReaper(str(tmp_path), quota_bytes=0, usage_interval=30, quota_wait=1)
+    path = workspace(tmp_path, f"{owner_prefix('tsuite_test_')}abc", size=4096)
+
+    async def scenario():
+        reaper.discard(str(path))
+        return not path.exists()
+
+    assert asyncio.run(scenario())
+    assert reaper.wait_idle(5)
+    assert reaper.pending() == 0
+    assert os.listdir(tmp_path / TRASH_DIR) == []
+
+
+def test_deletions_continue_after_the_discarding_loop_stops(tmp_path):
+    """Test a workspace discarded from a job's loop is deleted while that loop is idle between jobs"""
+    reaper = WorkspaceReaper(str(tmp_path), quota_bytes=0, usage_interval=30, quota_wait=1)
+    paths = [workspace(tmp_path, f"{owner_prefix('tsuite_test_')}{i}", size=4096) for i in range(3)]
+    loop = asyncio.new_event_loop()
+
+    async def job(path):
+        reaper.discard(str(path))
+
+    try:
+        for path in paths:
+            loop.run_until_complete(job(path))
+        # The loop is not running now, as on a Celery worker thread between jobs
+        assert reaper.wait_idle(5)
+    finally:
+        loop.close()
+    assert os.listdir(tmp_path / TRASH_DIR) == []
+
+
+def test_sweep_removes_orphaned_workspaces(tmp_path):
+    """Test workspaces of dead processes and stale unowned ones are swept; live ones are kept"""
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    orphan = workspace(tmp_path, f"tsuite_security_{NAMESPACE_TAG}-{dead.pid}_x1")
+    mine = workspace(tmp_path, f"{owner_prefix('tsuite_test_')}x2")
+    # Same PID, but from another container's PID namespace sharing the directory
+    foreign = workspace(tmp_path, f"tsuite_test_0badc0de-{dead.pid}_x3")
+    legacy_old = workspace(tmp_path, "tsuite_sast_oldname")
+    legacy_new = workspace(tmp_path, "tsuite_pipeline_newname")
+    cache = workspace(tmp_path, "tsuite_repo_cache")
+    stale = time.time() - 7200
+    os.utime(legacy_old, (stale, stale))
+    (tmp_path / TRASH_DIR).mkdir()
+    leftover = workspace(tmp_path / TRASH_DIR, "tsuite_test_1_old.1")
+
+    reaper = WorkspaceReaper(str(tmp_path), quota_bytes=0, usage_interval=30, quota_wait=1)
+    assert reaper.sweep() == 2
+
+    assert not orphan.exists() and not legacy_old.exists() and not leftover.exists()
+    assert mine.exists() and foreign.exists() and legacy_new.exists() and cache.exists()
+
+
+def test_jobs_wait_for_quota(tmp_path):
+    """Test checkouts wait while over quota, fail after the wait and proceed once space is freed"""
+    full = workspace(tmp_path, f"{owner_prefix('tsuite_test_')}full", size=64 * 1024)
+    reaper = WorkspaceReaper(str(tmp_path), quota_bytes=32 * 1024, usage_interval=0.05, quota_wait=0.2)
+
+    async def scenario():
+        reaper.measure()
+        with pytest.raises(Exception, match="quota exceeded"):
+            await reaper.wait_for_space()
+
+        reaper.quota_wait = 5
+        waiter = asyncio.create_task(reaper.wait_for_space())
+        await asyncio.sleep(0.1)
+        blocked = not waiter.done()
+        reaper.discard(str(full))
+        await asyncio.wait_for(waiter, 5)
+        return blocked
+
+    assert asyncio.run(scenario())
+    assert reaper.usage < reaper.quota_bytes